@@ -0,0 +1,210 @@
+"""Векторная аналитика игроков на NumPy.
+
+Статистика игроков и матчей один раз читается в колонки массивов
+(PlayerFrame), после чего проценты побед, доли покрытий, эйсы и двойные за
+матч, перцентили и таблицы лидеров считаются целыми массивами, без обхода
+игроков в Python. Готовый снимок держится в памяти процесса и
+пересобирается, когда меняется версия таблиц Player или Match.
+"""
+import threading
+
+import numpy as np
+
+from .conditional import table_versions
+from .models import Match, Player
+
+SURFACES = [surface for surface, _ in Match.SURFACE_CHOICES]
+
+PLAYER_FIELDS = (
+    'id', 'name', 'country', 'gender', 'age', 'rank', 'points', 'wins', 'losses',
+    'ace_count', 'double_faults', 'first_serve_percentage', 'break_points_saved',
+    'hard_wins', 'clay_wins', 'grass_wins',
+)
+
+MATCH_FIELDS = (
+    'player1_id', 'player2_id', 'winner_id', 'surface',
+    'player1_aces', 'player2_aces', 'player1_double_faults', 'player2_double_faults',
+)
+
+# Метрика -> (описание, больше ли значит лучше)
+METRICS = {
+    'win_rate': ('Career win rate, %', True),
+    'total_matches': ('Career matches played', True),
+    'points': ('Ranking points', True),
+    'ace_count': ('Career aces', True),
+    'first_serve_percentage': ('First serve in, %', True),
+    'break_points_saved': ('Break points saved, %', True),
+    'aces_per_match': ('Aces per recorded match', True),
+    'double_faults_per_match': ('Double faults per recorded match', False),
+    'hard_win_rate': ('Win rate on hard courts, %', True),
+    'clay_win_rate': ('Win rate on clay, %', True),
+    'grass_win_rate': ('Win rate on grass, %', True),
+    'hard_share': ('Share of wins on hard courts, %', True),
+    'clay_share': ('Share of wins on clay, %', True),
+    'grass_share': ('Share of wins on grass, %', True),
+    'age': ('Age', False),
+}
+
+CHUNK_SIZE = 10000
+
+
+def _ratio(numerator, denominator, scale=1.0):
+    """numerator / denominator по элементам, 0 там, где делить не на что"""
+    out = np.zeros(len(numerator), dtype=np.float64)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out * scale
+
+
+def percentile_ranks(values, higher_is_better=True):
+    """Доля игроков (в %), у которых значение не лучше, чем у данного; NaN - без места"""
+    valid = ~np.isnan(values)
+    result = np.full(len(values), np.nan)
+    ordered = np.sort(values[valid] if higher_is_better else -values[valid])
+    if ordered.size:
+        keys = values[valid] if higher_is_better else -values[valid]
+        result[valid] = np.searchsorted(ordered, keys, side='right') / ordered.size * 100
+    return result
+
+
+class PlayerFrame:
+    """Колонки статистики игроков и производные метрики"""
+
+    def __init__(self, players, matches):
+        self.ids = [row[0] for row in players]
+        self.names = [row[1] for row in players]
+        self.countries = [row[2] for row in players]
+        self.genders = np.array([row[3] for row in players], dtype='U3')
+        self.index = {player_id: i for i, player_id in enumerate(self.ids)}
+
+        columns = {}
+        for position, field in enumerate(PLAYER_FIELDS[4:], start=4):
+            columns[field] = np.fromiter(
+                (np.nan if row[position] is None else row[position] for row in players),
+                dtype=np.float64, count=len(players),
+            )
+        self.columns = columns
+        self.metrics = self._player_metrics(columns)
+        self.metrics.update(self._match_metrics(matches))
+
+    @classmethod
+    def load(cls):
+        players = list(Player.objects.order_by().values_list(*PLAYER_FIELDS).iterator(chunk_size=CHUNK_SIZE))
+        matches = Match.objects.order_by().values_list(*MATCH_FIELDS).iterator(chunk_size=CHUNK_SIZE)
+        return cls(players, matches)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _player_metrics(self, c):
+        total = c['wins'] + c['losses']
+        surface_wins = np.stack([c[f'{s.lower()}_wins'] for s in SURFACES])
+        total_surface_wins = surface_wins.sum(axis=0)
+        metrics = {
+            'win_rate': _ratio(c['wins'], total, 100),
+            'total_matches': total,
+            'points': c['points'],
+            'ace_count': c['ace_count'],
+            'first_serve_percentage': c['first_serve_percentage'],
+            'break_points_saved': c['break_points_saved'],
+            'age': c['age'],
+        }
+        for surface, wins in zip(SURFACES, surface_wins):
+            metrics[f'{surface.lower()}_share'] = _ratio(wins, total_surface_wins, 100)
+        return metrics
+
+    def _match_metrics(self, matches):
+        """Счетчики по матчам через bincount по индексам игроков"""
+        first, second, won_first, won_second, surfaces = [], [], [], [], []
+        aces, double_faults = [], []
+        surface_codes = {s: i for i, s in enumerate(SURFACES)}
+        for player1, player2, winner, surface, aces1, aces2, df1, df2 in matches:
+            i, j = self.index.get(player1), self.index.get(player2)
+            if i is None or j is None:
+                # Игрок появился после чтения колонок игроков
+                continue
+            first.append(i)
+            second.append(j)
+            won_first.append(winner == player1)
+            won_second.append(winner == player2)
+            surfaces.append(surface_codes.get(surface, -1))
+            aces.append((aces1, aces2))
+            double_faults.append((df1, df2))
+
+        n = len(self)
+        players = np.concatenate([np.array(first, dtype=np.intp), np.array(second, dtype=np.intp)])
+        won = np.concatenate([np.array(won_first, dtype=bool), np.array(won_second, dtype=bool)])
+        surface = np.tile(np.array(surfaces, dtype=np.intp), 2)
+        aces = np.array(aces, dtype=np.float64).reshape(-1, 2).T.ravel()
+        double_faults = np.array(double_faults, dtype=np.float64).reshape(-1, 2).T.ravel()
+
+        played = np.bincount(players, minlength=n)
+        metrics = {
+            'aces_per_match': _ratio(np.bincount(players, weights=aces, minlength=n), played),
+            'double_faults_per_match': _ratio(np.bincount(players, weights=double_faults, minlength=n), played),
+        }
+        for code, name in enumerate(SURFACES):
+            on_surface = surface == code
+            surface_played = np.bincount(players[on_surface], minlength=n)
+            surface_won = np.bincount(players[on_surface & won], minlength=n)
+            rate = _ratio(surface_won, surface_played, 100)
+            rate[surface_played == 0] = np.nan
+            metrics[f'{name.lower()}_win_rate'] = rate
+        # Игроки без записанных матчей в таблицы по матчам не попадают
+        for metric in ('aces_per_match', 'double_faults_per_match'):
+            metrics[metric][played == 0] = np.nan
+        return metrics
+
+    def mask(self, gender=None, min_matches=0):
+        mask = np.ones(len(self), dtype=bool)
+        if gender:
+            mask &= self.genders == gender
+        if min_matches:
+            mask &= self.metrics['total_matches'] >= min_matches
+        return mask
+
+    def leaders(self, metric, limit=10, gender=None, min_matches=0, reverse=False):
+        """Лучшие `limit` игроков по метрике (худшие при reverse).
+
+        argpartition выбирает кандидатов за линейное время, сортируются только они.
+        """
+        _, higher_is_better = METRICS[metric]
+        values = self.metrics[metric]
+        mask = self.mask(gender, min_matches) & ~np.isnan(values)
+        candidates = np.flatnonzero(mask)
+        if not candidates.size:
+            return []
+
+        keys = -values[candidates] if higher_is_better != reverse else values[candidates]
+        limit = min(limit, candidates.size)
+        top = np.argpartition(keys, limit - 1)[:limit]
+        top = top[np.argsort(keys[top], kind='stable')]
+        chosen = candidates[top]
+
+        percentiles = percentile_ranks(np.where(mask, values, np.nan), higher_is_better)
+        return [
+            {
+                'id': self.ids[i],
+                'name': self.names[i],
+                'country': self.countries[i],
+                'gender': str(self.genders[i]),
+                'value': round(float(values[i]), 2),
+                'percentile': round(float(percentiles[i]), 1),
+            }
+            for i in chosen
+        ]
+
+
+_frame = None
+_frame_version = None
+_frame_lock = threading.Lock()
+
+
+def get_frame():
+    """Снимок статистики для текущих версий таблиц Player и Match"""
+    global _frame, _frame_version
+    version = table_versions(Player, Match)
+    with _frame_lock:
+        if _frame is None or _frame_version != version:
+            _frame = PlayerFrame.load()
+            _frame_version = version
+        return _frame
@@ -0,0 +1,175 @@
+"""Пул соединений с базой внутри процесса.
+
+Django 4.2 держит соединение на поток: с CONN_MAX_AGE > 0 оно живет между
+запросами, но под ASGI синхронный код запросов ходит по разным потокам, и
+каждый поток открывает свое соединение. Пул отвязывает соединения от
+потоков: в конце запроса Django "закрывает" соединение, а оно возвращается в
+пул, и следующий запрос из любого потока берет уже открытое.
+
+PooledConnectionMixin подмешивается к DatabaseWrapper бэкенда (см.
+pooled_postgresql). Настройки - ключ POOL в DATABASES:
+    MAX_SIZE - сколько соединений процесс держит одновременно (занятых и
+               свободных); при нехватке запрос ждет;
+    TIMEOUT  - сколько секунд ждать свободного соединения, потом ошибка
+               OperationalError;
+    MAX_IDLE - сколько секунд соединение может пролежать в пуле, потом оно
+               закрывается при следующей выдаче.
+Перед выдачей соединение из пула проверяется запросом SELECT 1, если в
+настройках включен CONN_HEALTH_CHECKS. CONN_MAX_AGE с пулом должен быть 0:
+соединение возвращается в пул в конце каждого запроса.
+"""
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+DEFAULT_MAX_SIZE = 20
+DEFAULT_TIMEOUT = 10
+DEFAULT_MAX_IDLE = 300
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, timeout=DEFAULT_TIMEOUT, max_idle=DEFAULT_MAX_IDLE):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.lock = threading.Lock()
+        self.idle = deque()  # (соединение, когда вернулось в пул)
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def acquire(self, connect, is_usable):
+        """Свободное рабочее соединение из пула или новое через connect()"""
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(f'No free database connection in the pool after {self.timeout}s')
+        try:
+            while True:
+                with self.lock:
+                    connection, returned_at = self.idle.pop() if self.idle else (None, None)
+                if connection is None:
+                    connection = connect()
+                    with self.lock:
+                        self.opened += 1
+                    return connection
+                if time.monotonic() - returned_at <= self.max_idle and is_usable(connection):
+                    with self.lock:
+                        self.reused += 1
+                    return connection
+                self.discard(connection)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, connection, reusable=True):
+        try:
+            if reusable:
+                with self.lock:
+                    self.idle.append((connection, time.monotonic()))
+            else:
+                self.discard(connection)
+        finally:
+            self.slots.release()
+
+    def discard(self, connection):
+        with self.lock:
+            self.discarded += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        with self.lock:
+            idle, self.idle = self.idle, deque()
+        for connection, _ in idle:
+            self.discard(connection)
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_size': self.max_size,
+                'idle': len(self.idle),
+                'opened': self.opened,
+                'reused': self.reused,
+                'discarded': self.discarded,
+            }
+
+
+def get_pool(alias, settings_dict):
+    """Пул для базы: отдельный на каждую пару (alias, параметры подключения)"""
+    key = (alias, settings_dict['NAME'], settings_dict['USER'], settings_dict['HOST'], settings_dict['PORT'])
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            options = settings_dict.get('POOL') or {}
+            pool = _pools[key] = ConnectionPool(
+                max_size=options.get('MAX_SIZE', DEFAULT_MAX_SIZE),
+                timeout=options.get('TIMEOUT', DEFAULT_TIMEOUT),
+                max_idle=options.get('MAX_IDLE', DEFAULT_MAX_IDLE),
+            )
+        return pool
+
+
+def pools():
+    with _pools_lock:
+        return dict(_pools)
+
+
+def close_pools(name=None):
+    """Закрывает свободные соединения пулов (только к базе name, если задана)"""
+    for (_, pool_name, *_), pool in pools().items():
+        if name is None or pool_name == name:
+            pool.close_all()
+
+
+class PooledConnectionMixin:
+    """DatabaseWrapper, который берет соединения из пула и возвращает их туда вместо закрытия"""
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        return self.pool.acquire(
+            lambda: super(PooledConnectionMixin, self).get_new_connection(conn_params),
+            self.pooled_connection_usable,
+        )
+
+    def pooled_connection_usable(self, connection):
+        if not self.settings_dict['CONN_HEALTH_CHECKS']:
+            return True
+        try:
+            cursor = connection.cursor()
+            try:
+                cursor.execute('SELECT 1')
+            finally:
+                cursor.close()
+        except Exception:
+            return False
+        # Без autocommit проверка открыла транзакцию
+        return self.reset_pooled_connection(connection)
+
+    def reset_pooled_connection(self, connection):
+        """Откатывает незавершенную транзакцию; False - соединение лучше закрыть"""
+        return True
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        if self.in_atomic_block:
+            # Транзакцию еще ждет владелец: соединение закрывается, а не уходит в
+            # пул. Обертка держит закрытое соединение, и запросы до конца блока
+            # падают, как и без пула, вместо тихого переподключения
+            self.pool.release(connection, reusable=False)
+            return
+        # После возврата в пул соединение может взять другой поток
+        self.connection = None
+        reusable = not self.errors_occurred and self.reset_pooled_connection(connection)
+        self.pool.release(connection, reusable)
@@ -0,0 +1,27 @@
+"""PostgreSQL с пулом соединений (api/backends/pool.py): ENGINE = 'api.backends.pooled_postgresql'"""
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresDatabaseWrapper
+
+from ..pool import PooledConnectionMixin
+from .creation import DatabaseCreation
+
+# Коды transaction_status, одинаковые в psycopg2 и psycopg 3
+TRANSACTION_IDLE, TRANSACTION_INTRANS, TRANSACTION_INERROR = 0, 2, 3
+
+
+class DatabaseWrapper(PooledConnectionMixin, PostgresDatabaseWrapper):
+    creation_class = DatabaseCreation
+
+    def reset_pooled_connection(self, connection):
+        if connection.closed:
+            return False
+        status = connection.info.transaction_status
+        if status == TRANSACTION_IDLE:
+            return True
+        if status in (TRANSACTION_INTRANS, TRANSACTION_INERROR):
+            try:
+                connection.rollback()
+                return True
+            except self.Database.Error:
+                return False
+        # Запрос еще выполняется или состояние неизвестно
+        return False
@@ -0,0 +1,10 @@
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgresDatabaseCreation
+
+from ..pool import close_pools
+
+
+class DatabaseCreation(PostgresDatabaseCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # Свободные соединения пула к тестовой базе не дали бы ее удалить
+        close_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,14 @@
+"""SQLite с пулом соединений (api/backends/pool.py) - для локальной разработки и нагрузочных тестов"""
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+
+from ..pool import PooledConnectionMixin
+
+
+class DatabaseWrapper(PooledConnectionMixin, SQLiteDatabaseWrapper):
+    def reset_pooled_connection(self, connection):
+        if connection.in_transaction:
+            try:
+                connection.rollback()
+            except self.Database.Error:
+                return False
+        return True
@@ -0,0 +1,228 @@
+"""Работа с Gemini для чат-бота.
+
+Модель создается один раз на процесс. Все обращения к Gemini идут через пул
+потоков размером CHAT_MAX_CONCURRENCY, поэтому одновременных запросов к API
+не больше этого числа, а асинхронные запросы ждут ответа, не занимая потоков.
+Лишние запросы ждут в очереди пула; если ответа нет за CHAT_UPSTREAM_TIMEOUT
+(вместе с ожиданием в очереди), поднимается UpstreamTimeout.
+История чата сохраняется в отдельном потоке, вне пути запроса.
+
+Перед моделью стоит кэш ответов: вопрос нормализуется (регистр, пунктуация,
+артикли и вежливые заполнители), и одинаковые по смыслу формулировки
+попадают в одну запись LRU-кэша с TTL. В ключ входят версии таблиц Player и
+Tournament (conditional.py): после изменения рейтинга или победителя турнира
+в любом процессе, команде или через QuerySet.update() старые записи больше
+не совпадают и вытесняются по LRU.
+"""
+import asyncio
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from types import SimpleNamespace
+
+import google.generativeai as genai
+from django.conf import settings
+from django.db import close_old_connections
+
+from .conditional import table_versions
+from .models import ChatHistory, Player, Tournament
+
+class UpstreamTimeout(Exception):
+    """Gemini не ответил за CHAT_UPSTREAM_TIMEOUT секунд"""
+
+
+PROMPT_TEMPLATE = """You are a tennis expert AI assistant. Only answer questions related to tennis.
+            If the question is not about tennis, politely decline to answer.
+
+            User question: {message}
+
+            Tennis-specific response:"""
+
+
+class FakeGeminiModel:
+    """Локальная заглушка Gemini: отвечает эхом с заданной задержкой.
+
+    Включается настройкой CHAT_FAKE_LATENCY (в секундах) для разработки без
+    ключа API и для нагрузочных прогонов.
+    """
+    def __init__(self, latency, chunks=4):
+        self.latency = latency
+        self.chunks = chunks
+
+    def _parts(self, prompt):
+        question = prompt.split('User question:', 1)[-1].split('Tennis-specific response:', 1)[0].strip()
+        words = f'Tennis answer to: {question}'.split(' ')
+        step = max(1, len(words) // self.chunks)
+        return [' '.join(words[i:i + step]) + ' ' for i in range(0, len(words), step)]
+
+    def _stream(self, parts):
+        for part in parts:
+            time.sleep(self.latency / len(parts))
+            yield SimpleNamespace(text=part)
+
+    def generate_content(self, prompt, stream=False):
+        parts = self._parts(prompt)
+        if stream:
+            return self._stream(parts)
+        time.sleep(self.latency)
+        return SimpleNamespace(text=''.join(parts))
+
+
+@lru_cache(maxsize=None)
+def get_model():
+    if settings.CHAT_FAKE_LATENCY is not None:
+        return FakeGeminiModel(settings.CHAT_FAKE_LATENCY)
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    return genai.GenerativeModel(settings.GEMINI_MODEL_NAME)
+
+
+# Только слова-заполнители: вспомогательные глаголы меняют смысл вопроса
+# ("who is" и "who was" - разные вопросы)
+STOP_WORDS = {'a', 'an', 'the', 'please'}
+STOP_PHRASES = (('tell', 'me'),)
+
+
+def normalize_message(message):
+    words = [w for w in re.findall(r'\w+', message.lower()) if w not in STOP_WORDS]
+    for phrase in STOP_PHRASES:
+        size = len(phrase)
+        i = 0
+        while i <= len(words) - size:
+            if tuple(words[i:i + size]) == phrase:
+                del words[i:i + size]
+            else:
+                i += 1
+    return ' '.join(words)
+
+
+class ResponseCache:
+    """LRU-кэш ответов с TTL; ключ - cache_key()"""
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size if self._max_size is not None else settings.CHAT_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.CHAT_CACHE_TTL
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, response):
+        if self.max_size <= 0 or not response:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, response)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self.entries),
+            }
+
+
+response_cache = ResponseCache()
+
+
+def cache_key(message):
+    """Нормализованный вопрос вместе с версиями таблиц, от которых зависит ответ"""
+    return table_versions(Player, Tournament), normalize_message(message)
+
+
+upstream_pool = ThreadPoolExecutor(max_workers=settings.CHAT_MAX_CONCURRENCY, thread_name_prefix='gemini')
+history_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='chat-history')
+
+
+def build_prompt(message):
+    return PROMPT_TEMPLATE.format(message=message)
+
+
+def generate(message):
+    """Синхронный ответ целиком (для WSGI-эндпоинта): (текст, из_кэша)"""
+    key = cache_key(message)
+    cached = response_cache.get(key)
+    if cached is not None:
+        return cached, True
+    prompt = build_prompt(message)
+    future = upstream_pool.submit(lambda: get_model().generate_content(prompt).text)
+    try:
+        text = future.result(timeout=settings.CHAT_UPSTREAM_TIMEOUT)
+    except FutureTimeoutError:
+        # Еще не начатый запрос убираем из очереди пула
+        future.cancel()
+        raise UpstreamTimeout('Gemini did not respond in time')
+    response_cache.set(key, text)
+    return text, False
+
+
+async def stream_reply(message):
+    """Асинхронно отдает куски ответа по мере их получения от Gemini.
+
+    Кэш здесь не проверяется: это делает вызывающий код через response_cache.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    prompt = build_prompt(message)
+
+    def produce():
+        try:
+            for chunk in get_model().generate_content(prompt, stream=True):
+                loop.call_soon_threadsafe(queue.put_nowait, ('chunk', chunk.text))
+            loop.call_soon_threadsafe(queue.put_nowait, ('done', None))
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ('error', e))
+
+    loop.run_in_executor(upstream_pool, produce)
+    while True:
+        try:
+            kind, value = await asyncio.wait_for(queue.get(), settings.CHAT_UPSTREAM_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise UpstreamTimeout('Gemini did not respond in time')
+        if kind == 'error':
+            raise value
+        if kind == 'done':
+            return
+        yield value
+
+
+def _save_history(user_id, message, response, cached):
+    try:
+        ChatHistory.objects.create(user_id=user_id, message=message, response=response, cached=cached)
+    finally:
+        close_old_connections()
+
+
+def save_history(user, message, response, cached=False):
+    return history_pool.submit(_save_history, user.pk, message, response, cached)
@@ -0,0 +1,175 @@
+"""Условные GET-запросы (ETag / 304) для read-only ресурсов.
+
+Для каждой таблицы в базе хранится счетчик версии (TableVersion); он растет
+после коммита транзакции, в которой сохранялись или удалялись строки
+таблицы, - один раз на таблицу, сколько бы строк ни изменилось. ETag ответа
+собирается из версий таблиц, от которых зависит ресурс, и адреса запроса,
+поэтому проверка If-None-Match стоит одного запроса по первичному ключу и не
+требует сериализации.
+
+Счетчики лежат в базе, а не в кэше процесса: запись из другого процесса
+(воркера, команды управления, фонового сброса счетчиков) видна всем сразу.
+Версии пишутся в default; для ETag они читаются из той же базы, что и
+данные ответа, в том числе с реплики. В GET-запросе версии, прочитанные
+для ETag из default, запоминаются до конца запроса, и снимки и кэши
+производных данных берут их оттуда без повторного запроса.
+"""
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .models import (
+    AGGREGATE_RECEIVERS, HeadToHead, Match, News, Player, PlayerMatch, PlayerRating, SeasonStats, TableVersion,
+    Tournament, TournamentParticipation,
+)
+
+TRACKED_MODELS = (Player, News, Tournament, TournamentParticipation, Match, SeasonStats)
+
+# Версии, прочитанные для ETag текущего запроса: {метка таблицы: версия}
+_request_versions = ContextVar('request_table_versions', default=None)
+
+
+def _label(model):
+    # Кроме моделей бывают отдельные счетчики по строковой метке (PlayerRating.VERSION_TABLE)
+    return model if isinstance(model, str) else model._meta.label_lower
+
+
+def _create_missing(labels):
+    # Случайное начало: после сброса таблицы старые ETag не совпадут с новыми
+    TableVersion.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [TableVersion(table=label, version=random.getrandbits(48)) for label in labels],
+        ignore_conflicts=True,
+    )
+
+
+def table_versions(*models, using=DEFAULT_DB_ALIAS):
+    """Версии таблиц models в том же порядке, одним запросом.
+
+    using - база, с которой читаются и данные ответа: реплика отдает версии,
+    до которых она уже догнала default. Таблицы, чьей версии на реплике еще
+    нет, получают 0: начало счетчика в default случайное и с ним не совпадет.
+    """
+    labels = [_label(model) for model in models]
+    known = _request_versions.get() if using == DEFAULT_DB_ALIAS else None
+    if known is not None and all(label in known for label in labels):
+        return tuple(known[label] for label in labels)
+    rows = TableVersion.objects.using(using).values_list('table', 'version')
+    versions = dict(rows.filter(table__in=labels))
+    missing = [label for label in labels if label not in versions]
+    if missing and using == DEFAULT_DB_ALIAS:
+        _create_missing(missing)
+        versions.update(rows.filter(table__in=missing))
+    return tuple(versions.get(label, 0) for label in labels)
+
+
+def table_version(model):
+    return table_versions(model)[0]
+
+
+def bump(*models):
+    for model in models:
+        label = _label(model)
+        rows = TableVersion.objects.using(DEFAULT_DB_ALIAS).filter(table=label)
+        if not rows.update(version=F('version') + 1):
+            _create_missing([label])
+
+
+def bump_all():
+    """Для массовых загрузок в обход сигналов (bulk_create, update(), COPY)"""
+    bump(*TRACKED_MODELS, HeadToHead, PlayerMatch, PlayerRating)
+
+
+class _PendingBumps(set):
+    """Модели, измененные в текущей транзакции; вызывается один раз после коммита"""
+    done = False
+
+    def __call__(self):
+        self.done = True
+        bump(*self)
+
+
+def _bump_on_commit(sender, **kwargs):
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        bump(sender)
+        return
+    # Один обработчик on_commit на транзакцию. После коммита или отката (в том
+    # числе до точки сохранения) его нет в run_on_commit, и заводится новый
+    pending = getattr(connection, 'table_version_bumps', None)
+    if pending is None or pending.done or not any(callback is pending for _, callback, *_ in connection.run_on_commit):
+        pending = connection.table_version_bumps = _PendingBumps()
+        transaction.on_commit(pending)
+    pending.add(sender)
+
+
+for _model in TRACKED_MODELS:
+    for _signal, _action in ((post_save, 'save'), (post_delete, 'delete')):
+        _uid = f'table-version-{_model.__name__}-{_action}'
+        _signal.connect(_bump_on_commit, sender=_model, dispatch_uid=_uid)
+        # Массовые очистки и загрузки вызывают bump_all() один раз в конце
+        AGGREGATE_RECEIVERS.append((_signal, _bump_on_commit, _model, _uid))
+
+
+class NotModified(Exception):
+    def __init__(self, response):
+        self.response = response
+
+
+class ConditionalGetMixin:
+    """Отвечает 304 на GET/HEAD, если ни одна из version_models не менялась.
+
+    Проверка выполняется после аутентификации и прав доступа, но до
+    обработчика, так что при совпадении ETag queryset даже не строится.
+    В списке базовых классов стоит перед ReplicaReadMixin: к проверке реплика
+    запроса уже выбрана, и версии читаются с нее.
+    """
+    version_models = ()
+    _versions_token = None
+
+    def get_version_models(self):
+        return self.version_models
+
+    def get_etag(self, request, versions):
+        versions = ','.join(str(version) for version in versions)
+        accept = request.META.get('HTTP_ACCEPT', '')
+        digest = hashlib.sha1(f'{request.get_full_path()}|{accept}|{versions}'.encode()).hexdigest()
+        # Слабый ETag: он описывает состояние данных, а не байты ответа
+        return f'W/"{digest}"'
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = None
+        if request.method in ('GET', 'HEAD'):
+            models = self.get_version_models()
+            # Из той же базы, что и данные ответа: ETag не опережает тело с отставшей реплики
+            using = router.db_for_read(TableVersion)
+            versions = table_versions(*models, using=using)
+            if using == DEFAULT_DB_ALIAS:
+                self._versions_token = _request_versions.set(dict(zip(map(_label, models), versions)))
+            self.etag = self.get_etag(request, versions)
+            response = get_conditional_response(request, etag=self.etag)
+            if response is not None:
+                raise NotModified(response)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return exc.response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._versions_token is not None:
+            _request_versions.reset(self._versions_token)
+            self._versions_token = None
+        response = super().finalize_response(request, response, *args, **kwargs)
+        # Ответы со своим ETag (снимки рейтингов) оставляем как есть
+        if getattr(self, 'etag', None) and response.status_code in (200, 304) and not response.has_header('ETag'):
+            response['ETag'] = self.etag
+            patch_vary_headers(response, ['Accept'])
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
@@ -0,0 +1,125 @@
+"""Буферизованный счетчик просмотров новостей.
+
+Просмотры копятся в памяти процесса и раз в NEWS_VIEWS_FLUSH_INTERVAL секунд
+сбрасываются в базу одним UPDATE ... SET views = views + n на статью. При
+интервале 0 каждый просмотр сразу пишется атомарным F()-инкрементом.
+
+Сбрасывает фоновый поток-демон (запускается при первом просмотре в
+процессе), так что и на простаивающем процессе просмотры лежат в памяти не
+дольше интервала - столько же теряется при SIGKILL. Ошибка базы при сбросе
+пишется в лог, а просмотры возвращаются в буфер до следующей попытки.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+
+from .conditional import bump
+from .models import News
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCounter:
+    def __init__(self, model, field, flush_interval=None, max_pending=None):
+        self.model = model
+        self.field = field
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self.pending = Counter()
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.flusher_pid = None
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is not None:
+            return self._flush_interval
+        return getattr(settings, 'NEWS_VIEWS_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_pending(self):
+        if self._max_pending is not None:
+            return self._max_pending
+        return getattr(settings, 'NEWS_VIEWS_MAX_PENDING', 1000)
+
+    def increment(self, pk, amount=1):
+        """Учитывает просмотр и возвращает накопленный для статьи прирост.
+
+        Прирост считается до возможного сброса, поэтому значение, прочитанное
+        из базы перед вызовом, плюс результат дают актуальный счетчик.
+        """
+        if self.flush_interval <= 0:
+            self.model.objects.filter(pk=pk).update(**{self.field: F(self.field) + amount})
+            bump(self.model)
+            return amount
+
+        self.start_flusher()
+        with self.lock:
+            self.pending[pk] += amount
+            pending = self.pending[pk]
+            due = sum(self.pending.values()) >= self.max_pending
+        if due:
+            self.flush()
+        return pending
+
+    def start_flusher(self):
+        """Поток сброса по интервалу; после fork в новом процессе запускается заново"""
+        pid = os.getpid()
+        if self.flusher_pid == pid:
+            return
+        with self.lock:
+            if self.flusher_pid == pid:
+                return
+            self.flusher_pid = pid
+        threading.Thread(target=self.run_flusher, name=f'{self.model.__name__}-{self.field}-flush', daemon=True).start()
+
+    def run_flusher(self):
+        while True:
+            time.sleep(max(self.flush_interval, 0.1))
+            if time.monotonic() - self.last_flush < self.flush_interval:
+                continue
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('%s counter flush failed', self.model.__name__)
+            finally:
+                # Соединение этого потока не должно висеть между сбросами
+                connections.close_all()
+
+    def flush(self):
+        """Пишет накопленное в базу; возвращает число статей (0 и при ошибке)"""
+        with self.lock:
+            batch, self.pending = self.pending, Counter()
+            self.last_flush = time.monotonic()
+        if not batch:
+            return 0
+
+        try:
+            with transaction.atomic():
+                # Сортировка по ключу дает одинаковый порядок блокировок во всех процессах
+                for pk, amount in sorted(batch.items(), key=lambda item: str(item[0])):
+                    self.model.objects.filter(pk=pk).update(**{self.field: F(self.field) + amount})
+        except Exception:
+            # Возвращаем несохраненные просмотры в буфер до следующей попытки
+            with self.lock:
+                self.pending.update(batch)
+            logger.exception('Failed to flush %d pending %s counters', len(batch), self.model.__name__)
+            return 0
+        # update() не вызывает сигналы, версию таблицы для ETag двигаем сами
+        bump(self.model)
+        return len(batch)
+
+
+news_views = ViewCounter(News, 'views')
+
+
+@atexit.register
+def _flush_on_exit():
+    news_views.flush()
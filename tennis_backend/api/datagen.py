@@ -0,0 +1,369 @@
+"""Детерминированный генератор больших наборов данных для бенчмарков.
+
+Генератор разыгрывает полные сетки на выбывание (от R128 до финала) для всех
+категорий из Tournament.CATEGORY_CHOICES за несколько сезонов. Строки
+отдаются по одному турниру, поэтому в памяти держатся только игроки и
+текущая пачка матчей. Результат пишется либо в базу пачками bulk_create,
+либо в файлы формата COPY для быстрой загрузки в PostgreSQL.
+"""
+import json
+import math
+import os
+import random
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Match, Player, Tournament, TournamentParticipation
+
+ROUND_NAMES = {
+    2: 'Final',
+    4: 'Semifinal',
+    8: 'Quarterfinal',
+    16: 'Round of 16',
+    32: 'Round of 32',
+    64: 'Round of 64',
+    128: 'Round of 128',
+}
+
+# Категория: (турниров за сезон, размер сетки, во сколько раз пул игроков шире сетки).
+# Турниры Большого шлема идут парами: мужская и женская сетка.
+CALENDAR = {
+    'Grand Slam': (8, 128, 1),
+    'ATP Finals': (1, 8, 1),
+    'WTA Finals': (1, 8, 1),
+    'Masters 1000': (9, 64, 2),
+    'WTA 1000': (10, 64, 2),
+    'ATP 500': (13, 32, 4),
+    'WTA 500': (13, 32, 4),
+    'ATP 250': (40, 32, 8),
+    'WTA 250': (30, 32, 8),
+}
+
+PRIZE_MONEY = {
+    'Grand Slam': 50000000, 'ATP Finals': 15000000, 'WTA Finals': 15000000,
+    'Masters 1000': 8000000, 'WTA 1000': 7000000, 'ATP 500': 2500000,
+    'WTA 500': 1500000, 'ATP 250': 700000, 'WTA 250': 300000,
+}
+
+SURFACES = ['Hard', 'Clay', 'Grass']
+COUNTRIES = ['Spain', 'Italy', 'France', 'Germany', 'USA', 'Serbia', 'Czech Republic', 'Japan',
+             'Argentina', 'Australia', 'Poland', 'Canada', 'Brazil', 'Croatia', 'Norway', 'Ukraine']
+FIRST_NAMES = {
+    'ATP': ['Luca', 'Mateo', 'Nikolai', 'Hugo', 'Tomas', 'Felix', 'Andre', 'Kai', 'Rafael', 'Oscar'],
+    'WTA': ['Elena', 'Sofia', 'Maria', 'Anna', 'Chloe', 'Yulia', 'Lucia', 'Nina', 'Clara', 'Mei'],
+}
+LAST_NAMES = ['Novak', 'Garcia', 'Ivanov', 'Rossi', 'Muller', 'Dubois', 'Silva', 'Kowalski',
+              'Petrov', 'Jensen', 'Tanaka', 'Horvat', 'Costa', 'Berg', 'Moreau', 'Lopez']
+PLAYER_IMAGE = 'https://via.placeholder.com/300x300?text=Player'
+
+
+def seeded_bracket(seeds):
+    """Расстановка сеяных по сетке: 1 и 2 встречаются только в финале"""
+    order = [0]
+    while len(order) < len(seeds):
+        size = len(order) * 2
+        order = [x for i in order for x in (i, size - 1 - i)]
+    return [seeds[i] for i in order]
+
+
+def tournament_tour(category, index):
+    if category.startswith('WTA'):
+        return 'WTA'
+    if category == 'Grand Slam':
+        return 'ATP' if index % 2 == 0 else 'WTA'
+    return 'ATP'
+
+
+class DatasetGenerator:
+    """Генератор игроков, турниров и матчей по заданному seed"""
+
+    def __init__(self, players_per_tour=1000, seasons=5, start_year=2020, events_scale=1.0, seed=0):
+        self.players_per_tour = players_per_tour
+        self.seasons = seasons
+        self.start_year = start_year
+        self.events_scale = events_scale
+        self.rng = random.Random(seed)
+        self.created_at = datetime(start_year + seasons, 1, 1, tzinfo=timezone.utc)
+        self.players = self._build_players()
+        self.by_tour = {
+            tour: [p for p in self.players if p['gender'] == tour]
+            for tour in ('ATP', 'WTA')
+        }
+
+    def _uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def _build_players(self):
+        rng = self.rng
+        players = []
+        for tour in ('ATP', 'WTA'):
+            for rank in range(1, self.players_per_tour + 1):
+                players.append({
+                    'id': self._uuid(),
+                    'name': f"{rng.choice(FIRST_NAMES[tour])} {rng.choice(LAST_NAMES)} {tour[0]}{rank}",
+                    'country': rng.choice(COUNTRIES),
+                    'rank': rank,
+                    'points': max(10, int(12000 * rank ** -0.8)),
+                    'gender': tour,
+                    'age': rng.randint(18, 36),
+                    'image_url': PLAYER_IMAGE,
+                    'ace_count': 0,
+                    'double_faults': 0,
+                    'wins': 0,
+                    'losses': 0,
+                    'hard_wins': 0,
+                    'clay_wins': 0,
+                    'grass_wins': 0,
+                    'tournaments_played': 0,
+                    'created_at': self.created_at,
+                    # Скрытая сила игрока и поправки по покрытиям: от них зависит исход матча
+                    '_strength': -math.log(rank) + rng.gauss(0, 0.3),
+                    '_surface': {s: rng.gauss(0, 0.25) for s in SURFACES},
+                })
+        return players
+
+    def win_probability(self, a, b, surface):
+        diff = (a['_strength'] + a['_surface'][surface]) - (b['_strength'] + b['_surface'][surface])
+        return 1 / (1 + math.exp(-1.5 * diff))
+
+    def iter_calendar(self):
+        for season in range(self.start_year, self.start_year + self.seasons):
+            week = 0
+            for category, (count, draw_size, depth) in CALENDAR.items():
+                for index in range(max(1, round(count * self.events_scale))):
+                    yield season, category, index, draw_size, depth, week
+                    week = (week + 1) % 48
+
+    def iter_tournaments(self):
+        """Отдает (турнир, участия, матчи) по одному турниру в виде словарей"""
+        rng = self.rng
+        for season, category, index, draw_size, depth, week in self.iter_calendar():
+            tour = tournament_tour(category, index)
+            field = self.by_tour[tour]
+            size = min(draw_size, 1 << (len(field).bit_length() - 1))
+            if size < 2:
+                continue
+            pool = field[:min(len(field), size * depth)]
+            entrants = sorted(rng.sample(pool, size), key=lambda p: p['rank'])
+
+            start = date(season, 1, 6) + timedelta(weeks=week)
+            if category == 'Grand Slam':
+                surface = ('Hard', 'Clay', 'Grass', 'Hard')[index // 2 % 4]
+            else:
+                surface = SURFACES[index % len(SURFACES)]
+            rounds = size.bit_length() - 1
+            tournament = {
+                'id': self._uuid(),
+                'name': f"{category} {index + 1} {season} ({tour})",
+                'location': rng.choice(COUNTRIES),
+                'start_date': start,
+                'end_date': start + timedelta(days=max(rounds, 6)),
+                'surface': surface,
+                'prize_money': Decimal(PRIZE_MONEY[category]),
+                'category': category,
+                'winner_id': None,
+                'image_url': None,
+                'description': None,
+                'capacity': rng.randint(3000, 15000),
+                'total_matches': size - 1,
+            }
+
+            matches = []
+            wins = {p['id']: 0 for p in entrants}
+            eliminated = []
+            alive = seeded_bracket(entrants)
+            round_index = 0
+            while len(alive) > 1:
+                round_name = ROUND_NAMES[len(alive)]
+                match_date = start + timedelta(days=round_index)
+                next_round = []
+                for i in range(0, len(alive), 2):
+                    a, b = alive[i], alive[i + 1]
+                    winner, loser = (a, b) if rng.random() < self.win_probability(a, b, surface) else (b, a)
+                    matches.append(self._match(tournament, a, b, winner, match_date, round_name, surface))
+                    wins[winner['id']] += 1
+                    eliminated.append(loser)
+                    next_round.append(winner)
+                    self._record_result(winner, loser, surface)
+                alive = next_round
+                round_index += 1
+
+            champion = alive[0]
+            tournament['winner_id'] = champion['id']
+            finishing = [champion] + eliminated[::-1]
+            participations = []
+            for position, player in enumerate(finishing, start=1):
+                player['tournaments_played'] += 1
+                participations.append({
+                    'tournament_id': tournament['id'],
+                    'player_id': player['id'],
+                    'position': position,
+                    'prize_money_earned': None,
+                    'points_earned': 0,
+                    'matches_won': wins[player['id']],
+                    'matches_lost': 0 if player is champion else 1,
+                    'notes': None,
+                })
+            yield tournament, participations, matches
+
+    def _record_result(self, winner, loser, surface):
+        winner['wins'] += 1
+        loser['losses'] += 1
+        winner[f'{surface.lower()}_wins'] += 1
+
+    def _match(self, tournament, a, b, winner, match_date, round_name, surface):
+        rng = self.rng
+        best_of = 5 if tournament['category'] == 'Grand Slam' and a['gender'] == 'ATP' else 3
+        sets = []
+        lost_sets = rng.randint(0, best_of // 2)
+        for i in range(best_of // 2 + 1 + lost_sets):
+            if i < lost_sets:
+                sets.append(rng.choice(('2-6', '3-6', '4-6', '5-7', '6-7')))
+            else:
+                sets.append(rng.choice(('6-1', '6-2', '6-3', '6-4', '7-5', '7-6')))
+        a_aces, b_aces = rng.randint(0, 20), rng.randint(0, 20)
+        a_df, b_df = rng.randint(0, 8), rng.randint(0, 8)
+        a['ace_count'] += a_aces
+        b['ace_count'] += b_aces
+        a['double_faults'] += a_df
+        b['double_faults'] += b_df
+        return {
+            'id': self._uuid(),
+            'tournament_id': tournament['id'],
+            'player1_id': a['id'],
+            'player2_id': b['id'],
+            'winner_id': winner['id'],
+            'date': match_date,
+            'round': round_name,
+            'surface': surface,
+            'sets': sets,
+            'duration_minutes': rng.randint(60, 300),
+            'total_points': rng.randint(100, 320),
+            'player1_aces': a_aces,
+            'player2_aces': b_aces,
+            'player1_double_faults': a_df,
+            'player2_double_faults': b_df,
+            'player1_break_points': rng.randint(0, 12),
+            'player2_break_points': rng.randint(0, 12),
+            'player1_first_serve_percentage': round(rng.uniform(50, 78), 1),
+            'player2_first_serve_percentage': round(rng.uniform(50, 78), 1),
+            'highlights': None,
+            'attendance': rng.randint(500, tournament['capacity']),
+            'created_at': self.created_at,
+        }
+
+    def player_rows(self):
+        return [{k: v for k, v in p.items() if not k.startswith('_')} for p in self.players]
+
+
+def model_columns(model):
+    return [f.attname for f in model._meta.concrete_fields]
+
+
+class DatabaseWriter:
+    """Пишет строки в базу пачками bulk_create"""
+
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.pending = {Tournament: [], TournamentParticipation: [], Match: []}
+        self.counts = {model: 0 for model in (Player,) + tuple(self.pending)}
+
+    def write_players(self, rows):
+        Player.objects.bulk_create([Player(**row) for row in rows], batch_size=self.chunk_size)
+        self.counts[Player] += len(rows)
+
+    def update_players(self, rows):
+        fields = ['wins', 'losses', 'hard_wins', 'clay_wins', 'grass_wins',
+                  'ace_count', 'double_faults', 'tournaments_played']
+        players = [Player(id=row['id'], **{f: row[f] for f in fields}) for row in rows]
+        Player.objects.bulk_update(players, fields, batch_size=self.chunk_size)
+
+    def add(self, tournament, participations, matches):
+        self.pending[Tournament].append(Tournament(**tournament))
+        self.pending[TournamentParticipation].extend(TournamentParticipation(**row) for row in participations)
+        self.pending[Match].extend(Match(**row) for row in matches)
+        if len(self.pending[Match]) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        # Порядок важен из-за внешних ключей: турниры, участия, матчи
+        with transaction.atomic():
+            for model, objs in self.pending.items():
+                model.objects.bulk_create(objs, batch_size=self.chunk_size)
+                self.counts[model] += len(objs)
+                objs.clear()
+
+
+class CopyWriter:
+    """Пишет файлы в текстовом формате COPY PostgreSQL и сценарий загрузки"""
+    models = (Player, Tournament, TournamentParticipation, Match)
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.files = {model: open(self.path(model), 'w', encoding='utf-8') for model in self.models}
+        self.counts = {model: 0 for model in self.models}
+        self.participation_id = 0
+
+    def path(self, model):
+        return os.path.join(self.directory, f'{model._meta.db_table}.tsv')
+
+    @staticmethod
+    def format_value(value):
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return 't' if value else 'f'
+        if isinstance(value, (list, dict)):
+            value = json.dumps(value)
+        elif isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        else:
+            value = str(value)
+        return (value.replace('\\', '\\\\').replace('\t', '\\t')
+                .replace('\n', '\\n').replace('\r', '\\r'))
+
+    def write_rows(self, model, rows):
+        columns = model_columns(model)
+        out = self.files[model]
+        for row in rows:
+            out.write('\t'.join(self.format_value(row.get(c)) for c in columns))
+            out.write('\n')
+        self.counts[model] += len(rows)
+
+    def write_players(self, rows):
+        # Игроки пишутся в конце, когда известна накопленная статистика
+        pass
+
+    def update_players(self, rows):
+        defaults = {f.attname: f.get_default() for f in Player._meta.concrete_fields if f.has_default()}
+        self.write_rows(Player, [dict(defaults, **row) for row in rows])
+
+    def add(self, tournament, participations, matches):
+        for row in participations:
+            self.participation_id += 1
+            row['id'] = self.participation_id
+        self.write_rows(Tournament, [tournament])
+        self.write_rows(TournamentParticipation, participations)
+        self.write_rows(Match, matches)
+
+    def flush(self):
+        for out in self.files.values():
+            out.flush()
+
+    def close(self):
+        for out in self.files.values():
+            out.close()
+        with open(os.path.join(self.directory, 'load.sql'), 'w', encoding='utf-8') as script:
+            script.write('BEGIN;\n')
+            for model in self.models:
+                columns = ', '.join(model_columns(model))
+                script.write(f"\\copy {model._meta.db_table} ({columns}) FROM '{os.path.basename(self.path(model))}'\n")
+            script.write(
+                "SELECT setval(pg_get_serial_sequence('api_tournamentparticipation', 'id'), "
+                "(SELECT COALESCE(MAX(id), 1) FROM api_tournamentparticipation));\n"
+            )
+            script.write('COMMIT;\n')
@@ -0,0 +1,74 @@
+"""Монте-Карло симуляция турнирной сетки на выбывание.
+
+Здесь только расчет на NumPy, без Django: функции выполняются в дочерних
+процессах пула. Все симуляции идут одновременно - строка массива на
+симуляцию, колонка на место в сетке, - так что один круг турнира для всех
+прогонов это одна выборка из матрицы вероятностей и один np.where.
+"""
+import numpy as np
+
+CHUNK_SIZE = 25000
+
+
+def bracket_order(size):
+    """Номера посева (с 1) по местам сетки: 1 и 2 встречаются только в финале"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, total - top)]
+    return order
+
+
+def draw_size(players):
+    return 1 << max(players - 1, 1).bit_length()
+
+
+def round_names(size):
+    """Имена кругов от первого до победы: R128 ... QF, SF, F, W"""
+    names = []
+    while size > 1:
+        names.append({2: 'F', 4: 'SF', 8: 'QF'}.get(size, f'R{size}'))
+        size //= 2
+    return names + ['W']
+
+
+def seeded_slots(players):
+    """Индексы игроков (в порядке посева) по местам сетки; players - это bye.
+
+    Свободные места достаются сильнейшим посеянным: их соперник в первом
+    круге - bye.
+    """
+    return np.array([seed - 1 if seed <= players else players for seed in bracket_order(draw_size(players))],
+                    dtype=np.intp)
+
+
+def simulate_counts(probabilities, simulations, seed=None):
+    """Сколько раз каждый игрок дошел до каждого круга: массив (круги + 1, игроки).
+
+    probabilities[i, j] - вероятность победы i над j, игроки в порядке посева.
+    """
+    players = len(probabilities)
+    slots = seeded_slots(players)
+    # Лишняя строка и колонка для bye: игрок проходит его с вероятностью 1
+    extended = np.zeros((players + 1, players + 1))
+    extended[:players, :players] = probabilities
+    extended[:players, players] = 1.0
+
+    rng = np.random.default_rng(seed)
+    counts = np.zeros((len(round_names(len(slots))), players + 1), dtype=np.int64)
+    for start in range(0, simulations, CHUNK_SIZE):
+        chunk = min(CHUNK_SIZE, simulations - start)
+        alive = np.broadcast_to(slots, (chunk, len(slots)))
+        counts[0] += np.bincount(alive.ravel(), minlength=players + 1)
+        for round_index in range(1, len(counts)):
+            first, second = alive[:, 0::2], alive[:, 1::2]
+            won = rng.random(first.shape) < extended[first, second]
+            alive = np.where(won, first, second)
+            counts[round_index] += np.bincount(alive.ravel(), minlength=players + 1)
+    return counts[:, :players]
+
+
+def split(simulations, parts):
+    """Делит число симуляций между parts задачами"""
+    base, extra = divmod(simulations, parts)
+    return [base + (i < extra) for i in range(parts) if base + (i < extra)]
@@ -0,0 +1,71 @@
+"""Рейтинг Эло игроков: общий и отдельно по каждому покрытию.
+
+Здесь только расчет, без обращения к базе. Коэффициент K убывает с числом
+сыгранных матчей (схема FiveThirtyEight для тенниса): новички быстро
+находят свой уровень, рейтинг опытных игроков меняется медленнее.
+
+EloState хранит рейтинги и счетчики матчей в плоских массивах по индексу
+игрока, поэтому полный прогон истории - это один проход по матчам в
+порядке даты без словарей и объектов на каждый матч.
+"""
+from array import array
+
+INITIAL_RATING = 1500.0
+SURFACES = ('Hard', 'Clay', 'Grass')
+
+
+def k_factor(matches_played):
+    return 250.0 / (matches_played + 5) ** 0.4
+
+
+def expected_score(rating, opponent_rating):
+    """Вероятность победы игрока с рейтингом rating"""
+    return 1.0 / (1.0 + 10.0 ** ((opponent_rating - rating) / 400.0))
+
+
+def updated_ratings(winner_rating, loser_rating, winner_matches, loser_matches):
+    """Новые рейтинги победителя и проигравшего"""
+    delta = 1.0 - expected_score(winner_rating, loser_rating)
+    return (
+        winner_rating + k_factor(winner_matches) * delta,
+        loser_rating - k_factor(loser_matches) * delta,
+    )
+
+
+class EloState:
+    """Рейтинги и число матчей (общие и по покрытиям) в массивах по индексу игрока"""
+
+    def __init__(self, size):
+        self.ratings = array('d', [INITIAL_RATING]) * size
+        self.matches = array('l', [0]) * size
+        self.surface_ratings = {s: array('d', [INITIAL_RATING]) * size for s in SURFACES}
+        self.surface_matches = {s: array('l', [0]) * size for s in SURFACES}
+
+    def play(self, winner, loser, surface):
+        """Учитывает матч и возвращает (до, после) для победителя и проигравшего.
+
+        Каждый элемент - (рейтинг, рейтинг на покрытии); рейтинг на покрытии
+        None, если покрытие неизвестно.
+        """
+        ratings, matches = self.ratings, self.matches
+        before_w, before_l = ratings[winner], ratings[loser]
+        after_w, after_l = updated_ratings(before_w, before_l, matches[winner], matches[loser])
+        ratings[winner], ratings[loser] = after_w, after_l
+        matches[winner] += 1
+        matches[loser] += 1
+
+        surface_before_w = surface_before_l = surface_after_w = surface_after_l = None
+        if surface in self.surface_ratings:
+            s_ratings, s_matches = self.surface_ratings[surface], self.surface_matches[surface]
+            surface_before_w, surface_before_l = s_ratings[winner], s_ratings[loser]
+            surface_after_w, surface_after_l = updated_ratings(
+                surface_before_w, surface_before_l, s_matches[winner], s_matches[loser]
+            )
+            s_ratings[winner], s_ratings[loser] = surface_after_w, surface_after_l
+            s_matches[winner] += 1
+            s_matches[loser] += 1
+
+        return (
+            ((before_w, surface_before_w), (after_w, surface_after_w)),
+            ((before_l, surface_before_l), (after_l, surface_after_l)),
+        )
@@ -0,0 +1,328 @@
+"""Колоночная выгрузка матчей для офлайн-аналитики.
+
+Матчи читаются серверным курсором порциями по CHUNK_SIZE строк, каждая
+порция превращается в колонки NumPy и сразу пишется в поток, так что
+память не зависит от числа строк. Строки берутся из драйвера как есть, без
+конвертеров ORM: создание UUID на каждое значение стоило больше всей
+остальной выгрузки. Игроки и турниры - измерения: в
+колонках матчей хранятся их целые коды (номер строки в таблице измерения,
+-1 - нет значения), сами таблицы измерений выгружаются один раз.
+
+Форматы:
+    npz     - zip с массивами .npy (всегда доступен). Измерения лежат как
+              players/<колонка>.npy и tournaments/<колонка>.npy, матчи - по
+              файлу на порцию: matches/<колонка>/<номер порции>.npy.
+              read_npz() собирает все это обратно в колонки.
+    arrow   - поток Arrow IPC (нужен pyarrow).
+    parquet - Parquet (нужен pyarrow).
+В Arrow и Parquet измерения становятся словарными колонками
+(player1_name, tournament_category, ...): словарь передается один раз, в
+строках остаются только коды.
+"""
+import io
+import json
+import uuid
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+from django.db import connections
+
+from .models import Match, Player, Tournament
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+CHUNK_SIZE = 50000
+
+PLAYER_COLUMNS = ('id', 'name', 'country', 'gender')
+TOURNAMENT_COLUMNS = ('id', 'name', 'location', 'surface', 'category', 'start_date', 'end_date')
+
+ROUNDS = [value for value, _ in Match.ROUND_CHOICES]
+SURFACES = [value for value, _ in Match.SURFACE_CHOICES]
+
+# (колонка, dtype в npz, значение вместо NULL). Для 'S' без длины ширину
+# задает самое длинное значение порции, так что счет не обрезается. Счетчики -
+# int32, как IntegerField в базе: любое сохраненное значение помещается без переполнения
+MATCH_COLUMNS = (
+    ('id', 'S32', b''),
+    ('tournament', np.int32, -1),
+    ('player1', np.int32, -1),
+    ('player2', np.int32, -1),
+    ('winner', np.int32, -1),
+    ('date', 'datetime64[D]', None),
+    ('round', np.int8, -1),
+    ('surface', np.int8, -1),
+    ('sets', 'S', b''),
+    ('duration_minutes', np.int32, -1),
+    ('total_points', np.int32, 0),
+    ('player1_aces', np.int32, 0),
+    ('player2_aces', np.int32, 0),
+    ('player1_double_faults', np.int32, 0),
+    ('player2_double_faults', np.int32, 0),
+    ('player1_break_points', np.int32, 0),
+    ('player2_break_points', np.int32, 0),
+    ('player1_first_serve_percentage', np.float32, np.nan),
+    ('player2_first_serve_percentage', np.float32, np.nan),
+    ('attendance', np.int32, -1),
+)
+
+MATCH_FIELDS = (
+    'id', 'tournament_id', 'player1_id', 'player2_id', 'winner_id', 'date', 'round', 'surface', 'sets',
+    'duration_minutes', 'total_points', 'player1_aces', 'player2_aces',
+    'player1_double_faults', 'player2_double_faults', 'player1_break_points', 'player2_break_points',
+    'player1_first_serve_percentage', 'player2_first_serve_percentage', 'attendance',
+)
+
+# Целые колонки, где -1 означает NULL
+NULLABLE_COLUMNS = ('duration_minutes', 'attendance')
+
+# Колонки матчей, которые ссылаются на измерения
+DIMENSION_COLUMNS = {
+    'tournament': 'tournaments',
+    'player1': 'players',
+    'player2': 'players',
+    'winner': 'players',
+}
+
+
+def available_formats():
+    return ['npz', 'arrow', 'parquet'] if pa is not None else ['npz']
+
+
+class Dimensions:
+    """Таблицы игроков и турниров как колонки NumPy и словари id -> код"""
+
+    def __init__(self):
+        self.tables = {
+            'players': self._load(Player.objects.all(), PLAYER_COLUMNS),
+            'tournaments': self._load(Tournament.objects.all(), TOURNAMENT_COLUMNS),
+        }
+        # Ключи - id в том виде, в каком их отдает драйвер (как и в строках матчей)
+        self.codes = {
+            name: {key: code for code, key in enumerate(table['id'])}
+            for name, table in self.tables.items()
+        }
+        for table in self.tables.values():
+            table['id'] = np.array([_hex(key) for key in table['id']], dtype='S32')
+
+    @staticmethod
+    def _load(queryset, columns):
+        rows = [row for chunk in raw_rows(queryset, columns) for row in chunk]
+        table = {}
+        for position, column in enumerate(columns):
+            values = [row[position] for row in rows]
+            if column == 'id':
+                table[column] = values
+            elif column.endswith('_date'):
+                table[column] = np.array(values, dtype='datetime64[D]')
+            else:
+                table[column] = np.array([value or '' for value in values], dtype=str)
+        return table
+
+
+def _hex(value):
+    """UUID из драйвера (объект или строка, с дефисами или без) -> 32 hex-символа"""
+    return value.hex if isinstance(value, uuid.UUID) else value.replace('-', '')
+
+
+def _sets(value):
+    if isinstance(value, str):
+        value = json.loads(value)
+    return ' '.join(map(str, value or ())).encode()
+
+
+def raw_rows(queryset, fields, chunk_size=CHUNK_SIZE):
+    """Порции строк values_list(*fields) прямо из драйвера, серверным курсором"""
+    sql, params = queryset.order_by().values_list(*fields).query.get_compiler(queryset.db).as_sql()
+    with connections[queryset.db].chunked_cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+
+ROUND_CODES = {label: code for code, label in enumerate(ROUNDS)}
+SURFACE_CODES = {label: code for code, label in enumerate(SURFACES)}
+
+
+def match_chunks(dimensions, queryset=None, chunk_size=CHUNK_SIZE):
+    """Порции матчей как словари колонок NumPy"""
+    queryset = Match.objects.all() if queryset is None else queryset
+    for rows in raw_rows(queryset, MATCH_FIELDS, chunk_size):
+        yield to_columns(rows, dimensions)
+
+
+def to_columns(rows, dimensions):
+    players, tournaments = dimensions.codes['players'], dimensions.codes['tournaments']
+    converters = {
+        'id': lambda value: _hex(value).encode(),
+        'tournament': lambda value: tournaments.get(value, -1),
+        'player1': lambda value: players.get(value, -1),
+        'player2': lambda value: players.get(value, -1),
+        'winner': lambda value: players.get(value, -1),
+        'round': lambda value: ROUND_CODES.get(value, -1),
+        'surface': lambda value: SURFACE_CODES.get(value, -1),
+        'sets': _sets,
+    }
+    columns = {}
+    for position, (name, dtype, null) in enumerate(MATCH_COLUMNS):
+        values = [row[position] for row in rows]
+        convert = converters.get(name)
+        if convert is not None:
+            values = [null if value is None else convert(value) for value in values]
+        elif null is not None:
+            values = [null if value is None else value for value in values]
+        columns[name] = np.array(values, dtype=dtype)
+    return columns
+
+
+class StreamBuffer:
+    """Файловый объект только для записи; накопленное забирает drain()"""
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class NpzWriter:
+    content_type = 'application/zip'
+
+    def __init__(self, fp, dimensions):
+        # У fp нет tell/seek: zipfile пишет без перемотки, с дескрипторами данных
+        self.zip = zipfile.ZipFile(fp, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.chunks = 0
+        for table, columns in dimensions.tables.items():
+            for column, values in columns.items():
+                self._write(f'{table}/{column}.npy', values)
+        self._write('labels/round.npy', np.array(ROUNDS))
+        self._write('labels/surface.npy', np.array(SURFACES))
+
+    def _write(self, name, array):
+        with self.zip.open(name, 'w', force_zip64=True) as entry:
+            np.lib.format.write_array(entry, np.ascontiguousarray(array), allow_pickle=False)
+
+    def write_chunk(self, columns):
+        for name, values in columns.items():
+            self._write(f'matches/{name}/{self.chunks:06d}.npy', values)
+        self.chunks += 1
+
+    def close(self):
+        self.zip.close()
+
+
+class ArrowWriter:
+    """Поток Arrow IPC; измерения - словарные колонки"""
+    content_type = 'application/vnd.apache.arrow.stream'
+
+    def __init__(self, fp, dimensions):
+        self.fp = fp
+        self.dictionaries = {
+            table: {column: pa.array(values if column != 'id' else values.astype(str))
+                    for column, values in columns.items()}
+            for table, columns in dimensions.tables.items()
+        }
+        self.dictionaries['labels'] = {'round': pa.array(ROUNDS), 'surface': pa.array(SURFACES)}
+        self.writer = None
+
+    def _dictionary(self, codes, dictionary):
+        return pa.DictionaryArray.from_arrays(pa.array(codes, mask=codes < 0), dictionary)
+
+    def batch(self, columns):
+        arrays = {}
+        for name, values in columns.items():
+            if name in DIMENSION_COLUMNS:
+                for column, dictionary in self.dictionaries[DIMENSION_COLUMNS[name]].items():
+                    arrays[name if column == 'id' else f'{name}_{column}'] = self._dictionary(values, dictionary)
+            elif name in ('round', 'surface'):
+                arrays[name] = self._dictionary(values, self.dictionaries['labels'][name])
+            elif name in ('id', 'sets'):
+                arrays[name] = pa.array(values.astype(str))
+            elif name in NULLABLE_COLUMNS:
+                arrays[name] = pa.array(values, mask=values < 0)
+            else:
+                arrays[name] = pa.array(values)
+        return pa.RecordBatch.from_pydict(arrays)
+
+    def open(self, schema):
+        return pa.ipc.new_stream(self.fp, schema)
+
+    def write_chunk(self, columns):
+        batch = self.batch(columns)
+        if self.writer is None:
+            self.writer = self.open(batch.schema)
+        self.writer.write_batch(batch)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class ParquetWriter(ArrowWriter):
+    content_type = 'application/vnd.apache.parquet'
+
+    def open(self, schema):
+        return pq.ParquetWriter(self.fp, schema, compression='zstd')
+
+    def write_chunk(self, columns):
+        batch = self.batch(columns)
+        if self.writer is None:
+            self.writer = self.open(batch.schema)
+        self.writer.write_table(pa.Table.from_batches([batch]))
+
+
+WRITERS = {'npz': NpzWriter, 'arrow': ArrowWriter, 'parquet': ParquetWriter}
+
+
+def stream_matches(fmt, queryset=None, chunk_size=CHUNK_SIZE):
+    """Генератор байтов выгрузки: одна порция файла на порцию матчей"""
+    buffer = StreamBuffer()
+    dimensions = Dimensions()
+    writer = WRITERS[fmt](buffer, dimensions)
+    for columns in match_chunks(dimensions, queryset, chunk_size):
+        writer.write_chunk(columns)
+        data = buffer.drain()
+        if data:
+            yield data
+    writer.close()
+    yield buffer.drain()
+
+
+def read_npz(source):
+    """Читает выгрузку npz в {'players': {...}, 'tournaments': {...}, 'labels': {...}, 'matches': {...}}"""
+    tables = defaultdict(dict)
+    chunks = defaultdict(list)
+    with zipfile.ZipFile(source) as archive:
+        for name in sorted(archive.namelist()):
+            with archive.open(name) as entry:
+                array = np.lib.format.read_array(io.BytesIO(entry.read()), allow_pickle=False)
+            parts = name[:-len('.npy')].split('/')
+            if parts[0] == 'matches':
+                chunks[parts[1]].append(array)
+            else:
+                tables[parts[0]][parts[1]] = array
+    tables['matches'] = {
+        name: np.concatenate(chunks[name]) if chunks[name] else np.array([], dtype=dtype)
+        for name, dtype, _ in MATCH_COLUMNS
+    }
+    return dict(tables)
@@ -0,0 +1,88 @@
+"""JSON на orjson: рендерер, парсер и потоковая отдача больших списков.
+
+orjson необязателен: без него рендерер и парсер работают как обычные
+JSONRenderer и JSONParser DRF. С ним вывод совпадает с выводом DRF
+(компактный, UTF-8, с экранированием U+2028/U+2029): UUID и даты orjson
+пишет сам, Decimal, datetime/time, ленивые строки и прочее проходят через
+encoders.JSONEncoder DRF. Если orjson не справился (int больше 64 бит,
+отступы ?indent=), ответ собирается стандартным json. Парсер при ошибке
+orjson отдает тело json, чтобы текст ошибки был прежним; целые больше 64 бит
+orjson читает как float.
+
+Потоковый режим отдает список JSON-массивом по частям: строки читаются
+итератором queryset порциями, каждая порция сериализуется и уходит клиенту,
+так что целиком ответ в памяти не собирается и первые байты уходят сразу.
+"""
+import io
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+STREAM_CHUNK_SIZE = 2000
+
+_encoder = encoders.JSONEncoder()
+
+if orjson is not None:
+    # datetime и time - через DRF: он обрезает микросекунды до миллисекунд и пишет Z
+    DUMPS_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=_encoder.default, option=DUMPS_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как в JSONRenderer: разделители строк JavaScript экранируются
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            # Ошибку (или то, что orjson не читает, вроде огромных int) разбирает json
+            return super().parse(io.BytesIO(body), media_type, parser_context)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def stream_json_array(batches, renderer=None):
+    """Байты JSON-массива из порций (списков) уже сериализованных элементов"""
+    render = (renderer or FastJSONRenderer()).render
+    yield b'['
+    separator = b''
+    for items in batches:
+        if not items:
+            continue
+        yield separator + render(items)[1:-1]
+        separator = b','
+    yield b']'
+
+
+class StreamingJSONResponse(StreamingHttpResponse):
+    """JSON-массив по частям; ошибка посреди потока обрывает ответ, статус уже 200"""
+
+    def __init__(self, batches, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(stream_json_array(batches), **kwargs)
@@ -0,0 +1,228 @@
+import io
+import json
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings, setup_test_environment, teardown_test_environment
+from rest_framework.test import APIClient
+
+from api import chat
+from api.conditional import bump_all
+from api.datagen import DatabaseWriter, DatasetGenerator
+from api.models import HeadToHead, News, Player, Tournament, aggregate_receivers_disconnected
+
+# Размеры наборов данных: игроков в туре, сезонов
+DATASET_SIZES = {
+    'small': (64, 1),
+    'medium': (256, 2),
+    'large': (1024, 3),
+}
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / 'benchmarks' / 'api_baseline.json'
+
+
+def seed_dataset(size):
+    """Заполняет базу набором данных размера size и возвращает id для запросов"""
+    players_per_tour, seasons = DATASET_SIZES[size]
+    with aggregate_receivers_disconnected():
+        for model in (HeadToHead, News, Tournament, Player):
+            model.objects.all().delete()
+
+    generator = DatasetGenerator(players_per_tour=players_per_tour, seasons=seasons, seed=42)
+    writer = DatabaseWriter()
+    writer.write_players(generator.player_rows())
+    for tournament, participations, matches in generator.iter_tournaments():
+        writer.add(tournament, participations, matches)
+    writer.flush()
+    writer.update_players(generator.player_rows())
+    call_command('rebuild_head_to_head', stdout=io.StringIO())
+    call_command('rebuild_player_matches', stdout=io.StringIO())
+    call_command('recompute_season_stats', stdout=io.StringIO())
+    call_command('replay_elo', stdout=io.StringIO())
+
+    News.objects.bulk_create([
+        News(title=f'News {i}', content='Content ' * 50, summary=f'Summary {i}',
+             image_url='https://example.com/news.jpg', category='General', author='Bench',
+             published_date=date(2025, 1, 1) - timedelta(days=i))
+        for i in range(players_per_tour)
+    ])
+    # Очистка и загрузка шли в обход сигналов версий таблиц
+    bump_all()
+
+    # Пара с самой длинной историей встреч: самая тяжелая страница игрока
+    h2h = HeadToHead.objects.order_by('-total_matches').first()
+    return {
+        'player': h2h.player1_id,
+        'other': h2h.player2_id,
+        'news': News.objects.values_list('id', flat=True).first(),
+        'tournament': Tournament.objects.values_list('id', flat=True).first(),
+        'draw': [str(i) for i in Player.objects.filter(gender='ATP').order_by('rank').values_list('id', flat=True)[:32]],
+    }
+
+
+def endpoints(ctx):
+    """(имя, метод, url, данные, бюджет запросов) для каждого маршрута api/urls.py.
+
+    Бюджет - максимальное число SQL-запросов; он не должен зависеть от объема данных.
+    В него входит чтение версий таблиц (api/conditional.py) или их рост после записи.
+    """
+    player, other = ctx['player'], ctx['other']
+    return [
+        ('players-list', 'get', '/api/players/', None, 2),
+        ('players-list-sparse', 'get', '/api/players/?fields=id,name,rank,points,country', None, 2),
+        ('players-atp', 'get', '/api/players/atp/', None, 1),
+        ('players-wta', 'get', '/api/players/wta/', None, 1),
+        ('players-top', 'get', '/api/players/top_players/', None, 1),
+        ('players-atp-page', 'get', '/api/players/atp/?page_size=100', None, 2),
+        ('player-retrieve', 'get', f'/api/players/{player}/', None, 2),
+        ('player-detail', 'get', f'/api/players/{player}/detail/', None, 9),
+        ('player-matches', 'get', f'/api/players/{player}/matches/', None, 2),
+        ('player-matches-surface', 'get', f'/api/players/{player}/matches/?surface=Hard&page_size=50', None, 2),
+        ('news-list', 'get', '/api/news/', None, 2),
+        ('news-featured', 'get', '/api/news/featured/', None, 2),
+        ('news-retrieve', 'get', f"/api/news/{ctx['news']}/", None, 2),
+        ('news-increment-views', 'post', f"/api/news/{ctx['news']}/increment_views/", None, 3),
+        ('tournaments-list', 'get', '/api/tournaments/', None, 3),
+        ('tournaments-retrieve', 'get', f"/api/tournaments/{ctx['tournament']}/", None, 3),
+        ('tournament-simulation', 'get', f"/api/tournaments/{ctx['tournament']}/simulation/?simulations=20000", None, 3),
+        ('matches-recent', 'get', '/api/matches/recent_matches/', None, 1),
+        ('matches-player', 'get', f'/api/matches/player_matches/?player_id={player}', None, 1),
+        ('head-to-head', 'get', f'/api/head-to-head/get_h2h/?player1_id={player}&player2_id={other}', None, 1),
+        ('search', 'get', '/api/search/?q=novak&type=atp', None, 1),
+        ('stats-leaders', 'get', '/api/stats/leaders/', None, 1),
+        ('stats-leaders-metric', 'get', '/api/stats/leaders/?metric=clay_win_rate&gender=WTA&min_matches=5', None, 1),
+        ('predict', 'get', f'/api/predict/?p1={player}&p2={other}&surface=Clay', None, 1),
+        ('predict-draw', 'post', '/api/predict/', {'players': ctx['draw'], 'surface': 'Hard'}, 1),
+        ('profile', 'get', '/api/profile/', None, 3),
+        ('chat-history', 'get', '/api/chat/', None, 1),
+        ('chat', 'post', '/api/chat/', {'message': 'who is world no 1'}, 1),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты API на наборах данных разного размера во временной '
+            'тестовой базе и сравнивает время, число запросов и размер ответа с базовой линией')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='small,medium', help=f"Через запятую из: {', '.join(DATASET_SIZES)}")
+        parser.add_argument('--repeat', type=int, default=5, help='Повторов каждого запроса')
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE))
+        parser.add_argument('--save', action='store_true', help='Записать результаты как новую базовую линию')
+        parser.add_argument('--check', action='store_true', help='Упасть при регрессии относительно базовой линии')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Допустимое относительное замедление (0.5 = на 50%%)')
+        parser.add_argument('--slack-ms', type=float, default=5.0,
+                            help='Абсолютный допуск по времени, чтобы не ловить шум на быстрых запросах')
+
+    def handle(self, *args, **options):
+        sizes = [s.strip() for s in options['sizes'].split(',') if s.strip()]
+        unknown = set(sizes) - set(DATASET_SIZES)
+        if unknown:
+            raise CommandError(f"Unknown sizes: {', '.join(sorted(unknown))}")
+
+        results = {}
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Тестовая база создана только для default: реплики отключены
+            with override_settings(CHAT_FAKE_LATENCY=0, NEWS_VIEWS_FLUSH_INTERVAL=0, DATABASE_REPLICAS=[]):
+                chat.get_model.cache_clear()
+                for size in sizes:
+                    results[size] = self.run_size(size, options['repeat'])
+        finally:
+            chat.get_model.cache_clear()
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.report(results)
+        failures = self.budget_failures(results)
+
+        baseline_path = Path(options['baseline'])
+        if options['check']:
+            if not baseline_path.exists():
+                raise CommandError(f'Baseline {baseline_path} not found; run with --save first')
+            baseline = json.loads(baseline_path.read_text())
+            failures += self.regressions(results, baseline, options['tolerance'], options['slack_ms'])
+
+        if options['save']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True))
+            self.stdout.write(f'Baseline written to {baseline_path}')
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'{len(failures)} benchmark check(s) failed')
+        self.stdout.write(self.style.SUCCESS('All endpoints within budget'))
+
+    def run_size(self, size, repeat):
+        self.stdout.write(f'Seeding {size} dataset...')
+        ctx = seed_dataset(size)
+        user, _ = User.objects.get_or_create(username='benchmark')
+        client = APIClient()
+        client.force_authenticate(user)
+
+        measurements = {}
+        for name, method, url, data, budget in endpoints(ctx):
+            request = getattr(client, method)
+            kwargs = {'format': 'json'} if data is not None else {}
+            # Прогрев: ленивые индексы и кэши строятся здесь, а не в замерах
+            request(url, data, **kwargs)
+
+            timings = []
+            for _ in range(repeat):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = request(url, data, **kwargs)
+                    # У потоковых ответов запросы и сериализация идут при чтении тела
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    raise CommandError(f'{name}: HTTP {response.status_code}')
+            measurements[name] = {
+                'median_ms': round(statistics.median(timings), 3),
+                'min_ms': round(min(timings), 3),
+                'queries': len(queries),
+                'query_budget': budget,
+                'bytes': len(body),
+            }
+        chat.history_pool.submit(lambda: None).result()
+        return measurements
+
+    def report(self, results):
+        for size, measurements in results.items():
+            self.stdout.write(f'\n[{size}]')
+            self.stdout.write(f"{'endpoint':<24}{'median ms':>12}{'queries':>10}{'bytes':>12}")
+            for name, m in measurements.items():
+                self.stdout.write(f"{name:<24}{m['median_ms']:>12.2f}{m['queries']:>10}{m['bytes']:>12}")
+
+    def budget_failures(self, results):
+        return [
+            f"[{size}] {name}: {m['queries']} queries exceeds budget of {m['query_budget']}"
+            for size, measurements in results.items()
+            for name, m in measurements.items()
+            if m['queries'] > m['query_budget']
+        ]
+
+    def regressions(self, results, baseline, tolerance, slack_ms):
+        failures = []
+        for size, measurements in results.items():
+            for name, m in measurements.items():
+                base = baseline.get(size, {}).get(name)
+                if base is None:
+                    continue
+                limit = base['median_ms'] * (1 + tolerance) + slack_ms
+                if m['median_ms'] > limit:
+                    failures.append(f"[{size}] {name}: {m['median_ms']:.2f}ms vs baseline "
+                                    f"{base['median_ms']:.2f}ms (limit {limit:.2f}ms)")
+                if m['queries'] > base['queries']:
+                    failures.append(f"[{size}] {name}: {m['queries']} queries vs baseline {base['queries']}")
+        return failures
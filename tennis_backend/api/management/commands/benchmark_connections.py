@@ -0,0 +1,127 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from api.backends.pool import close_pools, pools
+
+# (режим, изменения настроек базы)
+MODES = (
+    ('new-per-request', {'CONN_MAX_AGE': 0}),
+    ('persistent', {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}),
+    ('pooled', {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True, 'POOL': {'MAX_SIZE': 20}}),
+)
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест соединений с базой: цикл запроса Django (request_started, '
+            'запросы, request_finished) в нескольких потоках с новым соединением на каждый '
+            'запрос, с постоянными соединениями и с пулом. С --asgi каждый запрос идет в '
+            'новом потоке, как синхронный код запроса под ASGI')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на режим')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--queries', type=int, default=1, help='SQL-запросов на запрос')
+        parser.add_argument('--asgi', action='store_true')
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        db_settings = connections.settings[alias]
+        original = dict(db_settings)
+        # Если пул уже включен в настройках, остальные режимы идут через обычный бэкенд
+        plain_engines = {pooled: plain for plain, pooled in settings.POOLED_ENGINES.items()}
+        engine = plain_engines.get(original['ENGINE'], original['ENGINE'])
+        if engine == 'django.db.backends.sqlite3' and original['NAME'] in ('', ':memory:'):
+            raise CommandError('An in-memory SQLite database keeps a single connection; use a file database')
+
+        connections[alias].close()
+        self.stdout.write(
+            f"{connections[alias].vendor}, {options['requests']} requests per mode, {options['threads']} threads"
+            f"{', thread per request (ASGI)' if options['asgi'] else ''}"
+        )
+        self.stdout.write(f"{'mode':<18}{'connects':>10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'req/s':>10}")
+        try:
+            for mode, overrides in MODES:
+                pooled = 'POOL' in overrides
+                if pooled and engine not in settings.POOLED_ENGINES:
+                    self.stdout.write(f'{mode:<18}skipped: no pooled backend for {engine}')
+                    continue
+                db_settings.clear()
+                db_settings.update(original, ENGINE=settings.POOLED_ENGINES[engine] if pooled else engine)
+                db_settings.pop('POOL', None)
+                db_settings.update(overrides)
+                self.report(mode, *self.run(alias, options, pooled))
+        finally:
+            db_settings.clear()
+            db_settings.update(original)
+            close_pools()
+
+    def run(self, alias, options, pooled):
+        opened = []
+        lock = threading.Lock()
+
+        def on_connect(sender, connection, **kwargs):
+            if connection.alias == alias:
+                with lock:
+                    opened.append(1)
+
+        def request():
+            started = time.perf_counter()
+            # То же, что делает обработчик Django вокруг представления
+            request_started.send(sender=self.__class__)
+            try:
+                with connections[alias].cursor() as cursor:
+                    for _ in range(options['queries']):
+                        cursor.execute('SELECT 1')
+                        cursor.fetchone()
+            finally:
+                request_finished.send(sender=self.__class__)
+            return time.perf_counter() - started
+
+        def asgi_request():
+            # Новый поток на запрос, как ThreadSensitiveContext в ASGIHandler
+            result = []
+            thread = threading.Thread(target=lambda: result.append(request()))
+            thread.start()
+            thread.join()
+            return result[0]
+
+        def worker(count):
+            try:
+                return [(asgi_request if options['asgi'] else request)() for _ in range(count)]
+            finally:
+                connections[alias].close()
+
+        opened_by_pools = self.pool_connects(alias)
+        shares = [options['requests'] // options['threads']] * options['threads']
+        shares[0] += options['requests'] - sum(shares)
+        connection_created.connect(on_connect, weak=False)
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(options['threads']) as executor:
+                timings = [t for chunk in executor.map(worker, shares) for t in chunk]
+        finally:
+            connection_created.disconnect(on_connect)
+        elapsed = time.perf_counter() - started
+        # С пулом connection_created срабатывает и на выданные повторно: считаем открытые пулом
+        connects = self.pool_connects(alias) - opened_by_pools if pooled else len(opened)
+        return timings, connects, elapsed
+
+    def pool_connects(self, alias):
+        return sum(pool.stats()['opened'] for (pool_alias, *_), pool in pools().items() if pool_alias == alias)
+
+    def report(self, mode, timings, connects, elapsed):
+        timings_ms = sorted(t * 1000 for t in timings)
+        p95 = timings_ms[int(len(timings_ms) * 0.95) - 1] if timings_ms else 0
+        self.stdout.write(
+            f'{mode:<18}{connects:>10}{statistics.mean(timings_ms):>10.3f}{statistics.median(timings_ms):>10.3f}'
+            f'{p95:>10.3f}{len(timings) / elapsed:>10.0f}'
+        )
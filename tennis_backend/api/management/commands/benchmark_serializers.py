@@ -0,0 +1,116 @@
+import random
+import statistics
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Prefetch
+from django.test.utils import setup_test_environment, teardown_test_environment
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Match, News, Player, Tournament, TournamentParticipation
+from api.serializers import (
+    MatchSerializer, NewsSerializer, PlayerSerializer, TournamentSerializer, values_serializer,
+)
+
+
+def cases():
+    """(имя, сериализатор, queryset как в api/views.py)"""
+    return [
+        ('players', PlayerSerializer, Player.objects.all()),
+        ('news', NewsSerializer, News.objects.all()),
+        ('tournaments', TournamentSerializer,
+         Tournament.objects.prefetch_related(Prefetch('participants', queryset=Player.objects.only('id')))),
+        ('matches', MatchSerializer, Match.objects.select_related('tournament', 'player1', 'player2', 'winner')),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает ModelSerializer и ValuesSerializer на списках из --rows строк '
+            'во временной тестовой базе (запрос + сериализация)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--min-speedup', type=float, default=0,
+                            help='Упасть, если ускорение меньше (0 - только отчет)')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.seed(options['rows'])
+            results = self.measure(options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f"{'list':<14}{'model ms':>12}{'values ms':>12}{'speedup':>10}")
+        failures = []
+        for name, model_ms, values_ms in results:
+            speedup = model_ms / values_ms
+            self.stdout.write(f'{name:<14}{model_ms:>12.1f}{values_ms:>12.1f}{speedup:>9.1f}x')
+            if options['min_speedup'] and speedup < options['min_speedup']:
+                failures.append(f"{name}: {speedup:.1f}x is below {options['min_speedup']}x")
+        if failures:
+            raise CommandError('; '.join(failures))
+
+    def seed(self, rows):
+        rng = random.Random(42)
+        self.stdout.write(f'Seeding {rows} rows per list...')
+        players = Player.objects.bulk_create([
+            Player(name=f'Player {i}', country='ESP', rank=i + 1, points=10000 - i, gender='ATP' if i % 2 else 'WTA',
+                   age=rng.randint(18, 38), image_url='https://example.com/player.jpg',
+                   wins=rng.randint(0, 500), losses=rng.randint(0, 300))
+            for i in range(rows)
+        ], batch_size=1000)
+        News.objects.bulk_create([
+            News(title=f'News {i}', content='Content ' * 50, summary=f'Summary {i}',
+                 image_url='https://example.com/news.jpg', category='General', author='Bench',
+                 published_date=date(2025, 1, 1) - timedelta(days=i % 3000))
+            for i in range(rows)
+        ], batch_size=1000)
+        tournaments = Tournament.objects.bulk_create([
+            Tournament(name=f'Tournament {i}', location='Madrid', start_date=date(2024, 1, 1),
+                       end_date=date(2024, 1, 14), surface='Clay', prize_money=Decimal('1000000.00'),
+                       category='ATP 250')
+            for i in range(rows)
+        ], batch_size=1000)
+        TournamentParticipation.objects.bulk_create([
+            TournamentParticipation(tournament=tournament, player=player)
+            for tournament in tournaments
+            for player in rng.sample(players, 4)
+        ], batch_size=1000)
+        Match.objects.bulk_create([
+            Match(tournament=rng.choice(tournaments), player1=players[i % rows], player2=players[(i + 1) % rows],
+                  winner=players[i % rows] if i % 10 else None, date=date(2024, 1, 1) + timedelta(days=i % 365),
+                  round='Final', surface='Clay', sets=['6-4', '6-3'], player1_aces=rng.randint(0, 20))
+            for i in range(rows)
+        ], batch_size=1000)
+
+    def measure(self, repeat):
+        render = JSONRenderer().render
+        results = []
+        for name, serializer_class, queryset in cases():
+            fast = values_serializer(serializer_class)
+            model_body = render(serializer_class(queryset.all(), many=True).data)
+            values_body = render(fast.to_representation(fast.queryset(queryset.all())))
+            if model_body != values_body:
+                raise CommandError(f'{name}: ValuesSerializer output differs from {serializer_class.__name__}')
+            results.append((
+                name,
+                self.timed(lambda: serializer_class(queryset.all(), many=True).data, repeat),
+                self.timed(lambda: fast.to_representation(fast.queryset(queryset.all())), repeat),
+            ))
+        return results
+
+    def timed(self, func, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,104 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.models import ChatHistory, Match, News, Player, PlayerMatch
+
+from .benchmark_api import DATASET_SIZES, seed_dataset
+
+# Признаки плохого плана: полный проход по таблице или отдельная сортировка
+BAD_PLAN_PATTERNS = {
+    'postgresql': [r'Seq Scan on {table}\b', r'^\s*(->\s*)?Sort\b'],
+    'sqlite': [r'SCAN {table}$', r'USE TEMP B-TREE FOR ORDER BY'],
+}
+
+
+def hot_queries(ctx):
+    """(имя, таблица, queryset) - запросы из api/views.py, которым нужен индекс"""
+    player = ctx['player']
+    first = Player.objects.filter(gender='ATP').order_by('rank').first()
+    return [
+        ('players-ranking', Player._meta.db_table,
+         Player.objects.filter(gender='ATP').order_by('rank')[:100]),
+        # Следующая страница keyset-пагинации, как в PlayerKeysetPagination
+        ('players-keyset', Player._meta.db_table,
+         Player.objects.filter(
+             Q(gender__gt=first.gender) |
+             Q(gender=first.gender, rank__gt=first.rank) |
+             Q(gender=first.gender, rank=first.rank, id__gt=first.id)
+         ).order_by('gender', 'rank', 'id')[:101]),
+        ('matches-recent', Match._meta.db_table, Match.objects.order_by('-date')[:20]),
+        ('matches-player1', Match._meta.db_table, Match.objects.filter(player1_id=player).order_by('-date')),
+        ('matches-player2', Match._meta.db_table, Match.objects.filter(player2_id=player).order_by('-date')),
+        ('player-match-history', PlayerMatch._meta.db_table,
+         PlayerMatch.objects.filter(player_id=player).order_by('-date', '-id')[:21]),
+        ('player-match-surface', PlayerMatch._meta.db_table,
+         PlayerMatch.objects.filter(player_id=player, surface='Hard').order_by('-date', '-id')[:21]),
+        ('news-featured', News._meta.db_table, News.objects.all()[:5]),
+        ('chat-history', ChatHistory._meta.db_table,
+         ChatHistory.objects.filter(user_id=ctx['user']).order_by('-created_at')[:50]),
+    ]
+
+
+class Command(BaseCommand):
+    help = ('Проверяет через EXPLAIN, что горячие запросы API идут по индексам, '
+            'без полного прохода по таблице и без отдельной сортировки')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', default='large', choices=list(DATASET_SIZES),
+                            help='Размер набора данных во временной тестовой базе')
+        parser.add_argument('--verbose-plans', action='store_true', help='Печатать планы целиком')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in BAD_PLAN_PATTERNS:
+            raise CommandError(f'Query plan checks are not supported for {connection.vendor}')
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.stdout.write(f"Seeding {options['size']} dataset...")
+            ctx = seed_dataset(options['size'])
+            ctx['user'] = self.seed_chat_history()
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+            failures = self.check_plans(ctx, options['verbose_plans'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if failures:
+            for failure in failures:
+                self.stderr.write(failure)
+            raise CommandError(f'{len(failures)} query plan check(s) failed')
+        self.stdout.write(self.style.SUCCESS('All hot queries use indexes'))
+
+    def seed_chat_history(self):
+        users = [User.objects.create(username=f'plan-check-{i}') for i in range(20)]
+        ChatHistory.objects.bulk_create([
+            ChatHistory(user=user, message=f'Question {i}', response='Answer')
+            for user in users
+            for i in range(100)
+        ])
+        return users[0].pk
+
+    def check_plans(self, ctx, verbose):
+        failures = []
+        for name, table, queryset in hot_queries(ctx):
+            plan = queryset.explain()
+            bad = [
+                line.strip()
+                for line in plan.splitlines()
+                for pattern in BAD_PLAN_PATTERNS[connection.vendor]
+                if re.search(pattern.format(table=table), line)
+            ]
+            status = 'FAIL' if bad else 'ok'
+            self.stdout.write(f'{name:<24}{status}')
+            if verbose or bad:
+                self.stdout.write(plan)
+            failures += [f'{name}: {line}' for line in bad]
+        return failures
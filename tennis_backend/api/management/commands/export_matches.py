@@ -0,0 +1,45 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from api import export
+from api.models import Match
+
+EXTENSIONS = {'.npz': 'npz', '.arrow': 'arrow', '.arrows': 'arrow', '.parquet': 'parquet'}
+
+
+class Command(BaseCommand):
+    help = ('Выгружает матчи с измерениями игроков и турниров в колоночный файл '
+            '(npz, Arrow или Parquet) порциями через серверный курсор')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Путь к файлу; формат по расширению, если не задан --format')
+        parser.add_argument('--format', dest='file_format', choices=list(export.WRITERS))
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE)
+        parser.add_argument('--since', type=parse_date, help='Матчи с этой даты (YYYY-MM-DD)')
+        parser.add_argument('--until', type=parse_date, help='Матчи по эту дату (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['file_format'] or EXTENSIONS.get(os.path.splitext(output)[1].lower())
+        if file_format is None:
+            raise CommandError('Cannot infer the format from the file extension, pass --format')
+        if file_format not in export.available_formats():
+            raise CommandError(f'Format {file_format} needs pyarrow, which is not installed')
+
+        matches = Match.objects.all()
+        if options['since']:
+            matches = matches.filter(date__gte=options['since'])
+        if options['until']:
+            matches = matches.filter(date__lte=options['until'])
+
+        started = time.monotonic()
+        with open(output, 'wb') as fp:
+            for data in export.stream_matches(file_format, matches, options['chunk_size']):
+                fp.write(data)
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {output} ({os.path.getsize(output) / 2 ** 20:.1f} MiB) '
+            f'in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,73 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api.conditional import bump_all
+from api.datagen import CopyWriter, DatabaseWriter, DatasetGenerator
+from api.models import HeadToHead, Match, Player, SeasonStats, Tournament, aggregate_receivers_disconnected
+
+
+class Command(BaseCommand):
+    help = ('Генерирует детерминированный набор данных для бенчмарков: полные сетки '
+            'турниров за несколько сезонов. Пишет в базу или в файлы COPY.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1000, help='Игроков в каждом туре')
+        parser.add_argument('--seasons', type=int, default=5)
+        parser.add_argument('--start-year', type=int, default=2020)
+        parser.add_argument('--events-scale', type=float, default=1.0,
+                            help='Множитель числа турниров за сезон относительно календаря')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--copy-dir', help='Писать файлы COPY в каталог вместо базы')
+        parser.add_argument('--clear', action='store_true', help='Очистить игроков, турниры и матчи перед загрузкой')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        generator = DatasetGenerator(
+            players_per_tour=options['players'],
+            seasons=options['seasons'],
+            start_year=options['start_year'],
+            events_scale=options['events_scale'],
+            seed=options['seed'],
+        )
+
+        if options['copy_dir']:
+            writer = CopyWriter(options['copy_dir'])
+        else:
+            if options['clear']:
+                self.clear()
+            writer = DatabaseWriter(options['chunk_size'])
+
+        writer.write_players(generator.player_rows())
+        for tournament, participations, matches in generator.iter_tournaments():
+            writer.add(tournament, participations, matches)
+        writer.flush()
+        writer.update_players(generator.player_rows())
+
+        if options['copy_dir']:
+            writer.close()
+            self.stdout.write(f"COPY files written to {options['copy_dir']}; load with "
+                              f"`psql -f load.sql` from that directory, then run rebuild_head_to_head, "
+                              f"rebuild_player_matches, "
+                              f"recompute_season_stats, replay_elo and rebuild_rankings")
+        else:
+            # bulk_create / bulk_update не вызывают сигналы Match и Player
+            call_command('rebuild_head_to_head', batch_size=options['chunk_size'], stdout=self.stdout)
+            call_command('rebuild_player_matches', batch_size=options['chunk_size'], stdout=self.stdout)
+            call_command('recompute_season_stats', batch_size=options['chunk_size'], stdout=self.stdout)
+            call_command('replay_elo', batch_size=options['chunk_size'], stdout=self.stdout)
+            bump_all()
+            call_command('rebuild_rankings', stdout=self.stdout)
+
+        counts = ', '.join(f'{model.__name__}: {count}' for model, count in writer.counts.items())
+        self.stdout.write(self.style.SUCCESS(f'{counts} in {time.monotonic() - started:.1f}s'))
+
+    def clear(self):
+        with aggregate_receivers_disconnected():
+            HeadToHead.objects.all().delete()
+            Match.objects.all().delete()
+            SeasonStats.objects.all().delete()
+            Tournament.objects.all().delete()
+            Player.objects.all().delete()
@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+from django.db.models.functions import RowNumber
+
+from api.conditional import bump
+from api.models import HeadToHead, Match
+
+
+def canonical_matches():
+    """Матчи с id пары в каноническом порядке (low < high)"""
+    player1_first = models.Q(player1_id__lt=models.F('player2_id'))
+    return Match.objects.annotate(
+        low=models.Case(models.When(player1_first, then=models.F('player1_id')), default=models.F('player2_id')),
+        high=models.Case(models.When(player1_first, then=models.F('player2_id')), default=models.F('player1_id')),
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает HeadToHead по всей таблице Match за два GROUP BY-запроса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Счет встреч по парам одним агрегирующим запросом
+        totals = (canonical_matches()
+                  .order_by()
+                  .values('low', 'high')
+                  .annotate(total=models.Count('id'),
+                            low_wins=models.Count('id', filter=models.Q(winner_id=models.F('low'))),
+                            high_wins=models.Count('id', filter=models.Q(winner_id=models.F('high')))))
+
+        # Последняя встреча каждой пары через оконную функцию
+        last_meetings = dict(
+            ((low, high), match_id)
+            for low, high, match_id in canonical_matches()
+            .annotate(position=models.Window(
+                RowNumber(),
+                partition_by=[models.F('low'), models.F('high')],
+                order_by=[models.F('date').desc(), models.F('created_at').desc()],
+            ))
+            .filter(position=1)
+            .values_list('low', 'high', 'id')
+            .iterator(chunk_size=batch_size)
+        )
+
+        rows = [
+            HeadToHead(
+                player1_id=row['low'],
+                player2_id=row['high'],
+                total_matches=row['total'],
+                player1_wins=row['low_wins'],
+                player2_wins=row['high_wins'],
+                last_meeting_id=last_meetings.get((row['low'], row['high'])),
+            )
+            for row in totals.iterator(chunk_size=batch_size)
+        ]
+
+        with transaction.atomic():
+            HeadToHead.objects.all().delete()
+            HeadToHead.objects.bulk_create(rows, batch_size=batch_size)
+        bump(HeadToHead)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(rows)} head-to-head records'))
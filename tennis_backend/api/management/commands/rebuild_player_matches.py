@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.conditional import bump
+from api.models import Match, PlayerMatch
+
+MATCH_FIELDS = ('id', 'player1_id', 'player2_id', 'winner_id', 'tournament_id', 'date', 'surface', 'round')
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает индекс матчей игроков (PlayerMatch) по всей таблице Match'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        matches = Match.objects.order_by().only(*MATCH_FIELDS).iterator(chunk_size=batch_size)
+
+        created = 0
+        with transaction.atomic():
+            PlayerMatch.objects.all().delete()
+            batch = []
+            for match in matches:
+                batch.extend(PlayerMatch.rows_for(match))
+                if len(batch) >= batch_size:
+                    PlayerMatch.objects.bulk_create(batch, batch_size=batch_size)
+                    created += len(batch)
+                    batch = []
+            PlayerMatch.objects.bulk_create(batch, batch_size=batch_size)
+            created += len(batch)
+        bump(PlayerMatch)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {created} player match index rows'))
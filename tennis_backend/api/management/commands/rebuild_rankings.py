@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from api import rankings
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает снимки рейтингов. Нужна после массовых изменений в обход '
+            'сигналов (bulk_update, update(), загрузка через COPY)')
+
+    def handle(self, *args, **options):
+        for name, snapshot in rankings.rebuild_all().items():
+            self.stdout.write(f'{name}: {len(snapshot.body)} bytes, ETag {snapshot.etag}')
+        self.stdout.write(self.style.SUCCESS('Rankings snapshots rebuilt'))
@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models.functions import ExtractYear
+
+from api.conditional import bump
+from api.models import PlayerMatch, SeasonStats, TournamentParticipation
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает SeasonStats по индексу матчей и участиям в турнирах '
+            'двумя GROUP BY-запросами на всю таблицу')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--season', type=int, action='append', dest='seasons',
+                            help='Пересчитать только этот сезон (можно повторять)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        seasons = options['seasons']
+        batch_size = options['batch_size']
+
+        matches = PlayerMatch.objects.order_by()
+        participations = (TournamentParticipation.objects.order_by()
+                          .annotate(season=ExtractYear('tournament__start_date')))
+        existing = SeasonStats.objects.all()
+        if seasons:
+            matches = matches.filter(season__in=seasons)
+            participations = participations.filter(season__in=seasons)
+            existing = existing.filter(season_year__in=seasons)
+
+        match_aggregates = SeasonStats.match_aggregates()
+        defaults = dict.fromkeys(match_aggregates, 0)
+        defaults.update(prize_money=Decimal('0'), points_earned=0)
+
+        stats = {}
+        for row in matches.values('player', 'season').annotate(**match_aggregates).iterator(chunk_size=batch_size):
+            key = (row.pop('player'), row.pop('season'))
+            stats[key] = dict(defaults, **row)
+        participation_rows = participations.values('player', 'season').annotate(**SeasonStats.participation_aggregates())
+        for row in participation_rows.iterator(chunk_size=batch_size):
+            key = (row.pop('player'), row.pop('season'))
+            stats.setdefault(key, dict(defaults)).update(row)
+
+        # Лучший рейтинг из матчей не выводится, переносим его из старых строк
+        career_highs = {
+            (player_id, season_year): ranking
+            for player_id, season_year, ranking in existing.exclude(career_high_ranking=None)
+            .values_list('player_id', 'season_year', 'career_high_ranking').iterator(chunk_size=batch_size)
+        }
+        rows = [
+            SeasonStats(player_id=player_id, season_year=season_year,
+                        career_high_ranking=career_highs.get((player_id, season_year)), **values)
+            for (player_id, season_year), values in stats.items()
+        ]
+
+        with transaction.atomic():
+            existing.delete()
+            SeasonStats.objects.bulk_create(rows, batch_size=batch_size)
+        bump(SeasonStats)
+
+        self.stdout.write(self.style.SUCCESS(f'Recomputed {len(rows)} season stats rows'))
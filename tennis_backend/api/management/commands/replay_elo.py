@@ -0,0 +1,76 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.conditional import bump
+from api.elo import EloState
+from api.models import Match, Player, PlayerRating, RatingHistory
+
+MATCH_FIELDS = ('id', 'player1_id', 'player2_id', 'winner_id', 'surface', 'date')
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает рейтинги Эло с нуля: один потоковый проход по матчам '
+            'в порядке даты с состоянием в массивах')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--no-history', action='store_true',
+                            help='Не записывать RatingHistory (только итоговые рейтинги)')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        write_history = not options['no_history']
+        started = time.monotonic()
+
+        player_ids = list(Player.objects.order_by().values_list('id', flat=True))
+        index = {player_id: i for i, player_id in enumerate(player_ids)}
+        state = EloState(len(player_ids))
+        last_dates = [None] * len(player_ids)
+
+        matches = (Match.objects.filter(winner__isnull=False)
+                   .order_by('date', 'created_at', 'id')
+                   .values_list(*MATCH_FIELDS)
+                   .iterator(chunk_size=batch_size))
+
+        processed = 0
+        with transaction.atomic():
+            RatingHistory.objects.all().delete()
+            history = []
+            for match_id, player1_id, player2_id, winner_id, surface, date in matches:
+                loser_id = player2_id if winner_id == player1_id else player1_id
+                winner, loser = index[winner_id], index[loser_id]
+                changes = state.play(winner, loser, surface)
+                last_dates[winner] = last_dates[loser] = date
+                processed += 1
+                if not write_history:
+                    continue
+                for player_id, (before, after) in ((winner_id, changes[0]), (loser_id, changes[1])):
+                    history.append(RatingHistory(
+                        player_id=player_id, match_id=match_id, date=date, surface=surface,
+                        elo_before=before[0], elo_after=after[0],
+                        surface_elo_before=before[1], surface_elo_after=after[1],
+                    ))
+                if len(history) >= batch_size:
+                    RatingHistory.objects.bulk_create(history)
+                    history = []
+            RatingHistory.objects.bulk_create(history)
+
+            PlayerRating.objects.all().delete()
+            PlayerRating.objects.bulk_create(
+                (self.rating_row(state, i, player_id, last_dates[i])
+                 for i, player_id in enumerate(player_ids) if state.matches[i]),
+                batch_size=batch_size,
+            )
+        # Полный пересчет: кэш признаков прогноза перестраивается целиком
+        bump(PlayerRating)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Replayed {processed} matches in {time.monotonic() - started:.1f}s'
+        ))
+
+    def rating_row(self, state, i, player_id, last_match_date):
+        row = PlayerRating(player_id=player_id, last_match_date=last_match_date)
+        row.store_from(state, i)
+        return row
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api import simulation
+from api.models import Tournament
+
+
+class Command(BaseCommand):
+    help = 'Симулирует сетку турнира методом Монте-Карло и печатает шансы на титул'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_id')
+        parser.add_argument('--simulations', type=int, default=100000)
+        parser.add_argument('--top', type=int, default=10, help='Сколько игроков печатать')
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.get(pk=options['tournament_id'])
+        except (Tournament.DoesNotExist, ValueError):
+            raise CommandError(f"Tournament {options['tournament_id']} not found")
+
+        started = time.monotonic()
+        result = None
+        while result is None:
+            result = simulation.get_simulation(tournament, options['simulations'])
+        elapsed = time.monotonic() - started
+
+        rounds = result['rounds'][1:]
+        self.stdout.write(f"{tournament.name}: {result['draw_size']}-player draw, {result['simulations']} simulations")
+        self.stdout.write(f"{'player':<32}" + ''.join(f'{name:>8}' for name in rounds))
+        for row in result['players'][:options['top']]:
+            self.stdout.write(f"{row['name'][:30]:<32}" + ''.join(f"{row['reach'][name]:>8.3f}" for name in rounds))
+        self.stdout.write(self.style.SUCCESS(f'Done in {elapsed:.2f}s'))
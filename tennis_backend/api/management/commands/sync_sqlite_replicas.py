@@ -0,0 +1,30 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует базу default в реплики, когда обе - файлы SQLite: локальная замена '
+            'репликации для проверки DATABASE_REPLICAS (см. api/replicas.py)')
+
+    def handle(self, *args, **options):
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError('No replicas configured: set DB_REPLICA_NAMES')
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('Only SQLite databases can be copied; real replicas are kept in sync by the server')
+        source.close()
+        with sqlite3.connect(source.settings_dict['NAME']) as primary:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = connections[alias]
+                if replica.vendor != 'sqlite':
+                    raise CommandError(f'{alias} is not an SQLite database')
+                replica.close()
+                target = sqlite3.connect(replica.settings_dict['NAME'])
+                try:
+                    primary.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"{alias}: copied from {source.settings_dict['NAME']}")
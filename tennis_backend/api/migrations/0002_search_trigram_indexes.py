@@ -0,0 +1,39 @@
+from django.db import migrations
+
+# GIN-индексы pg_trgm под фильтр icontains, который Django строит как
+# UPPER("col"::text) LIKE UPPER('%q%'). На других базах миграция ничего не делает.
+TRIGRAM_INDEXES = [
+    ('api_player_name_trgm', 'api_player', 'name'),
+    ('api_player_country_trgm', 'api_player', 'country'),
+    ('api_news_title_trgm', 'api_news', 'title'),
+    ('api_news_summary_trgm', 'api_news', 'summary'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} '
+            f'USING gin (UPPER({column}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_search_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chathistory',
+            name='cached',
+            field=models.BooleanField(default=False, help_text='Answer served from the chat response cache'),
+        ),
+    ]
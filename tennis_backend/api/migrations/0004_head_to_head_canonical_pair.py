@@ -0,0 +1,40 @@
+# Generated by Django 4.2.7 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+def canonicalize_pairs(apps, schema_editor):
+    """Переворачивает пары с player1_id > player2_id и сливает дубликаты"""
+    HeadToHead = apps.get_model('api', 'HeadToHead')
+    for h2h in HeadToHead.objects.select_related('last_meeting').order_by('pk'):
+        if h2h.player1_id < h2h.player2_id:
+            continue
+        existing = HeadToHead.objects.filter(player1_id=h2h.player2_id, player2_id=h2h.player1_id).first()
+        if existing is None:
+            HeadToHead.objects.filter(pk=h2h.pk).update(
+                player1_id=h2h.player2_id, player2_id=h2h.player1_id,
+                player1_wins=h2h.player2_wins, player2_wins=h2h.player1_wins,
+            )
+            continue
+        existing.total_matches += h2h.total_matches
+        existing.player1_wins += h2h.player2_wins
+        existing.player2_wins += h2h.player1_wins
+        if h2h.last_meeting and (not existing.last_meeting or existing.last_meeting.date < h2h.last_meeting.date):
+            existing.last_meeting = h2h.last_meeting
+        existing.save()
+        h2h.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_chathistory_cached'),
+    ]
+
+    operations = [
+        migrations.RunPython(canonicalize_pairs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='headtohead',
+            constraint=models.CheckConstraint(check=models.Q(('player1__lt', models.F('player2'))), name='head_to_head_canonical_pair'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_player_matches(apps, schema_editor):
+    """Две строки индекса на каждый уже существующий матч"""
+    Match = apps.get_model('api', 'Match')
+    PlayerMatch = apps.get_model('api', 'PlayerMatch')
+    batch = []
+    for match in Match.objects.order_by().iterator(chunk_size=5000):
+        for player_id, opponent_id in ((match.player1_id, match.player2_id), (match.player2_id, match.player1_id)):
+            batch.append(PlayerMatch(
+                player_id=player_id, match_id=match.pk, opponent_id=opponent_id,
+                tournament_id=match.tournament_id, date=match.date, season=match.date.year,
+                surface=match.surface, round=match.round,
+                won=None if match.winner_id is None else match.winner_id == player_id,
+            ))
+        if len(batch) >= 5000:
+            PlayerMatch.objects.bulk_create(batch)
+            batch = []
+    PlayerMatch.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerMatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('season', models.PositiveSmallIntegerField()),
+                ('surface', models.CharField(choices=[('Hard', 'Hard'), ('Clay', 'Clay'), ('Grass', 'Grass')], max_length=50)),
+                ('round', models.CharField(choices=[('Final', 'Final'), ('Semifinal', 'Semifinal'), ('Quarterfinal', 'Quarterfinal'), ('Round of 16', 'Round of 16'), ('Round of 32', 'Round of 32'), ('Round of 64', 'Round of 64'), ('Round of 128', 'Round of 128'), ('Qualifying', 'Qualifying')], max_length=50)),
+                ('won', models.BooleanField(help_text='None while the match has no winner', null=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='player_entries', to='api.match')),
+                ('opponent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.player')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='match_index', to='api.player')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.tournament')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['player', '-date', '-id'], name='player_match_history_idx'), models.Index(fields=['player', 'surface', '-date'], name='player_match_surface_idx'), models.Index(fields=['player', 'season', '-date'], name='player_match_season_idx')],
+                'unique_together': {('player', 'match')},
+            },
+        ),
+        migrations.RunPython(fill_player_matches, migrations.RunPython.noop),
+    ]
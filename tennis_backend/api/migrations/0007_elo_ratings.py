@@ -0,0 +1,54 @@
+# Generated by Django 4.2.7 on 2026-10-18 15:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_player_match_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerRating',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='api.player')),
+                ('elo', models.FloatField(default=1500.0)),
+                ('hard_elo', models.FloatField(default=1500.0)),
+                ('clay_elo', models.FloatField(default=1500.0)),
+                ('grass_elo', models.FloatField(default=1500.0)),
+                ('matches', models.IntegerField(default=0)),
+                ('hard_matches', models.IntegerField(default=0)),
+                ('clay_matches', models.IntegerField(default=0)),
+                ('grass_matches', models.IntegerField(default=0)),
+                ('last_match_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['-elo'],
+                'indexes': [models.Index(fields=['-elo'], name='player_rating_elo_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='RatingHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('surface', models.CharField(choices=[('Hard', 'Hard'), ('Clay', 'Clay'), ('Grass', 'Grass')], max_length=50)),
+                ('elo_before', models.FloatField()),
+                ('elo_after', models.FloatField()),
+                ('surface_elo_before', models.FloatField(blank=True, null=True)),
+                ('surface_elo_after', models.FloatField(blank=True, null=True)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_changes', to='api.match')),
+                ('player', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rating_history', to='api.player')),
+            ],
+            options={
+                'verbose_name_plural': 'Rating history',
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['player', '-date', '-id'], name='rating_history_player_idx')],
+                'unique_together': {('player', 'match')},
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_table_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playerrating',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='playerrating',
+            index=models.Index(fields=['version'], name='player_rating_version_idx'),
+        ),
+    ]
@@ -1,9 +1,14 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth.models import User
+from contextlib import contextmanager
+from decimal import Decimal
 import uuid
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.dispatch import receiver
 
+from .elo import INITIAL_RATING, SURFACES as ELO_SURFACES, EloState
+
 class Player(models.Model):
     GENDER_CHOICES = [
         ('ATP', 'ATP'),
@@ -65,6 +70,10 @@ class Player(models.Model):
     
     class Meta:
         ordering = ['rank']
+        indexes = [
+            # Рейтинги по туру и keyset-пагинация по (gender, rank, id)
+            models.Index(fields=['gender', 'rank', 'id'], name='player_gender_rank_idx'),
+        ]
     
     def __str__(self):
         return f"{self.name} ({self.gender}) - Rank {self.rank}"
@@ -103,6 +112,9 @@ class News(models.Model):
     
     class Meta:
         ordering = ['-published_date']
+        indexes = [
+            models.Index(fields=['-published_date'], name='news_published_date_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -218,6 +230,12 @@ class Match(models.Model):
     
     class Meta:
         ordering = ['-date', 'tournament']
+        indexes = [
+            models.Index(fields=['-date', 'tournament'], name='match_date_idx'),
+            # Матчи игрока по дате: по одному индексу на каждую сторону пары
+            models.Index(fields=['player1', '-date'], name='match_player1_date_idx'),
+            models.Index(fields=['player2', '-date'], name='match_player2_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.player1.name} vs {self.player2.name} - {self.tournament.name} ({self.round})"
@@ -233,7 +251,12 @@ class Match(models.Model):
         return self.winner is not None
 
 class HeadToHead(models.Model):
-    """Статистика встреч между двумя игроками"""
+    """Статистика встреч между двумя игроками.
+    
+    Пара хранится в каноническом порядке (player1_id < player2_id), поэтому у
+    каждой пары ровно одна запись и поиск идет по уникальному индексу. Записи
+    поддерживаются сигналами Match, полная пересборка - rebuild_head_to_head.
+    """
     player1 = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='head_to_head_as_player1')
     player2 = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='head_to_head_as_player2')
     total_matches = models.IntegerField(default=0)
@@ -244,10 +267,63 @@ class HeadToHead(models.Model):
     class Meta:
         unique_together = ['player1', 'player2']
         verbose_name_plural = "Head to Head stats"
+        constraints = [
+            models.CheckConstraint(check=models.Q(player1__lt=models.F('player2')), name='head_to_head_canonical_pair'),
+        ]
     
     def __str__(self):
         return f"{self.player1.name} vs {self.player2.name}: {self.player1_wins}-{self.player2_wins}"
     
+    @staticmethod
+    def canonical_pair(player_a_id, player_b_id):
+        """Возвращает id пары в порядке хранения; ValueError для некорректных id"""
+        a, b = uuid.UUID(str(player_a_id)), uuid.UUID(str(player_b_id))
+        return (a, b) if a < b else (b, a)
+    
+    @classmethod
+    def record_match(cls, match):
+        """Инкрементально учитывает новый матч"""
+        low, high = cls.canonical_pair(match.player1_id, match.player2_id)
+        h2h, _ = cls.objects.get_or_create(player1_id=low, player2_id=high)
+        
+        updates = {'total_matches': models.F('total_matches') + 1}
+        if match.winner_id == low:
+            updates['player1_wins'] = models.F('player1_wins') + 1
+        elif match.winner_id == high:
+            updates['player2_wins'] = models.F('player2_wins') + 1
+        cls.objects.filter(pk=h2h.pk).update(**updates)
+        
+        # Последняя встреча двигается только вперед по дате
+        cls.objects.filter(pk=h2h.pk).filter(
+            models.Q(last_meeting__isnull=True) | models.Q(last_meeting__date__lte=match.date)
+        ).update(last_meeting=match)
+    
+    @classmethod
+    def rebuild_pair(cls, player_a_id, player_b_id):
+        """Пересчитывает одну пару по таблице Match (после правки или удаления матча)"""
+        low, high = cls.canonical_pair(player_a_id, player_b_id)
+        matches = Match.objects.filter(
+            models.Q(player1_id=low, player2_id=high) | models.Q(player1_id=high, player2_id=low)
+        )
+        stats = matches.aggregate(
+            total=models.Count('id'),
+            low_wins=models.Count('id', filter=models.Q(winner_id=low)),
+            high_wins=models.Count('id', filter=models.Q(winner_id=high)),
+        )
+        pair = cls.objects.filter(player1_id=low, player2_id=high)
+        if not stats['total']:
+            pair.delete()
+            return
+        last = matches.order_by('-date', '-created_at').values_list('id', flat=True).first()
+        values = {
+            'total_matches': stats['total'],
+            'player1_wins': stats['low_wins'],
+            'player2_wins': stats['high_wins'],
+            'last_meeting_id': last,
+        }
+        if not pair.update(**values):
+            cls.objects.create(player1_id=low, player2_id=high, **values)
+    
     @property
     def player1_win_percentage(self):
         if self.total_matches == 0:
@@ -260,6 +336,63 @@ class HeadToHead(models.Model):
             return 0
         return (self.player2_wins / self.total_matches) * 100
 
+class PlayerMatch(models.Model):
+    """Денормализованный индекс матчей: по строке на каждого игрока матча.
+
+    История игрока (в том числе с фильтром по покрытию или сезону) читается
+    одним диапазонным сканом по индексу вместо OR по player1/player2.
+    Строки поддерживаются сигналами Match; полная пересборка -
+    команда rebuild_player_matches.
+    """
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='match_index')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='player_entries')
+    opponent = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='+')
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='+')
+    date = models.DateField()
+    season = models.PositiveSmallIntegerField()
+    surface = models.CharField(max_length=50, choices=Match.SURFACE_CHOICES)
+    round = models.CharField(max_length=50, choices=Match.ROUND_CHOICES)
+    won = models.BooleanField(null=True, help_text="None while the match has no winner")
+    
+    class Meta:
+        unique_together = ['player', 'match']
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['player', '-date', '-id'], name='player_match_history_idx'),
+            models.Index(fields=['player', 'surface', '-date'], name='player_match_surface_idx'),
+            models.Index(fields=['player', 'season', '-date'], name='player_match_season_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.player_id} vs {self.opponent_id} ({self.date})"
+    
+    @classmethod
+    def rows_for(cls, match):
+        """Две несохраненные строки индекса для матча"""
+        return [
+            cls(
+                player_id=player_id,
+                match_id=match.pk,
+                opponent_id=opponent_id,
+                tournament_id=match.tournament_id,
+                date=match.date,
+                season=match.date.year,
+                surface=match.surface,
+                round=match.round,
+                won=None if match.winner_id is None else match.winner_id == player_id,
+            )
+            for player_id, opponent_id in (
+                (match.player1_id, match.player2_id),
+                (match.player2_id, match.player1_id),
+            )
+        ]
+    
+    @classmethod
+    def sync_match(cls, match):
+        """Перезаписывает строки индекса для нового или исправленного матча"""
+        cls.objects.filter(match_id=match.pk).delete()
+        cls.objects.bulk_create(cls.rows_for(match))
+
 class SeasonStats(models.Model):
     """Статистика игрока за сезон"""
     player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='season_stats')
@@ -297,12 +430,186 @@ class SeasonStats(models.Model):
     def __str__(self):
         return f"{self.player.name} - {self.season_year}"
     
+    @staticmethod
+    def match_aggregates():
+        """Агрегаты по строкам PlayerMatch одного игрока за сезон"""
+        won, lost = models.Q(won=True), models.Q(won=False)
+        aggregates = {
+            'matches_played': models.Count('id'),
+            'wins': models.Count('id', filter=won),
+            'losses': models.Count('id', filter=lost),
+            'tournaments_played': models.Count('tournament', distinct=True),
+            'titles_won': models.Count('id', filter=won & models.Q(round='Final')),
+            'finals_reached': models.Count('id', filter=models.Q(round='Final')),
+            'semifinals_reached': models.Count('id', filter=models.Q(round='Semifinal')),
+            'quarterfinals_reached': models.Count('id', filter=models.Q(round='Quarterfinal')),
+        }
+        for surface, _ in Match.SURFACE_CHOICES:
+            aggregates[f'{surface.lower()}_wins'] = models.Count('id', filter=won & models.Q(surface=surface))
+            aggregates[f'{surface.lower()}_losses'] = models.Count('id', filter=lost & models.Q(surface=surface))
+        return aggregates
+    
+    @staticmethod
+    def participation_aggregates():
+        """Призовые и очки по участиям в турнирах за сезон"""
+        return {
+            'prize_money': Coalesce(models.Sum('prize_money_earned'), models.Value(Decimal('0')),
+                                    output_field=models.DecimalField(max_digits=15, decimal_places=2)),
+            'points_earned': Coalesce(models.Sum('points_earned'), models.Value(0)),
+        }
+    
+    @classmethod
+    def recompute(cls, player_id, season_year):
+        """Пересчитывает одну строку сезона по индексу матчей и участиям.
+        
+        Оба агрегата - диапазонные сканы по индексам одного игрока, поэтому
+        стоимость не зависит от размера таблиц. career_high_ranking из
+        матчей не выводится и не меняется.
+        """
+        values = PlayerMatch.objects.filter(player_id=player_id, season=season_year).aggregate(
+            **cls.match_aggregates()
+        )
+        values.update(TournamentParticipation.objects.filter(
+            player_id=player_id, tournament__start_date__year=season_year
+        ).aggregate(**cls.participation_aggregates()))
+        rows = cls.objects.filter(player_id=player_id, season_year=season_year)
+        if not values['matches_played'] and not values['points_earned'] and not values['prize_money']:
+            rows.delete()
+            return
+        # Игрок мог быть удален в той же транзакции, что и его матчи
+        if not rows.update(**values) and Player.objects.filter(pk=player_id).exists():
+            cls.objects.create(player_id=player_id, season_year=season_year, **values)
+    
     @property
     def win_rate(self):
         if self.matches_played == 0:
             return 0
         return (self.wins / self.matches_played) * 100
 
+class PlayerRating(models.Model):
+    """Текущий рейтинг Эло игрока, общий и по покрытиям.
+    
+    Новый матч обновляет две строки за постоянное время (record_match);
+    исправления и матчи задним числом требуют полного прогона replay_elo.
+    
+    version - значение счетчика VERSION_TABLE на момент последнего изменения
+    строки. Счетчик растет в той же транзакции, что и метки строк, уже после
+    коммита матча, поэтому строки с version больше прочитанного значения - это
+    ровно изменения после чтения, сколько бы ни шли часы серверов и в каком бы
+    порядке ни коммитились матчи.
+    """
+    VERSION_TABLE = 'api.playerrating.rows'
+    
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+    elo = models.FloatField(default=INITIAL_RATING)
+    hard_elo = models.FloatField(default=INITIAL_RATING)
+    clay_elo = models.FloatField(default=INITIAL_RATING)
+    grass_elo = models.FloatField(default=INITIAL_RATING)
+    matches = models.IntegerField(default=0)
+    hard_matches = models.IntegerField(default=0)
+    clay_matches = models.IntegerField(default=0)
+    grass_matches = models.IntegerField(default=0)
+    last_match_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['-elo']
+        indexes = [
+            models.Index(fields=['-elo'], name='player_rating_elo_idx'),
+            models.Index(fields=['version'], name='player_rating_version_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.player_id}: {self.elo:.0f}"
+    
+    def load_into(self, state, i):
+        state.ratings[i], state.matches[i] = self.elo, self.matches
+        for surface in ELO_SURFACES:
+            prefix = surface.lower()
+            state.surface_ratings[surface][i] = getattr(self, f'{prefix}_elo')
+            state.surface_matches[surface][i] = getattr(self, f'{prefix}_matches')
+    
+    def store_from(self, state, i):
+        self.elo, self.matches = state.ratings[i], state.matches[i]
+        for surface in ELO_SURFACES:
+            prefix = surface.lower()
+            setattr(self, f'{prefix}_elo', state.surface_ratings[surface][i])
+            setattr(self, f'{prefix}_matches', state.surface_matches[surface][i])
+    
+    @classmethod
+    def record_match(cls, match):
+        """Инкрементально учитывает сыгранный матч"""
+        if match.winner_id is None:
+            return
+        winner_id = match.winner_id
+        loser_id = match.player2_id if winner_id == match.player1_id else match.player1_id
+        # select_for_update работает только внутри транзакции; сигнал post_save
+        # вызывается и в режиме autocommit
+        with transaction.atomic():
+            for player_id in (winner_id, loser_id):
+                cls.objects.get_or_create(player_id=player_id)
+            # Блокируем обе строки в одном порядке, чтобы параллельные матчи не ждали друг друга по кругу
+            rows = {
+                row.player_id: row
+                for row in cls.objects.select_for_update().filter(player_id__in=[winner_id, loser_id]).order_by('player_id')
+            }
+            winner, loser = rows[winner_id], rows[loser_id]
+            
+            state = EloState(2)
+            winner.load_into(state, 0)
+            loser.load_into(state, 1)
+            changes = state.play(0, 1, match.surface)
+            history = []
+            for position, (row, (before, after)) in enumerate(((winner, changes[0]), (loser, changes[1]))):
+                row.store_from(state, position)
+                if row.last_match_date is None or row.last_match_date < match.date:
+                    row.last_match_date = match.date
+                row.save()
+                history.append(RatingHistory(
+                    player_id=row.player_id, match_id=match.pk, date=match.date, surface=match.surface,
+                    elo_before=before[0], elo_after=after[0],
+                    surface_elo_before=before[1], surface_elo_after=after[1],
+                ))
+            RatingHistory.objects.bulk_create(history)
+        transaction.on_commit(lambda: cls.stamp([winner_id, loser_id]))
+    
+    @classmethod
+    def stamp(cls, player_ids):
+        """Помечает строки игроков следующим значением счетчика VERSION_TABLE"""
+        with transaction.atomic():
+            counter = TableVersion.objects.filter(table=cls.VERSION_TABLE)
+            # UPDATE блокирует строку счетчика до коммита: метки идут в порядке коммитов
+            if not counter.update(version=models.F('version') + 1):
+                TableVersion.objects.bulk_create(
+                    [TableVersion(table=cls.VERSION_TABLE, version=0)], ignore_conflicts=True,
+                )
+                counter.update(version=models.F('version') + 1)
+            version = counter.values_list('version', flat=True).get()
+            cls.objects.filter(player_id__in=player_ids).update(version=version)
+
+class RatingHistory(models.Model):
+    """Изменение рейтинга Эло игрока после матча"""
+    player = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='rating_history')
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='rating_changes')
+    date = models.DateField()
+    surface = models.CharField(max_length=50, choices=Match.SURFACE_CHOICES)
+    elo_before = models.FloatField()
+    elo_after = models.FloatField()
+    surface_elo_before = models.FloatField(null=True, blank=True)
+    surface_elo_after = models.FloatField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['player', 'match']
+        ordering = ['-date', '-id']
+        verbose_name_plural = "Rating history"
+        indexes = [
+            models.Index(fields=['player', '-date', '-id'], name='rating_history_player_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.player_id} {self.date}: {self.elo_before:.0f} -> {self.elo_after:.0f}"
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     favorite_players = models.ManyToManyField(Player, blank=True)
@@ -316,10 +623,25 @@ class ChatHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     response = models.TextField()
+    cached = models.BooleanField(default=False, help_text="Answer served from the chat response cache")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='chat_history_user_created_idx'),
+        ]
+
+class TableVersion(models.Model):
+    """Версия таблицы для ETag и кэшей производных данных (api/conditional.py).
+    
+    Хранится в базе, чтобы ее видели все процессы и команды, которые пишут в таблицу.
+    """
+    table = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+    
+    def __str__(self):
+        return f"{self.table}: {self.version}"
 
 # Signal to create user profile automatically
 @receiver(post_save, sender=User)
@@ -332,4 +654,99 @@ def save_user_profile(sender, instance, **kwargs):
     try:
         instance.userprofile.save()
     except UserProfile.DoesNotExist:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+# Поддержка HeadToHead при изменении матчей
+@receiver(pre_save, sender=Match)
+def remember_match_pair(sender, instance, raw=False, **kwargs):
+    if raw or instance._state.adding:
+        instance._previous_pair = instance._previous_date = None
+        return
+    previous = Match.objects.filter(pk=instance.pk).values_list('player1_id', 'player2_id', 'date').first()
+    instance._previous_pair = previous[:2] if previous else None
+    instance._previous_date = previous[2] if previous else None
+
+@receiver(post_save, sender=Match)
+def update_head_to_head(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        HeadToHead.record_match(instance)
+        return
+    HeadToHead.rebuild_pair(instance.player1_id, instance.player2_id)
+    previous = getattr(instance, '_previous_pair', None)
+    if previous and set(previous) != {instance.player1_id, instance.player2_id}:
+        HeadToHead.rebuild_pair(*previous)
+
+@receiver(post_delete, sender=Match)
+def remove_match_from_head_to_head(sender, instance, **kwargs):
+    HeadToHead.rebuild_pair(instance.player1_id, instance.player2_id)
+
+@receiver(post_save, sender=Match)
+def update_player_match_index(sender, instance, raw=False, **kwargs):
+    # Удаление матча убирает строки индекса каскадом
+    if raw:
+        return
+    PlayerMatch.sync_match(instance)
+
+# Поддержка SeasonStats. Пересчет откладывается до коммита: к этому моменту
+# индекс матчей уже обновлен, а удаленные каскадом игроки уже пропали
+def _recompute_season_stats_on_commit(player_ids, day):
+    if day is None:
+        return
+    for player_id in set(player_ids):
+        transaction.on_commit(lambda player_id=player_id: SeasonStats.recompute(player_id, day.year))
+
+@receiver(post_save, sender=Match)
+def update_season_stats(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    _recompute_season_stats_on_commit((instance.player1_id, instance.player2_id), instance.date)
+    previous_pair = getattr(instance, '_previous_pair', None)
+    if previous_pair:
+        _recompute_season_stats_on_commit(previous_pair, instance._previous_date)
+
+@receiver(post_delete, sender=Match)
+def remove_match_from_season_stats(sender, instance, **kwargs):
+    _recompute_season_stats_on_commit((instance.player1_id, instance.player2_id), instance.date)
+
+@receiver(post_save, sender=TournamentParticipation)
+@receiver(post_delete, sender=TournamentParticipation)
+def update_season_stats_for_participation(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    start_date = Tournament.objects.filter(pk=instance.tournament_id).values_list('start_date', flat=True).first()
+    _recompute_season_stats_on_commit((instance.player_id,), start_date)
+
+# (сигнал, обработчик, отправитель, dispatch_uid); api/conditional.py добавляет
+# сюда обработчики версий таблиц
+AGGREGATE_RECEIVERS = [
+    (post_delete, remove_match_from_head_to_head, Match, None),
+    (post_delete, remove_match_from_season_stats, Match, None),
+    (post_delete, update_season_stats_for_participation, TournamentParticipation, None),
+]
+
+@contextmanager
+def aggregate_receivers_disconnected():
+    """Отключает построчный пересчет агрегатов при массовой очистке таблиц.
+    
+    После нее агрегаты пересобираются командами rebuild_head_to_head и
+    recompute_season_stats, а версии таблиц поднимает conditional.bump_all().
+    """
+    for signal, receiver_func, sender, dispatch_uid in AGGREGATE_RECEIVERS:
+        signal.disconnect(receiver_func, sender=sender, dispatch_uid=dispatch_uid)
+    try:
+        yield
+    finally:
+        for signal, receiver_func, sender, dispatch_uid in AGGREGATE_RECEIVERS:
+            signal.connect(receiver_func, sender=sender, dispatch_uid=dispatch_uid)
+
+# Рейтинг Эло: новый сыгранный матч учитывается сразу
+@receiver(post_save, sender=Match)
+def update_player_ratings(sender, instance, created, raw=False, **kwargs):
+    if raw or instance.winner_id is None:
+        return
+    # Победитель мог появиться при редактировании; уже учтенные матчи не трогаем
+    if not created and RatingHistory.objects.filter(match_id=instance.pk).exists():
+        return
+    PlayerRating.record_match(instance)
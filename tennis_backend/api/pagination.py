@@ -0,0 +1,109 @@
+import base64
+import json
+import uuid
+from collections import OrderedDict
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PlayerKeysetPagination(BasePagination):
+    """Keyset-пагинация рейтинга по (gender, rank, id).
+
+    Курсор хранит ключ последней строки страницы, поэтому следующая страница
+    берется одним диапазонным запросом без OFFSET.
+    """
+    ordering = ('gender', 'rank', 'id')
+    page_size = 100
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def is_requested(self, request):
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, player):
+        # Строка страницы - объект Player или словарь из values()
+        if isinstance(player, dict):
+            key = [player['gender'], player['rank'], str(player['id'])]
+        else:
+            key = [player.gender, player.rank, str(player.id)]
+        raw = json.dumps(key)
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            gender, rank, player_id = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            return str(gender), int(rank), uuid.UUID(player_id)
+        except (TypeError, ValueError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            gender, rank, player_id = position
+            queryset = queryset.filter(
+                Q(gender__gt=gender) |
+                Q(gender=gender, rank__gt=rank) |
+                Q(gender=gender, rank=rank, id__gt=player_id)
+            )
+
+        # Берем на одну строку больше, чтобы узнать, есть ли следующая страница
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SearchPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class PlayerMatchPagination(CursorPagination):
+    """История матчей игрока, новые сверху; курсор вместо OFFSET"""
+    ordering = ('-date', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
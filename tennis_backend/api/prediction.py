@@ -0,0 +1,195 @@
+"""Прогноз исхода матча: логистическая модель над признаками игроков.
+
+Признаки каждого игрока (рейтинг Эло общий и по покрытиям, подача,
+спасенные брейк-пойнты) лежат строками одной матрицы NumPy. Рядом
+в словаре по канонической паре лежат поправки личных встреч, так что
+прогноз не обращается к базе. Кэш обновляется по версиям таблиц: изменение
+Player или полный пересчет рейтингов перестраивает его целиком, а новые
+матчи перечитывают только строки PlayerRating с меткой version новее
+прошлого чтения и личные встречи этих игроков. Читатели получают неизменяемый
+снимок (индекс, матрица, личные встречи), который обновление подменяет целиком.
+
+Модель: logit P(p1 победит) = ELO_SCALE * разница рейтинга (среднее общего и
+рейтинга на покрытии) + поправки на подачу и личные встречи. Без поправок
+это ровно ожидаемый результат Эло, поэтому коэффициенты поправок малы и
+заданы как априорные веса.
+"""
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+from django.db.models import Q
+
+from .conditional import table_versions
+from .elo import INITIAL_RATING
+from .models import HeadToHead, Match, Player, PlayerRating
+
+ELO_SCALE = math.log(10) / 400
+SURFACE_WEIGHT = 0.5
+SERVE_WEIGHT = 0.15
+BREAK_POINTS_WEIGHT = 0.15
+HEAD_TO_HEAD_WEIGHT = 0.5
+# Сглаживание личных встреч: пара с одной встречей почти ничего не сдвигает
+HEAD_TO_HEAD_PRIOR = 4
+
+# Колонки матрицы признаков
+ELO, HARD, CLAY, GRASS, SERVE, BREAK_POINTS = range(6)
+SURFACE_COLUMNS = {'Hard': HARD, 'Clay': CLAY, 'Grass': GRASS}
+RATING_FIELDS = ('player_id', 'elo', 'hard_elo', 'clay_elo', 'grass_elo')
+
+
+def _zscore(values):
+    std = values.std()
+    return (values - values.mean()) / std if std > 0 else np.zeros_like(values)
+
+
+class Features(namedtuple('Features', ['index', 'matrix', 'head_to_head'])):
+    """Неизменяемый снимок признаков: обновление собирает новый и подменяет его одним присваиванием"""
+
+    def rows(self, player_ids):
+        try:
+            return [self.index[player_id] for player_id in player_ids]
+        except KeyError as e:
+            raise Player.DoesNotExist(f'Unknown player {e.args[0]}')
+
+    def head_to_head_term(self, player1_id, player2_id):
+        """(победы - поражения) player1 против player2, сглаженные приором"""
+        if player1_id < player2_id:
+            return self.head_to_head.get((player1_id, player2_id), 0.0)
+        return -self.head_to_head.get((player2_id, player1_id), 0.0)
+
+
+EMPTY = Features({}, np.empty((0, 6)), {})
+
+
+def _load_ratings(snapshot, ratings):
+    updated = []
+    for player_id, *values in ratings.order_by().values_list(*RATING_FIELDS):
+        row = snapshot.index.get(player_id)
+        if row is not None:
+            snapshot.matrix[row, ELO:GRASS + 1] = values
+            updated.append(player_id)
+    return updated
+
+
+def _load_head_to_head(snapshot, pairs):
+    fields = ('player1_id', 'player2_id', 'player1_wins', 'player2_wins', 'total_matches')
+    for player1_id, player2_id, wins1, wins2, total in pairs.order_by().values_list(*fields):
+        # Пара хранится канонически, значение - с точки зрения player1
+        snapshot.head_to_head[player1_id, player2_id] = (wins1 - wins2) / (total + HEAD_TO_HEAD_PRIOR)
+
+
+class FeatureCache:
+    """Матрица признаков игроков (строка на игрока) и поправки личных встреч по парам.
+    
+    Читатели берут snapshot() и работают только с ним; обновление меняет
+    копию под блокировкой и публикует ее целиком.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.versions = None
+        self.current = EMPTY
+
+    def _versions(self):
+        # Последним идет счетчик меток строк PlayerRating: только его изменение
+        # обновляет кэш инкрементально
+        return table_versions(Player, PlayerRating, HeadToHead, PlayerRating.VERSION_TABLE)
+
+    def rebuild(self):
+        players = list(Player.objects.order_by().values_list('id', 'first_serve_percentage', 'break_points_saved'))
+        index = {row[0]: i for i, row in enumerate(players)}
+        matrix = np.full((len(players), 6), INITIAL_RATING)
+        matrix[:, SERVE] = _zscore(np.array([row[1] or 0.0 for row in players], dtype=np.float64))
+        matrix[:, BREAK_POINTS] = _zscore(np.array([row[2] or 0.0 for row in players], dtype=np.float64))
+        snapshot = Features(index, matrix, {})
+        _load_ratings(snapshot, PlayerRating.objects.all())
+        _load_head_to_head(snapshot, HeadToHead.objects.all())
+        return snapshot
+
+    def snapshot(self):
+        """Актуальный снимок признаков"""
+        versions = self._versions()
+        with self.lock:
+            if versions == self.versions:
+                return self.current
+            if self.versions is None or self.versions[:-1] != versions[:-1]:
+                snapshot = self.rebuild()
+            else:
+                # Изменились только рейтинги отдельных игроков: перечитываем строки,
+                # помеченные после прошлого чтения счетчика, и личные встречи этих игроков
+                snapshot = self.current._replace(
+                    matrix=self.current.matrix.copy(), head_to_head=dict(self.current.head_to_head),
+                )
+                updated = _load_ratings(snapshot, PlayerRating.objects.filter(version__gt=self.versions[-1]))
+                if updated:
+                    _load_head_to_head(snapshot, HeadToHead.objects.filter(
+                        Q(player1_id__in=updated) | Q(player2_id__in=updated)
+                    ))
+            self.current, self.versions = snapshot, versions
+            return snapshot
+
+
+features = FeatureCache()
+
+
+def head_to_head_matrix(snapshot, player_ids):
+    n = len(player_ids)
+    result = np.zeros((n, n))
+    for i in range(n):
+        for j in range(i + 1, n):
+            result[i, j] = snapshot.head_to_head_term(player_ids[i], player_ids[j])
+            result[j, i] = -result[i, j]
+    return result
+
+
+def rating_column(matrix, surface):
+    if surface is None:
+        return matrix[:, ELO]
+    return (1 - SURFACE_WEIGHT) * matrix[:, ELO] + SURFACE_WEIGHT * matrix[:, SURFACE_COLUMNS[surface]]
+
+
+def win_probability_matrix(player_ids, surface=None):
+    """P[i, j] - вероятность, что игрок i обыграет игрока j (вся сетка за раз)"""
+    snapshot = features.snapshot()
+    matrix = snapshot.matrix[snapshot.rows(player_ids)]
+    rating = rating_column(matrix, surface)
+    logit = (
+        ELO_SCALE * (rating[:, None] - rating[None, :])
+        + SERVE_WEIGHT * (matrix[:, None, SERVE] - matrix[None, :, SERVE])
+        + BREAK_POINTS_WEIGHT * (matrix[:, None, BREAK_POINTS] - matrix[None, :, BREAK_POINTS])
+        + HEAD_TO_HEAD_WEIGHT * head_to_head_matrix(snapshot, player_ids)
+    )
+    probabilities = 1.0 / (1.0 + np.exp(-logit))
+    np.fill_diagonal(probabilities, 0.5)
+    return probabilities
+
+
+def predict(player1_id, player2_id, surface=None):
+    """Вероятность победы player1 над player2 и использованные признаки.
+
+    Считается скалярно, без запросов к базе: для одной пары это быстрее, чем
+    строить матрицу 2x2.
+    """
+    snapshot = features.snapshot()
+    first, second = snapshot.rows([player1_id, player2_id])
+    row1, row2 = snapshot.matrix[first], snapshot.matrix[second]
+    if surface is None:
+        rating1, rating2 = row1[ELO], row2[ELO]
+    else:
+        column = SURFACE_COLUMNS[surface]
+        rating1 = (1 - SURFACE_WEIGHT) * row1[ELO] + SURFACE_WEIGHT * row1[column]
+        rating2 = (1 - SURFACE_WEIGHT) * row2[ELO] + SURFACE_WEIGHT * row2[column]
+    h2h = snapshot.head_to_head_term(player1_id, player2_id)
+    logit = (
+        ELO_SCALE * (rating1 - rating2)
+        + SERVE_WEIGHT * (row1[SERVE] - row2[SERVE])
+        + BREAK_POINTS_WEIGHT * (row1[BREAK_POINTS] - row2[BREAK_POINTS])
+        + HEAD_TO_HEAD_WEIGHT * h2h
+    )
+    return {
+        'probability': 1.0 / (1.0 + math.exp(-logit)),
+        'ratings': (float(rating1), float(rating2)),
+        'head_to_head': h2h,
+    }
@@ -0,0 +1,298 @@
+"""Профилирование запросов и метрики в текстовом формате Prometheus.
+
+ProfilingMiddleware включается настройкой PROFILING_ENABLED и профилирует
+только долю PROFILING_SAMPLE_RATE запросов; остальные проходят без обертки.
+Для выбранного запроса записываются:
+    - число SQL-запросов и их суммарное время (через execute_wrapper);
+    - повторы: один и тот же SQL (с точностью до параметров) больше одного
+      раза за запрос - типичный признак N+1;
+    - время сериализации (свойство .data сериализаторов DRF и быстрый путь
+      ValuesSerializer, вместе с запросами, которые выполняются во время
+      сериализации);
+    - время рендеринга ответа;
+    - общее время запроса. Потоковые ответы читают базу и сериализуют строки
+      уже при отдаче тела, поэтому для них профиль остается включенным, пока
+      тело не отдано, и записывается после этого (время - вместе с отдачей).
+
+Значения складываются в гистограммы по маршруту (имени url) и методу. Они
+живут в памяти процесса: при нескольких процессах каждый отдает свои
+метрики, как это обычно и собирает Prometheus.
+"""
+import functools
+import hmac
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import BasePermission
+
+from .serializers import ValuesSerializer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+TOP_DUPLICATES = 5
+
+_current = ContextVar('profile', default=None)
+
+
+class Histogram:
+    """Кумулятивная гистограмма Prometheus: счетчики по верхним границам корзин"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            i = len(self.buckets)
+        self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Оценка сверху: граница корзины с квантилем; None - за последней границей"""
+        target, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= target:
+                return bound
+        return None
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RequestProfile:
+    """Замеры одного запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.fingerprints = Counter()
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.fingerprints[sql] += 1
+
+    @property
+    def duplicates(self):
+        return {sql: count for sql, count in self.fingerprints.items() if count > 1}
+
+
+# (метрика, описание, корзины, значение из (профиль, длительность))
+METRICS = (
+    ('api_request_duration_seconds', 'Time until the view returned a response',
+     DURATION_BUCKETS, lambda profile, duration: duration),
+    ('api_db_queries', 'SQL queries per request', QUERY_BUCKETS, lambda profile, duration: profile.queries),
+    ('api_db_duplicate_queries', 'Repeated executions of the same SQL per request (N+1)',
+     QUERY_BUCKETS, lambda profile, duration: sum(c - 1 for c in profile.duplicates.values())),
+    ('api_db_time_seconds', 'Total SQL time per request', DURATION_BUCKETS, lambda profile, duration: profile.sql_time),
+    ('api_serializer_seconds', 'Time spent in serializer .data and ValuesSerializer', DURATION_BUCKETS,
+     lambda profile, duration: profile.serializer_time),
+    ('api_render_seconds', 'Time spent rendering the response', DURATION_BUCKETS,
+     lambda profile, duration: profile.render_time),
+)
+
+
+class Registry:
+    """Гистограммы и самые частые повторяющиеся запросы по маршрутам"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.histograms = defaultdict(lambda: [Histogram(buckets) for _, _, buckets, _ in METRICS])
+            self.duplicates = defaultdict(Counter)
+
+    def record(self, route, method, profile, duration):
+        with self.lock:
+            histograms = self.histograms[route, method]
+            for histogram, (_, _, _, value) in zip(histograms, METRICS):
+                histogram.observe(value(profile, duration))
+            for sql, count in profile.duplicates.items():
+                self.duplicates[route, method][sql] += count - 1
+
+    def render(self, extra_gauges=()):
+        """Текст в формате экспозиции Prometheus 0.0.4"""
+        lines = [
+            '# HELP api_profiling_sample_rate Share of requests that are profiled',
+            '# TYPE api_profiling_sample_rate gauge',
+            f'api_profiling_sample_rate {settings.PROFILING_SAMPLE_RATE}',
+        ]
+        with self.lock:
+            for position, (name, description, _, _) in enumerate(METRICS):
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (route, method), histograms in sorted(self.histograms.items()):
+                    lines += histograms[position].lines(name, f'route="{route}",method="{method}"')
+        for name, description, value in extra_gauges:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} gauge', f'{name} {value}']
+        return '\n'.join(lines) + '\n'
+
+    def hot_paths(self):
+        """Маршруты по суммарному времени с повторяющимися запросами"""
+        with self.lock:
+            report = []
+            for (route, method), histograms in self.histograms.items():
+                duration, queries, _, sql_time, serializer_time, render_time = histograms
+                p95 = duration.quantile(0.95)
+                report.append({
+                    'route': route,
+                    'method': method,
+                    'sampled_requests': duration.count,
+                    'total_seconds': round(duration.sum, 4),
+                    'mean_ms': round(duration.sum / duration.count * 1000, 2),
+                    'p95_ms_upper_bound': p95 * 1000 if p95 is not None else None,
+                    'mean_queries': round(queries.sum / queries.count, 2),
+                    'sql_share': round(sql_time.sum / duration.sum, 3) if duration.sum else 0.0,
+                    'serializer_share': round(serializer_time.sum / duration.sum, 3) if duration.sum else 0.0,
+                    'render_share': round(render_time.sum / duration.sum, 3) if duration.sum else 0.0,
+                    'duplicate_queries': [
+                        {'sql': sql[:300], 'extra_executions': count}
+                        for sql, count in self.duplicates[route, method].most_common(TOP_DUPLICATES)
+                    ],
+                })
+        report.sort(key=lambda row: -row['total_seconds'])
+        return report
+
+
+registry = Registry()
+
+
+def _timed(serialize):
+    """Обертка над сериализацией: время внешнего вызова идет в профиль запроса"""
+
+    @functools.wraps(serialize)
+    def timed(*args, **kwargs):
+        profile = _current.get()
+        if profile is None or profile.serializing:
+            return serialize(*args, **kwargs)
+        profile.serializing = True
+        started = time.perf_counter()
+        try:
+            return serialize(*args, **kwargs)
+        finally:
+            profile.serializer_time += time.perf_counter() - started
+            profile.serializing = False
+    return timed
+
+
+_instrumented = False
+
+
+def instrument_serializers():
+    global _instrumented
+    if _instrumented:
+        return
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        cls.data = property(_timed(cls.data.fget))
+    ValuesSerializer.to_representation = _timed(ValuesSerializer.to_representation)
+    _instrumented = True
+
+
+@contextmanager
+def _profiling(profile):
+    """Профиль текущий для сериализаторов, и через него идут запросы ко всем базам"""
+    token = _current.set(profile)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            yield
+    finally:
+        _current.reset(token)
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """Заголовок "Authorization: Metrics <PROFILING_METRICS_TOKEN>" для сборщика метрик"""
+    keyword = 'Metrics'
+
+    def authenticate(self, request):
+        parts = get_authorization_header(request).split()
+        if len(parts) != 2 or parts[0].decode(errors='replace') != self.keyword:
+            return None
+        token = settings.PROFILING_METRICS_TOKEN
+        if not token or not hmac.compare_digest(parts[1], token.encode()):
+            raise AuthenticationFailed('Invalid metrics token')
+        return AnonymousUser(), self.keyword
+
+    def authenticate_header(self, request):
+        return self.keyword
+
+
+class HasMetricsToken(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == MetricsTokenAuthentication.keyword
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profile = RequestProfile()
+        started = time.perf_counter()
+        with _profiling(profile):
+            response = self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = self.stream(response.streaming_content, request, profile, started)
+        else:
+            self.record(request, profile, started)
+        return response
+
+    def stream(self, content, request, profile, started):
+        try:
+            with _profiling(profile):
+                yield from content
+        finally:
+            self.record(request, profile, started)
+
+    def record(self, request, profile, started):
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        registry.record(route, request.method, profile, time.perf_counter() - started)
+
+    def process_template_response(self, request, response):
+        profile = _current.get()
+        if profile is not None:
+            started = time.perf_counter()
+
+            def rendered(response):
+                profile.render_time += time.perf_counter() - started
+            response.add_post_render_callback(rendered)
+        return response
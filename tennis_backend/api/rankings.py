@@ -0,0 +1,65 @@
+"""Готовые снимки рейтингов для /players/atp/, /players/wta/ и /players/top_players/.
+
+Снимок - это уже отрендеренный JSON вместе с ETag и временем сборки. Он
+хранится в общем кэше (CACHES в settings.py) под версией таблицы игроков из
+базы (см. conditional.py), поэтому любое сохранение или удаление игрока в
+любом процессе делает снимки устаревшими, и следующий запрос собирает их
+заново; команда rebuild_rankings прогревает их сразу для всех процессов.
+"""
+import hashlib
+from collections import namedtuple
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from .conditional import bump, table_version
+from .fastjson import FastJSONRenderer
+from .models import Player
+from .replicas import primary
+from .serializers import PlayerSerializer, values_serializer
+
+Snapshot = namedtuple('Snapshot', ['body', 'etag', 'last_modified'])
+
+SNAPSHOT_TIMEOUT = 24 * 60 * 60
+
+
+def _ranking(gender, limit):
+    serializer = values_serializer(PlayerSerializer)
+    return serializer.to_representation(serializer.queryset(Player.objects.filter(gender=gender)).order_by('rank')[:limit])
+
+
+SNAPSHOTS = {
+    'atp': lambda: _ranking('ATP', 100),
+    'wta': lambda: _ranking('WTA', 100),
+    'top_players': lambda: {
+        'atp_top': _ranking('ATP', 10),
+        'wta_top': _ranking('WTA', 10),
+    },
+}
+
+
+def build_snapshot(name):
+    body = FastJSONRenderer().render(SNAPSHOTS[name]())
+    etag = '"%s"' % hashlib.sha1(body).hexdigest()
+    # Заголовок Last-Modified имеет точность до секунды
+    return Snapshot(body, etag, timezone.now().replace(microsecond=0))
+
+
+def get_snapshot(name):
+    key = f'rankings:{table_version(Player)}:{name}'
+    snapshot = cache.get(key)
+    if snapshot is None:
+        # Из default: снимок с отставшей реплики лег бы в кэш под новой версией
+        with primary():
+            snapshot = build_snapshot(name)
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def invalidate():
+    bump(Player)
+
+
+def rebuild_all():
+    invalidate()
+    return {name: get_snapshot(name) for name in SNAPSHOTS}
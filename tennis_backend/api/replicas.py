@@ -0,0 +1,140 @@
+"""Чтение с реплик для GET-запросов, которые только читают.
+
+Реплики - базы из settings.DATABASE_REPLICAS. ReplicaRouter отправляет на
+них чтение только внутри replica_reads(); его включает ReplicaReadMixin для
+GET/HEAD в представлениях игроков, новостей и турниров. Реплика выбирается
+один раз на запрос, и все его чтения идут в нее: реплики отстают по-разному,
+и запросы одного ответа иначе видели бы разные состояния базы. Все
+остальное, включая любые записи, идет в default.
+
+Read-your-writes: если пользователь сделал не-GET запрос или запрос
+записал что-то через ORM, следующие REPLICA_STICKY_SECONDS секунд его
+чтения идут в default, пока реплики догоняют. Метка хранится в кэше Django
+по id пользователя (кэш общий для процессов, см. CACHES в settings.py).
+
+Кэшируемые производные данные (снимки рейтингов, симуляции сеток) собираются
+из default через primary(): версии таблиц растут после коммита в default, и
+снимок с отставшей реплики иначе лег бы в кэш под новой версией. Ответы
+представлений с реплики тоже могут отставать, но их ETag собирается из версий
+таблиц на той же реплике (api/conditional.py) и меняется вместе с телом.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Имя реплики для чтений, False - только default, None - не задано (default)
+_reads = ContextVar('replica_reads', default=None)
+# Список, куда роутер отмечает записи текущего запроса
+_writes = ContextVar('replica_writes', default=None)
+
+
+def choose_replica():
+    return random.choice(settings.DATABASE_REPLICAS) if settings.DATABASE_REPLICAS else False
+
+
+@contextmanager
+def replica_reads(alias=None):
+    """Чтения внутри блока идут в реплику alias (None - случайную, False - в default)"""
+    token = _reads.set(choose_replica() if alias is None else alias)
+    try:
+        yield
+    finally:
+        _reads.reset(token)
+
+
+def primary():
+    return replica_reads(False)
+
+
+def _pin_key(user_id):
+    return f'replica-pin:{user_id}'
+
+
+def pin(user_id):
+    cache.set(_pin_key(user_id), True, settings.REPLICA_STICKY_SECONDS)
+
+
+def is_pinned(user_id):
+    return cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _reads.get()
+        if alias and alias in settings.DATABASE_REPLICAS:
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        writes = _writes.get()
+        if writes is not None:
+            writes.append(model)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же данные, что и в default
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        return obj1._state.db in databases and obj2._state.db in databases
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaStickinessMiddleware:
+    """После записи пользователя закрепляет его чтения за default на REPLICA_STICKY_SECONDS"""
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        writes = []
+        token = _writes.set(writes)
+        try:
+            response = self.get_response(request)
+        finally:
+            _writes.reset(token)
+        # DRF проставляет пользователя (в том числе по JWT) и в исходный запрос
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated and (request.method not in SAFE_METHODS or writes):
+            pin(user.pk)
+        return response
+
+
+def _stream_from_replica(alias, iterator):
+    with replica_reads(alias):
+        yield from iterator
+
+
+class ReplicaReadMixin:
+    """GET/HEAD читают с реплик, если пользователь недавно ничего не записывал"""
+    _replica_token = None
+    _replica = None
+
+    def use_replicas(self, request):
+        if request.method not in ('GET', 'HEAD') or not settings.DATABASE_REPLICAS:
+            return False
+        return not (request.user.is_authenticated and is_pinned(request.user.pk))
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.use_replicas(request):
+            self._replica = choose_replica()
+            self._replica_token = _reads.set(self._replica)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            _reads.reset(self._replica_token)
+            self._replica_token = None
+            # Потоковый ответ читает базу уже после выхода из представления - с той же реплики
+            if response.streaming:
+                response.streaming_content = _stream_from_replica(self._replica, response.streaming_content)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,154 @@
+"""Полнотекстовый поиск по игрокам и новостям.
+
+В PostgreSQL поиск идет через GIN-индексы pg_trgm (миграция 0002): фильтр
+icontains использует индекс, а ранжирование делает similarity(). На других
+базах (SQLite в разработке и тестах) используется n-граммный индекс в памяти
+процесса, который перестраивается после изменения Player или News.
+"""
+import re
+import threading
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_delete, post_save
+
+from .models import News, Player
+
+MAX_RESULTS = 200
+
+SEARCH_TYPES = {
+    'player': (Player, ('name', 'country'), {}),
+    'atp': (Player, ('name', 'country'), {'gender': 'ATP'}),
+    'wta': (Player, ('name', 'country'), {'gender': 'WTA'}),
+    'news': (News, ('title', 'summary'), {}),
+}
+
+RESULT_FIELDS = {
+    Player: ('id', 'name', 'country', 'rank', 'points', 'gender', 'image_url'),
+    News: ('id', 'title', 'summary', 'image_url', 'category', 'published_date'),
+}
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join((text or '').lower().split())
+
+
+def trigrams(text):
+    """Триграммы в стиле pg_trgm: каждое слово дополняется пробелами"""
+    grams = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query_grams, text):
+    text_grams = trigrams(text)
+    if not query_grams or not text_grams:
+        return 0.0
+    return len(query_grams & text_grams) / len(query_grams | text_grams)
+
+
+class NgramIndex:
+    """Инвертированный индекс подстрок для баз без pg_trgm"""
+    max_n = 3
+
+    def __init__(self):
+        self.docs = {}
+        self.postings = {}
+
+    def add(self, key, texts, payload):
+        self.docs[key] = (texts, payload)
+        for text in texts:
+            for n in range(1, self.max_n + 1):
+                for i in range(len(text) - n + 1):
+                    self.postings.setdefault(text[i:i + n], set()).add(key)
+
+    def candidates(self, query):
+        n = min(len(query), self.max_n)
+        grams = {query[i:i + n] for i in range(len(query) - n + 1)}
+        # Начинаем пересечение с самого короткого списка
+        postings = sorted((self.postings.get(g, set()) for g in grams), key=len)
+        if not postings or not postings[0]:
+            return set()
+        result = set(postings[0])
+        for other in postings[1:]:
+            result &= other
+            if not result:
+                break
+        return result
+
+    def search(self, query, model, filters):
+        query_grams = trigrams(query)
+        hits = []
+        for key in self.candidates(query):
+            if key[0] is not model:
+                continue
+            texts, payload = self.docs[key]
+            if any(payload.get(f) != v for f, v in filters.items()):
+                continue
+            if not any(query in text for text in texts):
+                continue
+            score = max(similarity(query_grams, text) for text in texts)
+            hits.append((score, payload))
+        hits.sort(key=lambda hit: -hit[0])
+        return hits[:MAX_RESULTS]
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def invalidate_index(**kwargs):
+    global _index
+    _index = None
+
+
+def get_index():
+    global _index
+    index = _index
+    if index is not None:
+        return index
+    with _index_lock:
+        if _index is None:
+            index = NgramIndex()
+            for model, fields, _ in (SEARCH_TYPES['player'], SEARCH_TYPES['news']):
+                for row in model.objects.values(*set(RESULT_FIELDS[model]) | set(fields)):
+                    texts = [normalize(row[f]) for f in fields]
+                    payload = {f: row[f] for f in RESULT_FIELDS[model]}
+                    index.add((model, row['id']), texts, payload)
+            _index = index
+        return _index
+
+
+for _model in (Player, News):
+    post_save.connect(invalidate_index, sender=_model, dispatch_uid=f'search-{_model.__name__}-save')
+    post_delete.connect(invalidate_index, sender=_model, dispatch_uid=f'search-{_model.__name__}-delete')
+
+
+def search_postgres(query, model, fields, filters):
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    score = Greatest(*[TrigramSimilarity(field, query) for field in fields])
+    rows = (model.objects.filter(condition, **filters)
+            .annotate(score=score)
+            .order_by('-score')
+            .values('score', *RESULT_FIELDS[model])[:MAX_RESULTS])
+    return [(row.pop('score'), row) for row in rows]
+
+
+def search(query, kind):
+    """Возвращает список (score, row) по убыванию релевантности"""
+    query = normalize(query)
+    if not query:
+        return []
+    model, fields, filters = SEARCH_TYPES[kind]
+    if connection.vendor == 'postgresql':
+        return search_postgres(query, model, fields, filters)
+    return get_index().search(query, model, filters)
@@ -1,6 +1,12 @@
+from datetime import date, timezone as dt_timezone
+from functools import lru_cache
+
+from django.db import connections
+from django.utils.timezone import is_aware, make_aware, make_naive
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
 from django.contrib.auth.models import User
-from .models import Player, News, Tournament, UserProfile, ChatHistory, TournamentParticipation, Match, HeadToHead, SeasonStats
+from .models import Player, News, Tournament, UserProfile, ChatHistory, TournamentParticipation, Match, HeadToHead, SeasonStats, PlayerMatch
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
 class UserSerializer(serializers.ModelSerializer):
@@ -32,7 +38,16 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         return token
 
-class PlayerSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """Позволяет оставить в выдаче только часть полей (fields=[...])"""
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class PlayerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Player
         fields = '__all__'
@@ -112,6 +127,16 @@ class HeadToHeadSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id']
 
+class PlayerMatchSerializer(serializers.ModelSerializer):
+    opponent_name = serializers.CharField(source='opponent.name', read_only=True)
+    tournament_name = serializers.CharField(source='tournament.name', read_only=True)
+    sets = serializers.JSONField(source='match.sets', read_only=True)
+    
+    class Meta:
+        model = PlayerMatch
+        fields = ['match', 'date', 'season', 'tournament', 'tournament_name', 'round', 'surface',
+                  'opponent', 'opponent_name', 'won', 'sets']
+
 class SeasonStatsSerializer(serializers.ModelSerializer):
     player_name = serializers.CharField(source='player.name', read_only=True)
     
@@ -136,4 +161,146 @@ class PlayerDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Player
         fields = '__all__'
-        read_only_fields = ['id', 'created_at']
\ No newline at end of file
+        read_only_fields = ['id', 'created_at']
+
+class ValuesSerializer:
+    """Быстрая сериализация списков по плану, построенному из ModelSerializer.
+    
+    Строки читаются через values(), для каждого поля конвертер выбирается
+    один раз: строки, числа, bool, JSON и первичные ключи связей из базы уже
+    совпадают с выводом DRF и копируются как есть, остальные (UUID, даты,
+    Decimal) проходят через to_representation того же поля DRF. Вывод
+    совпадает с serializer_class(..., many=True).data.
+    
+    Для UUID, дат и времени в формате ISO 8601 конвертеры упрощены до прямых
+    вызовов (str, isoformat) с тем же результатом, что и у полей DRF: их
+    to_representation на каждое значение заново смотрит настройки и часовой
+    пояс. Часовой пояс для DateTimeField определяется один раз на список.
+    
+    Поля со связью через точку (source='player1.name') читаются джойном; если
+    связи нет (winner = NULL), DRF такое поле пропускает, и здесь тоже.
+    Поля ManyToMany (participants) добираются одним запросом на весь список.
+    """
+    PLAIN_FIELDS = (
+        serializers.CharField, serializers.ChoiceField, serializers.IntegerField, serializers.FloatField,
+        serializers.BooleanField, serializers.JSONField, serializers.PrimaryKeyRelatedField,
+    )
+    
+    def __init__(self, serializer_class, fields=None):
+        serializer = serializer_class(fields=list(fields)) if fields is not None else serializer_class()
+        self.model = serializer.Meta.model
+        self.pk_lookup = self.model._meta.pk.attname
+        self.fields = []        # (имя, lookup в values())
+        self.converters = []    # (имя, to_representation)
+        self.optional = []      # имена полей через связь
+        self.many_related = []  # (имя, поле ManyToMany модели)
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ManyRelatedField):
+                self.fields.append((name, self.pk_lookup))
+                self.many_related.append((name, self.model._meta.get_field(field.source)))
+                continue
+            path = field.source.split('.')
+            if len(path) > 1:
+                self.fields.append((name, '__'.join(path)))
+                self.optional.append(name)
+            else:
+                self.fields.append((name, self.model._meta.get_field(field.source).attname))
+            if not isinstance(field, self.PLAIN_FIELDS):
+                self.converters.append((name, field))
+        self.lookups = list(dict.fromkeys(lookup for _, lookup in self.fields))
+        # Строку из values() можно отдать как есть, если ключи совпадают с именами полей
+        self.same_keys = not self.many_related and all(name == lookup for name, lookup in self.fields)
+    
+    def queryset(self, queryset, *extra):
+        """values() со всеми нужными колонками; extra - дополнительные (ключ пагинации)"""
+        lookups = self.lookups + [lookup for lookup in extra if lookup not in self.lookups]
+        return queryset.prefetch_related(None).values(*lookups)
+    
+    @staticmethod
+    def converter(field):
+        """Функция для значения поля: прямая для UUID и дат в ISO 8601, иначе to_representation"""
+        if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+            return str
+        if isinstance(field, serializers.DateField):
+            output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+            if output_format is not None and output_format.lower() == ISO_8601:
+                return date.isoformat
+        if isinstance(field, serializers.DateTimeField):
+            output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+            if output_format is not None and output_format.lower() == ISO_8601:
+                return ValuesSerializer.datetime_converter(
+                    field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+                )
+        return field.to_representation
+    
+    @staticmethod
+    def datetime_converter(field_timezone):
+        """То же, что DateTimeField.enforce_timezone + isoformat, для заданного часового пояса"""
+        def to_iso(value):
+            if field_timezone is not None:
+                value = value.astimezone(field_timezone) if is_aware(value) else make_aware(value, field_timezone)
+            elif is_aware(value):
+                value = make_naive(value, dt_timezone.utc)
+            value = value.isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return to_iso
+    
+    def to_representation(self, rows):
+        rows = list(rows)
+        fields, optional = self.fields, self.optional
+        converters = [(name, self.converter(field)) for name, field in self.converters]
+        if self.same_keys and rows and len(rows[0]) == len(fields):
+            data = rows
+        else:
+            data = [{name: row[lookup] for name, lookup in fields} for row in rows]
+        for item in data:
+            for name, convert in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+            for name in optional:
+                if item[name] is None:
+                    del item[name]
+        for name, model_field in self.many_related:
+            # id строк берутся до конвертации: в data они уже строки
+            related = self.related_ids(model_field, [row[self.pk_lookup] for row in rows])
+            for item, row in zip(data, rows):
+                item[name] = related.get(row[self.pk_lookup], [])
+        return data
+    
+    def related_ids(self, model_field, keys):
+        """{id строки: [id связанных]} по промежуточной таблице, в порядке связанной модели.
+        
+        Пары читаются из драйвера без конвертеров ORM (как в api/export.py):
+        объект UUID на каждое значение стоил дороже всей остальной сериализации.
+        Ключи и id приводятся к строкам UUID, как их отдает DRF.
+        """
+        through = model_field.remote_field.through
+        source, target = model_field.m2m_field_name(), model_field.m2m_reverse_field_name()
+        ordering = [
+            f'-{target}__{name[1:]}' if name.startswith('-') else f'{target}__{name}'
+            for name in model_field.related_model._meta.ordering
+        ]
+        queryset = (through.objects.filter(**{f'{source}__in': keys})
+                    .order_by(*ordering).values_list(f'{source}_id', f'{target}_id'))
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            pairs = cursor.fetchall()
+        related = {}
+        for key, related_id in pairs:
+            related.setdefault(uuid_str(key), []).append(uuid_str(related_id))
+        return {key: related.get(str(key), []) for key in keys}
+
+def uuid_str(value):
+    """UUID из драйвера: объект (PostgreSQL) или 32 hex-символа (SQLite) -> строка с дефисами"""
+    if isinstance(value, str) and len(value) == 32:
+        return f'{value[:8]}-{value[8:12]}-{value[12:16]}-{value[16:20]}-{value[20:]}'
+    return str(value)
+
+@lru_cache(maxsize=64)
+def values_serializer(serializer_class, fields=None):
+    """Закэшированный план ValuesSerializer; fields - кортеж имен полей или None"""
+    return ValuesSerializer(serializer_class, fields)
@@ -0,0 +1,159 @@
+"""Шансы участников турнира по кругам: симуляция сетки в пуле процессов.
+
+Участники сеются по рейтингу, вероятности пар берутся из модели прогноза
+(api/prediction.py) с учетом покрытия турнира. Симуляции делятся между
+процессами пула, поток запроса только ждет результат ограниченное время.
+Готовый результат лежит в кэше Django под ключом из версий таблиц, от
+которых он зависит, поэтому пересчет нужен только после изменения
+участников, игроков или матчей. Одинаковые одновременные запросы делят
+одну задачу.
+"""
+import hashlib
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import draw, prediction
+from .conditional import table_versions
+from .models import HeadToHead, Match, Player, PlayerRating, Tournament, TournamentParticipation
+from .replicas import primary
+
+VERSION_MODELS = (Tournament, TournamentParticipation, Player, PlayerRating, HeadToHead, Match, PlayerRating.VERSION_TABLE)
+RESULT_TIMEOUT = 60 * 60 * 24
+
+_pool = None
+_pool_lock = threading.Lock()
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def get_pool(broken=None):
+    """Пул создается при первой симуляции; spawn - чтобы не форкать потоки сервера.
+
+    broken - пул, в котором умер процесс: он заменяется новым.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool is broken:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DRAW_SIMULATION_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _pool
+
+
+def result_key(tournament_id, simulations):
+    versions = ','.join(str(version) for version in table_versions(*VERSION_MODELS))
+    digest = hashlib.sha1(versions.encode()).hexdigest()[:16]
+    return f'draw-simulation:{tournament_id}:{simulations}:{digest}'
+
+
+def seeded_players(tournament):
+    """Участники в порядке посева: по рейтингу, затем по имени"""
+    return list(
+        Player.objects.filter(tournamentparticipation__tournament=tournament)
+        .order_by('rank', 'name')
+        .only('id', 'name', 'country', 'rank')
+    )
+
+
+def build_result(tournament, players, simulations, counts):
+    rounds = draw.round_names(draw.draw_size(len(players)))
+    reach = counts / simulations
+    rows = [
+        {
+            'id': player.id,
+            'name': player.name,
+            'country': player.country,
+            'rank': player.rank,
+            'seed': seed,
+            'reach': {name: round(float(p), 4) for name, p in zip(rounds, reach[:, seed - 1])},
+        }
+        for seed, player in enumerate(players, start=1)
+    ]
+    rows.sort(key=lambda row: (-row['reach']['W'], row['seed']))
+    return {
+        'tournament': tournament.id,
+        'surface': tournament.surface,
+        'simulations': simulations,
+        'draw_size': draw.draw_size(len(players)),
+        'rounds': rounds,
+        'players': rows,
+    }
+
+
+class SimulationJob:
+    """Части одной симуляции в пуле; результат собирается после последней"""
+
+    def __init__(self, key, tournament, players, simulations, futures):
+        self.key = key
+        self.tournament = tournament
+        self.players = players
+        self.simulations = simulations
+        self.futures = futures
+        self.pending = len(futures)
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        for future in futures:
+            future.add_done_callback(self.collect)
+
+    def collect(self, future):
+        with self.lock:
+            self.pending -= 1
+            if self.pending:
+                return
+        try:
+            counts = sum(f.result() for f in self.futures)
+            cache.set(self.key, build_result(self.tournament, self.players, self.simulations, counts),
+                      timeout=RESULT_TIMEOUT)
+        finally:
+            # При ошибке в процессе результата в кэше нет, следующий запрос запустит задачу заново
+            with _jobs_lock:
+                _jobs.pop(self.key, None)
+            self.done.set()
+
+
+def start(tournament, simulations):
+    """Запускает симуляцию (или возвращает уже идущую) для текущих версий таблиц"""
+    key = result_key(tournament.id, simulations)
+    with _jobs_lock:
+        job = _jobs.get(key)
+    if job is not None:
+        return key, job
+
+    # Результат кэшируется под версиями таблиц, поэтому данные - из default, не с реплики
+    with primary():
+        players = seeded_players(tournament)
+        surface = tournament.surface if tournament.surface in prediction.SURFACE_COLUMNS else None
+        probabilities = prediction.win_probability_matrix([player.id for player in players], surface)
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None:
+            futures = submit(probabilities, simulations)
+            job = _jobs[key] = SimulationJob(key, tournament, players, simulations, futures)
+    return key, job
+
+
+def submit(probabilities, simulations):
+    parts = draw.split(simulations, settings.DRAW_SIMULATION_WORKERS)
+    pool = get_pool()
+    try:
+        return [pool.submit(draw.simulate_counts, probabilities, part) for part in parts]
+    except BrokenProcessPool:
+        pool = get_pool(broken=pool)
+        return [pool.submit(draw.simulate_counts, probabilities, part) for part in parts]
+
+
+def get_simulation(tournament, simulations, wait=None):
+    """Результат симуляции или None, если он еще считается дольше wait секунд"""
+    key = result_key(tournament.id, simulations)
+    result = cache.get(key)
+    if result is not None:
+        return result
+    key, job = start(tournament, simulations)
+    job.done.wait(settings.DRAW_SIMULATION_WAIT if wait is None else wait)
+    return cache.get(key)
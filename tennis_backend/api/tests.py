@@ -0,0 +1,739 @@
+import base64
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import OperationalError, ProgrammingError, connections, transaction
+from django.db.models import F
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api import chat, draw, export, prediction, profiling, rankings, replicas, search
+from api.backends import pool
+from api.backends.pooled_sqlite.base import DatabaseWrapper as PooledSQLiteWrapper
+from api.conditional import bump, bump_all, table_version
+from api.counters import ViewCounter
+from api.models import (
+    HeadToHead, Match, News, Player, PlayerRating, RatingHistory, SeasonStats, TableVersion, Tournament,
+    TournamentParticipation, aggregate_receivers_disconnected,
+)
+from api.serializers import MatchSerializer, PlayerSerializer, values_serializer
+
+
+def create_player(index, **kwargs):
+    values = dict(
+        name=f'Player {index}', country='ESP', rank=index + 1, points=10000 - index, gender='ATP',
+        image_url='https://example.com/player.jpg',
+    )
+    return Player.objects.create(**dict(values, **kwargs))
+
+
+def create_tournament(index=0):
+    return Tournament.objects.create(
+        name=f'Tournament {index}', location='Madrid', start_date=datetime.date(2024, 1, 1),
+        end_date=datetime.date(2024, 1, 14), surface='Clay', prize_money=Decimal('1000000.00'), category='ATP 250',
+    )
+
+
+def create_matches(player, opponents, tournament, count):
+    for i in range(count):
+        opponent = opponents[i % len(opponents)]
+        player1, player2 = (player, opponent) if i % 2 else (opponent, player)
+        Match.objects.create(
+            tournament=tournament, player1=player1, player2=player2, winner=player1,
+            date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i), round='Final', surface='Clay',
+            sets=['6-4', '6-3'],
+        )
+
+
+class PlayerDetailQueriesTest(TestCase):
+    """Число запросов /api/players/<id>/detail/ не зависит от числа матчей игрока"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('detail'))
+        self.tournament = create_tournament()
+        self.player = create_player(0)
+        self.opponents = [create_player(i) for i in range(1, 6)]
+        for player in [self.player, *self.opponents]:
+            TournamentParticipation.objects.create(tournament=self.tournament, player=player)
+        bump_all()
+
+    def detail_queries(self):
+        url = reverse('player-full-detail', args=[self.player.id])
+        # Версии таблиц для ETag и 8 запросов самого ответа
+        with self.assertNumQueries(9):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_is_constant(self):
+        create_matches(self.player, self.opponents, self.tournament, 2)
+        few = self.detail_queries()
+
+        create_matches(self.player, self.opponents, self.tournament, 30)
+        many = self.detail_queries()
+
+        played = lambda data: len(data['matches_as_player1']) + len(data['matches_as_player2'])
+        self.assertEqual(played(few), 2)
+        self.assertEqual(played(many), 32)
+
+    def test_url_names(self):
+        self.assertEqual(reverse('player-full-detail', args=[self.player.id]), f'/api/players/{self.player.id}/detail/')
+        # Имя player-detail остается за маршрутом роутера
+        self.assertEqual(reverse('player-detail', args=[self.player.id]), f'/api/players/{self.player.id}/')
+
+
+class PlayerCursorTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('cursor'))
+        for i in range(3):
+            create_player(i)
+
+    def test_next_page(self):
+        first = self.client.get('/api/players/?page_size=2').json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([p['name'] for p in second['results']], ['Player 2'])
+
+    def test_malformed_cursor_is_404(self):
+        for raw in (b'["ATP", 1, "not-a-uuid"]', b'["ATP", "x", null]', b'[1, 2]', b'garbage'):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            response = self.client.get('/api/players/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, raw)
+
+
+class ViewCounterTest(TransactionTestCase):
+    def setUp(self):
+        self.news = News.objects.create(
+            title='News', content='Content', summary='Summary', image_url='https://example.com/news.jpg',
+            category='General', author='Author', published_date=datetime.date(2025, 1, 1),
+        )
+
+    def test_flushes_on_interval_without_further_views(self):
+        counter = ViewCounter(News, 'views', flush_interval=0.2)
+        counter.increment(self.news.pk)
+        counter.increment(self.news.pk)
+        deadline = time.monotonic() + 5
+        while News.objects.get(pk=self.news.pk).views != 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(News.objects.get(pk=self.news.pk).views, 2)
+
+    def test_failed_flush_requeues(self):
+        counter = ViewCounter(News, 'views', flush_interval=60)
+        counter.increment(self.news.pk, 3)
+        with mock.patch('api.counters.transaction.atomic', side_effect=OperationalError('database is down')):
+            with self.assertLogs('api.counters', 'ERROR'):
+                self.assertEqual(counter.flush(), 0)
+        self.assertEqual(counter.pending[self.news.pk], 3)
+        self.assertEqual(counter.flush(), 1)
+        self.assertEqual(News.objects.get(pk=self.news.pk).views, 3)
+
+
+class CountingGeminiModel(chat.FakeGeminiModel):
+    """Заглушка Gemini, которая запоминает наибольшее число одновременных запросов"""
+
+    def __init__(self, latency):
+        super().__init__(latency)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def generate_content(self, prompt, stream=False):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            return super().generate_content(prompt, stream)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+
+class ChatUpstreamTest(TestCase):
+    def setUp(self):
+        chat.response_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('chat'))
+
+    def test_concurrency_above_limit_queues(self):
+        limit = settings.CHAT_MAX_CONCURRENCY
+        model = CountingGeminiModel(latency=0.2)
+        # Потоки не видят транзакцию теста: версии таблиц для ключа кэша подменяем
+        with mock.patch('api.chat.get_model', return_value=model), \
+                mock.patch('api.chat.table_versions', return_value=(1, 1)):
+            started = time.monotonic()
+            with ThreadPoolExecutor(limit * 2) as executor:
+                replies = list(executor.map(lambda i: chat.generate(f'question {i}'), range(limit * 2)))
+            elapsed = time.monotonic() - started
+        self.assertEqual(model.max_in_flight, limit)
+        # Вторая половина запросов ждала в очереди, пока освободятся первые
+        self.assertGreaterEqual(elapsed, 0.4)
+        self.assertTrue(all(not cached for _, cached in replies))
+
+    @override_settings(CHAT_UPSTREAM_TIMEOUT=0.2)
+    def test_slow_upstream_times_out(self):
+        with mock.patch('api.chat.get_model', return_value=chat.FakeGeminiModel(latency=1)):
+            started = time.monotonic()
+            response = self.client.post('/api/chat/', {'message': 'Who won Wimbledon?'}, format='json')
+            elapsed = time.monotonic() - started
+        self.assertEqual(response.status_code, 504)
+        self.assertLess(elapsed, 1)
+
+
+class TableVersionTest(TestCase):
+    def test_version_written_elsewhere_is_seen(self):
+        version = table_version(Player)
+        # Так версию меняет другой процесс или команда: только в базе
+        TableVersion.objects.filter(table='api.player').update(version=F('version') + 1)
+        self.assertEqual(table_version(Player), version + 1)
+
+    def test_snapshot_follows_table_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            player = create_player(0)
+        before = rankings.get_snapshot('atp')
+        with self.captureOnCommitCallbacks(execute=True):
+            player.name = 'Renamed'
+            player.save()
+        after = rankings.get_snapshot('atp')
+        self.assertNotEqual(before.etag, after.etag)
+        self.assertIn(b'Renamed', after.body)
+
+    def test_one_bump_per_table_per_transaction(self):
+        version = table_version(Player)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with transaction.atomic():
+                players = [create_player(i) for i in range(20)]
+                Player.objects.filter(pk__in=[p.pk for p in players[:10]]).delete()
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(table_version(Player), version + 1)
+
+    def test_rolled_back_savepoint_keeps_later_bumps(self):
+        version = table_version(News)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                try:
+                    with transaction.atomic():
+                        create_player(0)
+                        raise ValueError
+                except ValueError:
+                    pass
+                News.objects.create(
+                    title='News', content='Content', summary='Summary', image_url='https://example.com/news.jpg',
+                    category='General', author='Author', published_date=datetime.date(2025, 1, 1),
+                )
+        self.assertEqual(table_version(News), version + 1)
+
+    def test_bulk_clear_skips_row_bumps(self):
+        for i in range(5):
+            create_player(i)
+        with self.captureOnCommitCallbacks() as callbacks:
+            with aggregate_receivers_disconnected():
+                Player.objects.all().delete()
+        self.assertEqual(callbacks, [])
+
+class PlayerMatchHistoryTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('history'))
+
+    def test_unknown_player_is_404(self):
+        response = self.client.get(f'/api/players/{uuid.uuid4()}/matches/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_player_without_matches_is_empty_page(self):
+        player = create_player(0)
+        response = self.client.get(f'/api/players/{player.id}/matches/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+
+class PlayerRatingTest(TransactionTestCase):
+    def test_match_saved_in_autocommit_updates_ratings(self):
+        tournament = create_tournament()
+        winner, loser = create_player(0), create_player(1)
+        # Без внешней транзакции: select_for_update в record_match открывает свою
+        create_matches(loser, [winner], tournament, 1)
+        ratings = dict(PlayerRating.objects.values_list('player_id', 'elo'))
+        self.assertGreater(ratings[winner.id], ratings[loser.id])
+        self.assertEqual(RatingHistory.objects.count(), 2)
+
+
+class FeatureCacheTest(TestCase):
+    def setUp(self):
+        self.features = prediction.FeatureCache()
+        self.tournament = create_tournament()
+        self.a, self.b = create_player(0), create_player(1)
+
+    def elo(self, snapshot, player):
+        return snapshot.matrix[snapshot.rows([player.id])[0], prediction.ELO]
+
+    def test_new_match_reloads_stamped_ratings(self):
+        before = self.features.snapshot()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_matches(self.a, [self.b], self.tournament, 1)
+        after = self.features.snapshot()
+        # Инкрементально: индекс тот же, матрица новая, старый снимок не меняется
+        self.assertIs(after.index, before.index)
+        self.assertEqual(self.elo(before, self.a), self.elo(before, self.b))
+        self.assertNotEqual(self.elo(after, self.a), self.elo(after, self.b))
+
+    def test_late_commit_with_old_timestamp_is_seen(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_matches(self.a, [self.b], self.tournament, 1)
+        before = self.features.snapshot()
+        # Транзакция, закоммиченная позже чтения, но с часами в прошлом
+        PlayerRating.objects.filter(player=self.a).update(
+            elo=1800, updated_at=datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc),
+        )
+        PlayerRating.stamp([self.a.id])
+        after = self.features.snapshot()
+        self.assertIs(after.index, before.index)
+        self.assertEqual(self.elo(after, self.a), 1800)
+        self.assertNotEqual(self.elo(before, self.a), 1800)
+
+
+class DrawSimulationTest(SimpleTestCase):
+    def probabilities(self, players):
+        # Чем выше посев, тем сильнее игрок
+        strength = np.linspace(2.0, 0.0, players)
+        return 1.0 / (1.0 + np.exp(strength[None, :] - strength[:, None]))
+
+    def test_same_seed_same_counts(self):
+        probabilities = self.probabilities(12)
+        first = draw.simulate_counts(probabilities, 30000, seed=7)
+        self.assertTrue(np.array_equal(first, draw.simulate_counts(probabilities, 30000, seed=7)))
+        self.assertFalse(np.array_equal(first, draw.simulate_counts(probabilities, 30000, seed=8)))
+
+    def test_counts_per_round(self):
+        counts = draw.simulate_counts(self.probabilities(12), 1000, seed=7)
+        self.assertEqual(counts.shape, (len(draw.round_names(16)), 12))
+        # Все играют первый круг, четыре сильнейших проходят bye, дальше каждый круг вдвое меньше
+        self.assertEqual(counts[0].tolist(), [1000] * 12)
+        self.assertEqual(counts[1, :4].tolist(), [1000] * 4)
+        self.assertEqual(counts.sum(axis=1).tolist(), [12000, 8000, 4000, 2000, 1000])
+
+    def test_certain_favourite_wins(self):
+        probabilities = np.triu(np.ones((8, 8)), 1) + np.eye(8) * 0.5
+        counts = draw.simulate_counts(probabilities, 500, seed=1)
+        self.assertEqual(counts[-1].tolist(), [500] + [0] * 7)
+        # 1 и 2 встречаются только в финале
+        self.assertEqual(counts[-2, :2].tolist(), [500, 500])
+
+    def test_split_keeps_total(self):
+        self.assertEqual(draw.split(10, 4), [3, 3, 2, 2])
+        self.assertEqual(draw.split(2, 4), [1, 1])
+
+
+class MatchViewSetTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('matches'))
+        self.tournament = create_tournament()
+        self.player = create_player(0)
+        self.opponents = [create_player(i) for i in range(1, 4)]
+        create_matches(self.player, self.opponents, self.tournament, 25)
+        create_matches(self.opponents[0], self.opponents[1:], self.tournament, 2)
+
+    def test_recent_matches_match_model_serializer(self):
+        response = self.client.get('/api/matches/recent_matches/')
+        self.assertEqual(response.status_code, 200)
+        expected = Match.objects.order_by('-date')[:20]
+        self.assertEqual(len(response.data), 20)
+        self.assertEqual(json.loads(response.content), json.loads(json.dumps(
+            MatchSerializer(expected, many=True).data, cls=DjangoJSONEncoder,
+        )))
+
+    def test_player_matches(self):
+        response = self.client.get('/api/matches/player_matches/', {'player_id': str(self.player.id)})
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(rows), 25)
+        self.assertTrue(all(str(self.player.id) in (row['player1'], row['player2']) for row in rows))
+        self.assertEqual([row['date'] for row in rows], sorted((row['date'] for row in rows), reverse=True))
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = dict(
+            connections['default'].settings_dict,
+            NAME=os.path.join(directory.name, 'pool.sqlite3'), POOL={'MAX_SIZE': 1, 'TIMEOUT': 0.1},
+        )
+        self.addCleanup(pool.close_pools, self.settings_dict['NAME'])
+
+    def wrapper(self):
+        return PooledSQLiteWrapper(self.settings_dict, alias='pool-test')
+
+    def test_closed_connection_is_released_once(self):
+        first, second = self.wrapper(), self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.close()
+        first.close()
+        self.assertIsNone(first.connection)
+        second.ensure_connection()
+        self.assertIs(second.connection, raw)
+        second.close()
+        self.assertEqual(second.pool.stats()['idle'], 1)
+
+    def test_close_inside_atomic_block_discards_connection(self):
+        first, second = self.wrapper(), self.wrapper()
+        first.ensure_connection()
+        raw = first.connection
+        first.in_atomic_block = True
+        first.close()
+        with self.assertRaises(ProgrammingError):
+            first.cursor()
+        # Слот свободен, но соединение с чужой транзакцией никому не достается
+        second.ensure_connection()
+        self.assertIsNot(second.connection, raw)
+        self.assertEqual(second.pool.stats()['discarded'], 1)
+        second.close()
+
+
+class MatchExportTest(TestCase):
+    def test_long_scores_are_not_truncated(self):
+        tournament = create_tournament()
+        player, opponent = create_player(0), create_player(1)
+        create_matches(player, [opponent], tournament, 2)
+        sets = ['7-6(12)', '6-7(10)', '7-6(8)', '6-7(14)', '70-68', '6-4', '3-6', '7-6(7)']
+        Match.objects.filter(pk=Match.objects.order_by('date').values('pk')[:1]).update(sets=sets)
+
+        data = b''.join(export.stream_matches('npz', chunk_size=1))
+        matches = export.read_npz(io.BytesIO(data))['matches']
+        self.assertGreater(len(' '.join(sets)), 48)
+        self.assertEqual(sorted(matches['sets'].tolist()), sorted([' '.join(sets).encode(), b'6-4 6-3']))
+
+    def test_large_counters_do_not_overflow(self):
+        tournament = create_tournament()
+        player, opponent = create_player(0), create_player(1)
+        create_matches(player, [opponent], tournament, 1)
+        Match.objects.update(duration_minutes=40000, player1_aces=70000, player2_break_points=32768)
+
+        data = b''.join(export.stream_matches('npz'))
+        matches = export.read_npz(io.BytesIO(data))['matches']
+        self.assertEqual(
+            (matches['duration_minutes'][0], matches['player1_aces'][0], matches['player2_break_points'][0]),
+            (40000, 70000, 32768),
+        )
+
+
+class ProfilingTest(TestCase):
+    def test_values_serializer_time_is_recorded(self):
+        profiling.instrument_serializers()
+        create_player(0)
+        profile = profiling.RequestProfile()
+        token = profiling._current.set(profile)
+        try:
+            serializer = values_serializer(PlayerSerializer)
+            rows = serializer.to_representation(serializer.queryset(Player.objects.all()))
+        finally:
+            profiling._current.reset(token)
+        self.assertEqual(len(rows), 1)
+        self.assertGreater(profile.serializer_time, 0)
+
+    @override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1)
+    def test_streamed_list_is_profiled(self):
+        News.objects.create(
+            title='News', content='Content', summary='Summary', image_url='https://example.com/news.jpg',
+            category='General', author='Author', published_date=datetime.date(2025, 1, 1),
+        )
+        bump_all()
+        profiling.registry.reset()
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('profiled'))
+        response = client.get('/api/news/')
+        self.assertTrue(response.streaming)
+        # Пока тело не отдано, запроса списка еще не было
+        self.assertEqual(dict(profiling.registry.histograms), {})
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 1)
+
+        (route, method), histograms = profiling.registry.histograms.popitem()
+        _, queries, _, _, serializer_time, _ = histograms
+        self.assertEqual((route, method), ('news-list', 'GET'))
+        # Версии таблиц для ETag и список новостей, прочитанный при отдаче тела
+        self.assertEqual(queries.sum, 2)
+        self.assertGreater(serializer_time.sum, 0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1', 'replica2', 'replica3'])
+class ReplicaRouterTest(SimpleTestCase):
+    def test_one_replica_per_block(self):
+        router = replicas.ReplicaRouter()
+        for _ in range(10):
+            with replicas.replica_reads():
+                chosen = {router.db_for_read(Player) for _ in range(20)}
+            self.assertEqual(len(chosen), 1)
+            self.assertIn(chosen.pop(), settings.DATABASE_REPLICAS)
+
+    def test_primary_and_writes_use_default(self):
+        router = replicas.ReplicaRouter()
+        with replicas.replica_reads(), replicas.primary():
+            self.assertEqual(router.db_for_read(Player), 'default')
+        with replicas.replica_reads():
+            self.assertEqual(router.db_for_write(Player), 'default')
+        self.assertEqual(router.db_for_read(Player), 'default')
+
+
+@override_settings(DATABASE_REPLICAS=['stale'])
+class StaleReplicaTest(TransactionTestCase):
+    """Реплика - отдельная база SQLite, которая догоняет default только в sync().
+
+    Это не тестовая база раннера: она добавляется после setUpClass и удаляется
+    вместе с временным каталогом.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.TemporaryDirectory()
+        connections.settings['stale'] = dict(
+            connections['default'].settings_dict, NAME=os.path.join(cls.directory.name, 'stale.sqlite3'),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['stale'].close()
+        del connections['stale']
+        del connections.settings['stale']
+        cls.directory.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        user = User.objects.create_user('replica')
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        cache.delete(replicas._pin_key(user.pk))
+        self.addCleanup(cache.delete, replicas._pin_key(user.pk))
+        self.player = create_player(0)
+        self.sync()
+        create_player(1)
+
+    def sync(self):
+        primary, replica = connections['default'], connections['stale']
+        primary.ensure_connection()
+        replica.ensure_connection()
+        primary.connection.backup(replica.connection)
+
+    def names(self, response):
+        return [row['name'] for row in response.json()['results']]
+
+    def test_etag_matches_replica_body(self):
+        stale = self.client.get('/api/players/')
+        self.assertEqual(self.names(stale), ['Player 0'])
+        with override_settings(DATABASE_REPLICAS=[]):
+            fresh = self.client.get('/api/players/')
+            self.assertEqual(self.names(fresh), ['Player 0', 'Player 1'])
+            self.assertNotEqual(fresh['ETag'], stale['ETag'])
+            # Старое тело с отставшей реплики не подтверждается версией из default
+            revalidated = self.client.get('/api/players/', HTTP_IF_NONE_MATCH=stale['ETag'])
+            self.assertEqual(revalidated.status_code, 200)
+
+        self.sync()
+        synced = self.client.get('/api/players/')
+        self.assertEqual((synced['ETag'], self.names(synced)), (fresh['ETag'], self.names(fresh)))
+        self.assertEqual(self.client.get('/api/players/', HTTP_IF_NONE_MATCH=fresh['ETag']).status_code, 304)
+
+    def test_reads_use_default_after_user_writes(self):
+        self.assertEqual(self.names(self.client.get('/api/players/')), ['Player 0'])
+        response = self.client.patch(f'/api/players/{self.player.id}/', {'points': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(self.client.get('/api/players/')), ['Player 0', 'Player 1'])
+        # Метка истекла: снова реплика
+        cache.delete(replicas._pin_key(response.wsgi_request.user.pk))
+        self.assertEqual(self.names(self.client.get('/api/players/')), ['Player 0'])
+
+
+class SearchIndexTest(TestCase):
+    def setUp(self):
+        # Индекс живет в памяти процесса, а откат транзакции теста сигналов не шлет
+        search.invalidate_index()
+        self.addCleanup(search.invalidate_index)
+        self.nadal = create_player(0, name='Rafael Nadal')
+        self.namesake = create_player(1, name='Nadalia Rafaelova Petrovskaya', gender='WTA')
+
+    def names(self, query, kind='player'):
+        return [row['name'] for _, row in search.search(query, kind)]
+
+    def test_closer_match_ranks_first(self):
+        self.assertEqual(self.names('Nadal'), ['Rafael Nadal', 'Nadalia Rafaelova Petrovskaya'])
+        self.assertEqual(self.names('nadal', 'wta'), ['Nadalia Rafaelova Petrovskaya'])
+        self.assertEqual(self.names('federer'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.assertEqual(self.names('nadal', 'atp'), ['Rafael Nadal'])
+        self.nadal.name = 'Carlos Alcaraz'
+        self.nadal.save()
+        self.assertEqual(self.names('nadal', 'atp'), [])
+        self.assertEqual(self.names('alcaraz'), ['Carlos Alcaraz'])
+        self.nadal.delete()
+        self.assertEqual(self.names('alcaraz'), [])
+
+
+class ChatNormalizationTest(TestCase):
+    def test_fillers_are_dropped(self):
+        self.assertEqual(
+            chat.normalize_message('Please, tell me: who is THE world No. 1?'),
+            chat.normalize_message('who is world no 1'),
+        )
+
+    def test_tense_changes_the_question(self):
+        self.assertNotEqual(chat.normalize_message('who is world no 1'), chat.normalize_message('who was world no 1'))
+        self.assertNotEqual(chat.normalize_message('does he play'), chat.normalize_message('did he play'))
+
+    def test_cache_key_follows_table_versions(self):
+        chat.response_cache.clear()
+        key = chat.cache_key('who is world no 1')
+        chat.response_cache.set(key, 'Player 0')
+        self.assertEqual(chat.response_cache.get(chat.cache_key('Who is world No. 1?')), 'Player 0')
+        # Рейтинг изменен в другом процессе: в базе выросла только версия таблицы
+        bump(Player)
+        self.assertIsNone(chat.response_cache.get(chat.cache_key('who is world no 1')))
+
+    @override_settings(CHAT_FAKE_LATENCY=0)
+    async def test_stream_uses_versioned_cache(self):
+        chat.get_model.cache_clear()
+        self.addCleanup(chat.get_model.cache_clear)
+        chat.response_cache.clear()
+        user = await User.objects.acreate(username='stream')
+        headers = {'Authorization': f'Bearer {RefreshToken.for_user(user).access_token}'}
+        client = AsyncClient()
+        for cached in (False, True):
+            response = await client.post('/api/chat/stream/', {'message': 'who is world no 1'},
+                                         content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, 200)
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+            self.assertIn(f'"cached": {str(cached).lower()}', body)
+
+
+class HeadToHeadTest(TestCase):
+    def setUp(self):
+        self.tournament = create_tournament()
+        self.a, self.b, self.c = (create_player(i) for i in range(3))
+
+    def play(self, player1, player2, winner, day=1):
+        return Match.objects.create(
+            tournament=self.tournament, player1=player1, player2=player2, winner=winner,
+            date=datetime.date(2024, 1, day), round='Final', surface='Clay', sets=['6-4', '6-3'],
+        )
+
+    def row(self, x, y):
+        low, high = HeadToHead.canonical_pair(x.pk, y.pk)
+        return HeadToHead.objects.filter(player1_id=low, player2_id=high).first()
+
+    def record(self, x, y):
+        """(всего, побед x, побед y) из канонической строки пары или None"""
+        row = self.row(x, y)
+        if row is None:
+            return None
+        wins = (row.player1_wins, row.player2_wins)
+        return (row.total_matches, *(wins if row.player1_id == x.pk else wins[::-1]))
+
+    def test_one_canonical_row_per_pair(self):
+        self.play(self.a, self.b, self.a, day=1)
+        self.play(self.b, self.a, self.a, day=2)
+        self.assertEqual(HeadToHead.objects.count(), 1)
+        row = HeadToHead.objects.get()
+        self.assertLess(row.player1_id, row.player2_id)
+        self.assertEqual(self.record(self.a, self.b), (2, 2, 0))
+
+    def test_winner_edit(self):
+        match = self.play(self.a, self.b, self.a)
+        match.winner = self.b
+        match.save()
+        self.assertEqual(self.record(self.a, self.b), (1, 0, 1))
+
+    def test_pair_change(self):
+        first = self.play(self.a, self.b, self.a, day=1)
+        second = self.play(self.a, self.b, self.b, day=2)
+        second.player2 = self.c
+        second.winner = self.c
+        second.save()
+        self.assertEqual(self.record(self.a, self.b), (1, 1, 0))
+        self.assertEqual(self.record(self.a, self.c), (1, 0, 1))
+        self.assertEqual(self.row(self.a, self.b).last_meeting_id, first.pk)
+
+    def test_delete(self):
+        first = self.play(self.a, self.b, self.a, day=1)
+        second = self.play(self.a, self.b, self.b, day=2)
+        second.delete()
+        self.assertEqual(self.record(self.a, self.b), (1, 1, 0))
+        first.delete()
+        self.assertIsNone(self.record(self.a, self.b))
+
+class SeasonStatsTest(TestCase):
+    def setUp(self):
+        self.tournament = create_tournament()
+        self.a, self.b = create_player(0), create_player(1)
+
+    def play(self, winner, loser, day=datetime.date(2024, 1, 1), surface='Clay', round='Final'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Match.objects.create(
+                tournament=self.tournament, player1=winner, player2=loser, winner=winner,
+                date=day, round=round, surface=surface, sets=['6-4', '6-3'],
+            )
+
+    def stats(self, player, year=2024):
+        return SeasonStats.objects.filter(player=player, season_year=year).values(
+            'matches_played', 'wins', 'losses', 'clay_wins', 'grass_losses', 'titles_won', 'finals_reached',
+        ).first()
+
+    def test_counts_after_save(self):
+        self.play(self.a, self.b)
+        self.play(self.b, self.a, day=datetime.date(2024, 6, 1), surface='Grass', round='Semifinal')
+        self.assertEqual(self.stats(self.a), {
+            'matches_played': 2, 'wins': 1, 'losses': 1, 'clay_wins': 1, 'grass_losses': 1,
+            'titles_won': 1, 'finals_reached': 1,
+        })
+        self.assertEqual(self.stats(self.b)['titles_won'], 0)
+
+    def test_winner_edit(self):
+        match = self.play(self.a, self.b)
+        with self.captureOnCommitCallbacks(execute=True):
+            match.winner = self.b
+            match.save()
+        self.assertEqual((self.stats(self.a)['wins'], self.stats(self.a)['losses']), (0, 1))
+        self.assertEqual((self.stats(self.b)['wins'], self.stats(self.b)['titles_won']), (1, 1))
+
+    def test_date_moved_to_another_season(self):
+        match = self.play(self.a, self.b)
+        with self.captureOnCommitCallbacks(execute=True):
+            match.date = datetime.date(2023, 12, 30)
+            match.save()
+        self.assertIsNone(self.stats(self.a, 2024))
+        self.assertEqual(self.stats(self.a, 2023)['wins'], 1)
+
+    def test_delete(self):
+        self.play(self.a, self.b)
+        kept = self.play(self.a, self.b, day=datetime.date(2024, 2, 1))
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.delete()
+        self.assertEqual(self.stats(self.a)['matches_played'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Match.objects.all().delete()
+        self.assertFalse(SeasonStats.objects.exists())
+
+    def test_participation_prize_money(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            TournamentParticipation.objects.create(
+                tournament=self.tournament, player=self.a, prize_money_earned=Decimal('5000.00'), points_earned=250,
+            )
+        row = SeasonStats.objects.get(player=self.a, season_year=2024)
+        self.assertEqual((row.matches_played, row.prize_money, row.points_earned), (0, Decimal('5000.00'), 250))
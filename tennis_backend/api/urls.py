@@ -2,7 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     RegisterView, UserProfileViewSet, PlayerViewSet,
-    NewsViewSet, TournamentViewSet, ChatBotView, UserProfileDetailView
+    NewsViewSet, TournamentViewSet, ChatBotView, UserProfileDetailView,
+    PlayerDetailView, PlayerMatchHistoryView, SearchView, StatsLeadersView, PredictView, MatchExportView, MetricsView, HotPathsView, chat_stream, ChatCacheStatsView, HeadToHeadViewSet, MatchViewSet
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -10,12 +11,24 @@ router = DefaultRouter()
 router.register(r'players', PlayerViewSet)
 router.register(r'news', NewsViewSet)
 router.register(r'tournaments', TournamentViewSet)
+router.register(r'head-to-head', HeadToHeadViewSet)
+router.register(r'matches', MatchViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('players/<uuid:id>/detail/', PlayerDetailView.as_view(), name='player-full-detail'),
+    path('players/<uuid:id>/matches/', PlayerMatchHistoryView.as_view(), name='player-matches'),
     path('register/', RegisterView.as_view(), name='register'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('chat/', ChatBotView.as_view(), name='chat'),
+    path('chat/stream/', chat_stream, name='chat-stream'),
+    path('chat/cache/', ChatCacheStatsView.as_view(), name='chat-cache-stats'),
     path('profile/', UserProfileDetailView.as_view(), name='profile-detail'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('stats/leaders/', StatsLeadersView.as_view(), name='stats-leaders'),
+    path('predict/', PredictView.as_view(), name='predict'),
+    path('export/matches/', MatchExportView.as_view(), name='match-export'),
+    path('_metrics/', MetricsView.as_view(), name='metrics'),
+    path('_metrics/hot-paths/', HotPathsView.as_view(), name='metrics-hot-paths'),
 ]
\ No newline at end of file
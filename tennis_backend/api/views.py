@@ -1,26 +1,51 @@
 from rest_framework import viewsets, status, generics
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from django.contrib.auth.models import User
-from .models import Player, News, Tournament, UserProfile, ChatHistory, Match, HeadToHead
+from .models import (
+    Player, News, Tournament, UserProfile, ChatHistory, Match, HeadToHead,
+    TournamentParticipation, SeasonStats, PlayerMatch, PlayerRating
+)
+from .pagination import PlayerKeysetPagination, PlayerMatchPagination, SearchPagination
+from . import search
+from .counters import news_views
+from . import chat
+from . import rankings
+from . import analytics
+from . import prediction
+from . import simulation
+from . import export
+from . import profiling
+from .conditional import ConditionalGetMixin
+from .fastjson import STREAM_CHUNK_SIZE, StreamingJSONResponse, chunked
+from .replicas import ReplicaReadMixin
 from .serializers import (
     UserSerializer, RegisterSerializer, PlayerSerializer,
     NewsSerializer, TournamentSerializer, UserProfileSerializer,
     ChatHistorySerializer, MatchSerializer, HeadToHeadSerializer,
-    PlayerDetailSerializer, UserProfileUpdateSerializer
+    PlayerDetailSerializer, UserProfileUpdateSerializer, PlayerMatchSerializer,
+    values_serializer,
 )
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.db.models import Q
-import google.generativeai as genai
+from django.db.models import Q, Prefetch
 from django.conf import settings
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
-
-genai.configure(api_key=settings.GEMINI_API_KEY)
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+import json
+import uuid
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -162,67 +187,244 @@ class UserProfileViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         return UserProfile.objects.filter(user=self.request.user)
 
-class PlayerViewSet(viewsets.ModelViewSet):
+class ValuesListMixin:
+    """Списки через values() и ValuesSerializer вместо обхода полей ModelSerializer"""
+    
+    def get_values_serializer(self):
+        return values_serializer(self.get_serializer_class())
+    
+    def values_queryset(self, queryset):
+        return self.get_values_serializer().queryset(queryset)
+    
+    def serialize_rows(self, rows):
+        return self.get_values_serializer().to_representation(rows)
+    
+    def list_response(self, queryset):
+        """Непагинированный список: JSON-клиентам - потоком по STREAM_CHUNK_SIZE строк"""
+        if not isinstance(self.request.accepted_renderer, JSONRenderer):
+            return Response(self.serialize_rows(queryset))
+        rows = queryset.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        return StreamingJSONResponse(self.serialize_rows(chunk) for chunk in chunked(rows, STREAM_CHUNK_SIZE))
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.values_queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_rows(page))
+        return self.list_response(queryset)
+
+class PlayerViewSet(ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = Player.objects.all()
     serializer_class = PlayerSerializer
     permission_classes = [IsAuthenticated]
+    version_models = (Player,)
+    pagination_class = PlayerKeysetPagination
+    
+    def get_sparse_fields(self):
+        """Разбирает ?fields=name,rank,... для GET-запросов"""
+        if self.request.method != 'GET' or 'fields' not in self.request.query_params:
+            return None
+        fields = [f.strip() for f in self.request.query_params['fields'].split(',') if f.strip()]
+        allowed = {f.name for f in Player._meta.concrete_fields}
+        unknown = [f for f in fields if f not in allowed]
+        if unknown:
+            raise ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}"})
+        return fields or None
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_sparse_fields()
+        if fields:
+            # Ключ пагинации нужен всегда, даже если его не запросили
+            queryset = queryset.only(*set(fields) | {'id', 'gender', 'rank'})
+        return queryset
+    
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_values_serializer(self):
+        fields = self.get_sparse_fields()
+        return values_serializer(self.get_serializer_class(), tuple(fields) if fields else None)
+    
+    def values_queryset(self, queryset):
+        # Ключ keyset-пагинации нужен в строках, даже если его нет в ?fields
+        return self.get_values_serializer().queryset(queryset, *self.paginator.ordering)
+    
+    def snapshot_response(self, name):
+        """Отдает готовый снимок рейтинга с ETag / Last-Modified (304, если не изменился)"""
+        snapshot = rankings.get_snapshot(name)
+        last_modified = int(snapshot.last_modified.timestamp())
+        response = get_conditional_response(
+            self.request, etag=snapshot.etag, last_modified=last_modified
+        )
+        if response is None:
+            response = HttpResponse(snapshot.body, content_type='application/json')
+        response['ETag'] = snapshot.etag
+        response['Last-Modified'] = http_date(last_modified)
+        # Клиент может хранить ответ, но должен каждый раз его перепроверять
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+    
+    def uses_snapshot(self):
+        return self.get_sparse_fields() is None and not self.paginator.is_requested(self.request)
+    
+    def ranking_response(self, name, queryset, limit):
+        # Без ?cursor / ?page_size отдаем прежний массив из первых `limit` игроков
+        if self.uses_snapshot():
+            return self.snapshot_response(name)
+        queryset = self.values_queryset(queryset)
+        if self.paginator.is_requested(self.request):
+            page = self.paginate_queryset(queryset)
+            return self.get_paginated_response(self.serialize_rows(page))
+        return Response(self.serialize_rows(queryset.order_by('rank')[:limit]))
     
     @action(detail=False, methods=['get'])
     def atp(self, request):
-        players = Player.objects.filter(gender='ATP').order_by('rank')[:100]
-        serializer = self.get_serializer(players, many=True)
-        return Response(serializer.data)
+        return self.ranking_response('atp', self.get_queryset().filter(gender='ATP'), 100)
     
     @action(detail=False, methods=['get'])
     def wta(self, request):
-        players = Player.objects.filter(gender='WTA').order_by('rank')[:100]
-        serializer = self.get_serializer(players, many=True)
-        return Response(serializer.data)
+        return self.ranking_response('wta', self.get_queryset().filter(gender='WTA'), 100)
     
     @action(detail=False, methods=['get'])
     def top_players(self, request):
-        atp_top = Player.objects.filter(gender='ATP').order_by('rank')[:10]
-        wta_top = Player.objects.filter(gender='WTA').order_by('rank')[:10]
-        
-        atp_serializer = self.get_serializer(atp_top, many=True)
-        wta_serializer = self.get_serializer(wta_top, many=True)
+        if self.get_sparse_fields() is None:
+            return self.snapshot_response('top_players')
+        atp_top = self.values_queryset(self.get_queryset().filter(gender='ATP')).order_by('rank')[:10]
+        wta_top = self.values_queryset(self.get_queryset().filter(gender='WTA')).order_by('rank')[:10]
         
         return Response({
-            'atp_top': atp_serializer.data,
-            'wta_top': wta_serializer.data
+            'atp_top': self.serialize_rows(atp_top),
+            'wta_top': self.serialize_rows(wta_top)
         })
 
-class PlayerDetailView(generics.RetrieveAPIView):
+class PlayerDetailView(ConditionalGetMixin, ReplicaReadMixin, generics.RetrieveAPIView):
     """Детальное представление игрока со всей статистикой"""
     queryset = Player.objects.all()
     serializer_class = PlayerDetailSerializer
     permission_classes = [IsAuthenticated]
     lookup_field = 'id'
+    version_models = (Player, Tournament, TournamentParticipation, Match, HeadToHead, SeasonStats)
+    
+    def get_queryset(self):
+        # Все вложенные связи грузим заранее вместе с их FK, чтобы число
+        # запросов не зависело от количества матчей игрока
+        match_qs = Match.objects.select_related('tournament', 'player1', 'player2', 'winner')
+        h2h_qs = HeadToHead.objects.select_related('player1', 'player2')
+        return Player.objects.prefetch_related(
+            Prefetch('tournamentparticipation_set',
+                     queryset=TournamentParticipation.objects.select_related('player', 'tournament')),
+            Prefetch('matches_as_player1', queryset=match_qs),
+            Prefetch('matches_as_player2', queryset=match_qs),
+            Prefetch('matches_won', queryset=match_qs),
+            Prefetch('head_to_head_as_player1', queryset=h2h_qs),
+            Prefetch('head_to_head_as_player2', queryset=h2h_qs),
+            Prefetch('season_stats', queryset=SeasonStats.objects.select_related('player')),
+        )
 
-class NewsViewSet(viewsets.ModelViewSet):
+class PlayerMatchHistoryView(ConditionalGetMixin, generics.ListAPIView):
+    """История матчей игрока по индексу PlayerMatch: ?surface=Clay&season=2024"""
+    serializer_class = PlayerMatchSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PlayerMatchPagination
+    version_models = (Player, Tournament, Match, PlayerMatch)
+    
+    def get_queryset(self):
+        queryset = PlayerMatch.objects.filter(player_id=self.kwargs['id'])
+        params = self.request.query_params
+        
+        surface = params.get('surface')
+        if surface:
+            if surface not in dict(Match.SURFACE_CHOICES):
+                raise ValidationError({'surface': f'Unknown surface: {surface}'})
+            queryset = queryset.filter(surface=surface)
+        
+        season = params.get('season')
+        if season:
+            try:
+                queryset = queryset.filter(season=int(season))
+            except ValueError:
+                raise ValidationError({'season': 'Season must be a year'})
+        
+        # Имена соперника и турнира и счет приходят тем же запросом
+        return queryset.select_related('opponent', 'tournament', 'match').only(
+            'id', 'player_id', 'date', 'season', 'surface', 'round', 'won',
+            'match__sets', 'opponent__name', 'tournament__name',
+        )
+    
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        # Пустая страница - либо фильтры ничего не нашли, либо игрока нет: 404, а не пустой список
+        if not page and not Player.objects.filter(pk=self.kwargs['id']).exists():
+            raise NotFound('Player not found')
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+class NewsViewSet(ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
     queryset = News.objects.all()
     serializer_class = NewsSerializer
     permission_classes = [IsAuthenticated]
+    version_models = (News,)
     
     @action(detail=False, methods=['get'])
     def featured(self, request):
-        news = News.objects.all()[:5]
-        serializer = self.get_serializer(news, many=True)
-        return Response(serializer.data)
+        news = self.values_queryset(News.objects.all())[:5]
+        return Response(self.serialize_rows(news))
     
     @action(detail=True, methods=['post'])
     def increment_views(self, request, pk=None):
-        news = self.get_object()
-        news.views += 1
-        news.save()
-        return Response({'views': news.views})
+        # Без полной перезаписи строки: прирост копится в буфере и
+        # сбрасывается пачкой через UPDATE views = views + n
+        news = generics.get_object_or_404(News.objects.only('id', 'views'), pk=pk)
+        pending = news_views.increment(news.pk)
+        return Response({'views': news.views + pending})
 
-class TournamentViewSet(viewsets.ModelViewSet):
-    queryset = Tournament.objects.all()
+class TournamentViewSet(ConditionalGetMixin, ReplicaReadMixin, ValuesListMixin, viewsets.ModelViewSet):
+    # Для поля participants нужны только id участников, одним запросом на всю страницу
+    queryset = Tournament.objects.prefetch_related(Prefetch('participants', queryset=Player.objects.only('id')))
     serializer_class = TournamentSerializer
     permission_classes = [IsAuthenticated]
+    version_models = (Tournament, TournamentParticipation)
+    
+    def get_queryset(self):
+        if self.action == 'simulation':
+            return Tournament.objects.all()
+        return super().get_queryset()
+    
+    def get_version_models(self):
+        if self.action == 'simulation':
+            return simulation.VERSION_MODELS
+        return self.version_models
+    
+    @action(detail=True, methods=['get'])
+    def simulation(self, request, pk=None):
+        """Шансы участников дойти до каждого круга: ?simulations=100000.
+        
+        Если симуляция не успела за DRAW_SIMULATION_WAIT секунд, отвечает 202:
+        расчет продолжается в пуле, повторный запрос получит результат.
+        """
+        tournament = self.get_object()
+        try:
+            simulations = int(request.query_params.get('simulations', settings.DRAW_SIMULATIONS))
+        except ValueError:
+            raise ValidationError({'simulations': 'Must be an integer'})
+        if not 1 <= simulations <= settings.DRAW_SIMULATION_MAX:
+            raise ValidationError({'simulations': f'Must be between 1 and {settings.DRAW_SIMULATION_MAX}'})
+        if TournamentParticipation.objects.filter(tournament=tournament).count() < 2:
+            raise ValidationError({'detail': 'Tournament has fewer than two participants'})
+        
+        result = simulation.get_simulation(tournament, simulations)
+        if result is None:
+            response = Response({'status': 'running'}, status=status.HTTP_202_ACCEPTED)
+            response['Retry-After'] = '1'
+            return response
+        return Response(result)
 
-class MatchViewSet(viewsets.ModelViewSet):
+class MatchViewSet(ValuesListMixin, viewsets.ModelViewSet):
     queryset = Match.objects.all()
     serializer_class = MatchSerializer
     permission_classes = [IsAuthenticated]
@@ -234,15 +436,13 @@ class MatchViewSet(viewsets.ModelViewSet):
             matches = Match.objects.filter(
                 Q(player1_id=player_id) | Q(player2_id=player_id)
             ).order_by('-date')
-            serializer = self.get_serializer(matches, many=True)
-            return Response(serializer.data)
+            return self.list_response(self.values_queryset(matches))
         return Response([])
     
     @action(detail=False, methods=['get'])
     def recent_matches(self, request):
-        matches = Match.objects.all().order_by('-date')[:20]
-        serializer = self.get_serializer(matches, many=True)
-        return Response(serializer.data)
+        matches = self.values_queryset(Match.objects.order_by('-date'))[:20]
+        return Response(self.serialize_rows(matches))
 
 class HeadToHeadViewSet(viewsets.ModelViewSet):
     queryset = HeadToHead.objects.all()
@@ -256,10 +456,11 @@ class HeadToHeadViewSet(viewsets.ModelViewSet):
         
         if player1_id and player2_id:
             try:
-                h2h = HeadToHead.objects.get(
-                    Q(player1_id=player1_id, player2_id=player2_id) |
-                    Q(player1_id=player2_id, player2_id=player1_id)
-                )
+                low, high = HeadToHead.canonical_pair(player1_id, player2_id)
+            except ValueError:
+                return Response({'error': 'player1_id and player2_id must be valid ids'}, status=400)
+            try:
+                h2h = HeadToHead.objects.select_related('player1', 'player2').get(player1_id=low, player2_id=high)
                 serializer = self.get_serializer(h2h)
                 return Response(serializer.data)
             except HeadToHead.DoesNotExist:
@@ -276,34 +477,260 @@ class ChatBotView(generics.GenericAPIView):
             return Response({'error': 'Message is required'}, status=400)
         
         try:
-            # Initialize Gemini model
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            
-            # Create tennis-specific prompt
-            prompt = f"""You are a tennis expert AI assistant. Only answer questions related to tennis.
-            If the question is not about tennis, politely decline to answer.
-            
-            User question: {message}
-            
-            Tennis-specific response:"""
-            
-            response = model.generate_content(prompt)
+            response_text, cached = chat.generate(message)
             
             # Save chat history
-            ChatHistory.objects.create(
-                user=request.user,
-                message=message,
-                response=response.text
-            )
+            chat.save_history(request.user, message, response_text, cached=cached)
             
             return Response({
-                'response': response.text
+                'response': response_text
             })
             
+        except chat.UpstreamTimeout as e:
+            return Response({'error': str(e)}, status=status.HTTP_504_GATEWAY_TIMEOUT)
         except Exception as e:
             return Response({'error': str(e)}, status=500)
     
     def get(self, request):
         history = ChatHistory.objects.filter(user=request.user).order_by('-created_at')[:50]
         serializer = ChatHistorySerializer(history, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+
+class SearchView(generics.GenericAPIView):
+    """Поиск по игрокам (name, country) и новостям (title, summary)"""
+    permission_classes = [IsAuthenticated]
+    pagination_class = SearchPagination
+    
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kind = request.query_params.get('type', 'player')
+        if kind not in search.SEARCH_TYPES:
+            return Response({'error': f"type must be one of: {', '.join(search.SEARCH_TYPES)}"}, status=400)
+        
+        hits = search.search(query, kind)
+        page = self.paginate_queryset(hits)
+        results = [dict(row, score=round(score, 4)) for score, row in page]
+        return self.get_paginated_response(results)
+
+
+class StatsLeadersView(ConditionalGetMixin, APIView):
+    """Таблицы лидеров: ?metric=win_rate&gender=ATP&limit=10&min_matches=20.
+    
+    Без metric отдает лидеров по всем метрикам сразу.
+    """
+    permission_classes = [IsAuthenticated]
+    version_models = (Player, Match)
+    max_limit = 100
+    
+    def get_int_param(self, name, default, minimum, maximum):
+        value = self.request.query_params.get(name)
+        if value in (None, ''):
+            return default
+        try:
+            return max(minimum, min(int(value), maximum))
+        except ValueError:
+            raise ValidationError({name: 'Must be an integer'})
+    
+    def get(self, request):
+        metric = request.query_params.get('metric')
+        if metric and metric not in analytics.METRICS:
+            raise ValidationError({'metric': f"Must be one of: {', '.join(analytics.METRICS)}"})
+        gender = request.query_params.get('gender')
+        if gender and gender not in dict(Player.GENDER_CHOICES):
+            raise ValidationError({'gender': 'Must be ATP or WTA'})
+        limit = self.get_int_param('limit', 10, 1, self.max_limit)
+        min_matches = self.get_int_param('min_matches', 0, 0, 10 ** 6)
+        
+        frame = analytics.get_frame()
+        metrics = [metric] if metric else list(analytics.METRICS)
+        return Response({
+            name: {
+                'description': analytics.METRICS[name][0],
+                'results': frame.leaders(name, limit, gender, min_matches),
+            }
+            for name in metrics
+        })
+
+class PredictView(ConditionalGetMixin, APIView):
+    """Прогноз матча: GET ?p1=<id>&p2=<id>&surface=Clay.
+    
+    POST {"players": [...], "surface": ...} возвращает матрицу вероятностей
+    для всей сетки за один вызов.
+    """
+    permission_classes = [IsAuthenticated]
+    version_models = (Player, Match, PlayerRating, HeadToHead, PlayerRating.VERSION_TABLE)
+    max_players = 256
+    
+    def get_surface(self, data):
+        surface = data.get('surface') or None
+        if surface is not None and surface not in prediction.SURFACE_COLUMNS:
+            raise ValidationError({'surface': f"Must be one of: {', '.join(prediction.SURFACE_COLUMNS)}"})
+        return surface
+    
+    def get_player_id(self, name, value):
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            raise ValidationError({name: 'Must be a player id'})
+    
+    def get(self, request):
+        params = request.query_params
+        player1_id = self.get_player_id('p1', params.get('p1'))
+        player2_id = self.get_player_id('p2', params.get('p2'))
+        if player1_id == player2_id:
+            raise ValidationError({'p2': 'Must differ from p1'})
+        surface = self.get_surface(params)
+        try:
+            result = prediction.predict(player1_id, player2_id, surface)
+        except Player.DoesNotExist:
+            raise NotFound('Player not found')
+        probability = result['probability']
+        return Response({
+            'surface': surface,
+            'player1': {'id': player1_id, 'win_probability': round(probability, 4), 'rating': round(result['ratings'][0], 1)},
+            'player2': {'id': player2_id, 'win_probability': round(1 - probability, 4), 'rating': round(result['ratings'][1], 1)},
+            'head_to_head': round(result['head_to_head'], 4),
+        })
+    
+    def post(self, request):
+        players = request.data.get('players')
+        if not isinstance(players, list) or not 2 <= len(players) <= self.max_players:
+            raise ValidationError({'players': f'Must be a list of 2 to {self.max_players} player ids'})
+        player_ids = [self.get_player_id('players', value) for value in players]
+        if len(set(player_ids)) != len(player_ids):
+            raise ValidationError({'players': 'Must not contain duplicates'})
+        surface = self.get_surface(request.data)
+        try:
+            probabilities = prediction.win_probability_matrix(player_ids, surface)
+        except Player.DoesNotExist:
+            raise NotFound('Player not found')
+        return Response({
+            'surface': surface,
+            'players': player_ids,
+            'probabilities': probabilities.round(4).tolist(),
+        })
+
+class MatchExportView(APIView):
+    """Выгрузка матчей в колоночном формате потоком: ?file_format=npz&since=2024-01-01&until=2024-12-31.
+    
+    Параметр называется file_format, потому что format занят DRF под выбор рендерера.
+    """
+    permission_classes = [IsAdminUser]
+    extensions = {'npz': 'npz', 'arrow': 'arrows', 'parquet': 'parquet'}
+    
+    def get_date_param(self, name):
+        value = self.request.query_params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise ValidationError({name: 'Must be a date in YYYY-MM-DD format'})
+        return parsed
+    
+    def get(self, request):
+        file_format = request.query_params.get('file_format', 'npz')
+        if file_format not in export.available_formats():
+            raise ValidationError({'file_format': f"Must be one of: {', '.join(export.available_formats())}"})
+        matches = Match.objects.all()
+        since, until = self.get_date_param('since'), self.get_date_param('until')
+        if since:
+            matches = matches.filter(date__gte=since)
+        if until:
+            matches = matches.filter(date__lte=until)
+        
+        response = StreamingHttpResponse(
+            export.stream_matches(file_format, matches),
+            content_type=export.WRITERS[file_format].content_type,
+        )
+        response['Content-Disposition'] = f'attachment; filename="matches.{self.extensions[file_format]}"'
+        return response
+
+class ChatCacheStatsView(APIView):
+    """Метрики кэша ответов чат-бота"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(chat.response_cache.stats())
+
+class MetricsView(APIView):
+    """Метрики профилировщика и кэша чат-бота в текстовом формате Prometheus"""
+    authentication_classes = [JWTAuthentication, profiling.MetricsTokenAuthentication]
+    permission_classes = [IsAdminUser | profiling.HasMetricsToken]
+    
+    def get(self, request):
+        cache_stats = chat.response_cache.stats()
+        gauges = [
+            (f'api_chat_cache_{name}', f'Chat response cache {name.replace("_", " ")}', value)
+            for name, value in cache_stats.items()
+        ]
+        return HttpResponse(profiling.registry.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+class HotPathsView(APIView):
+    """Маршруты по суммарному времени: доли SQL, сериализации и рендеринга, повторяющиеся запросы"""
+    authentication_classes = [JWTAuthentication, profiling.MetricsTokenAuthentication]
+    permission_classes = [IsAdminUser | profiling.HasMetricsToken]
+    
+    def get(self, request):
+        return Response(profiling.registry.hot_paths())
+    
+    def delete(self, request):
+        profiling.registry.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def chat_stream(request):
+    """Асинхронный чат: ответ Gemini отдается потоком server-sent events"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Method not allowed'}, status=405)
+    
+    try:
+        auth = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed as e:
+        return JsonResponse({'error': str(e.detail)}, status=401)
+    if auth is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+    user = auth[0]
+    
+    try:
+        message = json.loads(request.body or b'{}').get('message', '')
+    except (ValueError, AttributeError):
+        message = ''
+    if not message:
+        return JsonResponse({'error': 'Message is required'}, status=400)
+    
+    async def events():
+        # Версии таблиц в ключе читаются из базы: это синхронный код
+        key = await sync_to_async(chat.cache_key)(message)
+        cached = chat.response_cache.get(key)
+        if cached is not None:
+            chat.save_history(user, message, cached, cached=True)
+            yield _sse('message', {'text': cached})
+            yield _sse('done', {'response': cached, 'cached': True})
+            return
+        
+        parts = []
+        try:
+            async for text in chat.stream_reply(message):
+                parts.append(text)
+                yield _sse('message', {'text': text})
+        except Exception as e:
+            yield _sse('error', {'error': str(e)})
+            return
+        response_text = ''.join(parts)
+        chat.response_cache.set(key, response_text)
+        chat.save_history(user, message, response_text)
+        yield _sse('done', {'response': response_text, 'cached': False})
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# JWT в заголовке, cookie не используются
+chat_stream.csrf_exempt = True
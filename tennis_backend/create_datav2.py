@@ -1,4 +1,5 @@
 import os
+import argparse
 import django
 from datetime import date, timedelta
 import random
@@ -9,7 +10,14 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'tennis_backend.settings')
 django.setup()
 
 from django.contrib.auth.models import User
-from api.models import Player, News, Tournament, UserProfile, TournamentParticipation, Match, HeadToHead, SeasonStats
+from django.core.management import call_command
+from api.models import (
+    Player, News, Tournament, UserProfile, TournamentParticipation, Match, HeadToHead, SeasonStats,
+    aggregate_receivers_disconnected
+)
+from api.conditional import bump_all
+from api.datagen import ROUND_NAMES, seeded_bracket
+from api.analytics import PlayerFrame
 
 def get_players_from_first_version():
     """Получаем игроков из первой версии заполнения"""
@@ -394,36 +402,162 @@ def enhance_player_data(base_player_data):
     
     return enhanced_data
 
-def create_players():
+SYNTHETIC_FIRST_NAMES = {
+    'ATP': ['Luca', 'Mateo', 'Nikolai', 'Hugo', 'Tomas', 'Felix', 'Andre', 'Kai', 'Rafael', 'Oscar',
+            'Jonas', 'Marco', 'Ivan', 'Leo', 'Daniel', 'Yuki', 'Pablo', 'Emil', 'Arthur', 'Victor'],
+    'WTA': ['Elena', 'Sofia', 'Maria', 'Anna', 'Chloe', 'Yulia', 'Lucia', 'Nina', 'Clara', 'Mei',
+            'Olga', 'Laura', 'Ines', 'Hana', 'Paula', 'Daria', 'Emma', 'Sara', 'Alina', 'Zoe'],
+}
+SYNTHETIC_LAST_NAMES = ['Novak', 'Garcia', 'Ivanov', 'Rossi', 'Muller', 'Dubois', 'Silva', 'Kowalski',
+                        'Petrov', 'Jensen', 'Tanaka', 'Horvat', 'Costa', 'Berg', 'Moreau', 'Lopez',
+                        'Schmidt', 'Nakamura', 'Popescu', 'Fischer', 'Romero', 'Varga', 'Eriksson', 'Kim']
+SYNTHETIC_COUNTRIES = ['Spain', 'Italy', 'France', 'Germany', 'USA', 'Serbia', 'Czech Republic', 'Japan',
+                       'Argentina', 'Australia', 'Poland', 'Canada', 'Brazil', 'Croatia', 'Norway', 'Ukraine']
+SYNTHETIC_BIOGRAPHIES = [
+    'Consistent baseliner climbing the rankings.',
+    'Big server with a powerful forehand.',
+    'Defensive specialist known for speedy court coverage.',
+    'Clay court grinder with strong mental toughness.',
+    'Aggressive hard court player with creative shot-making.',
+]
+DEFAULT_PLAYER_IMAGE = 'https://via.placeholder.com/300x300?text=Player'
+
+def generate_synthetic_players(count_per_tour, existing_players):
+    """Дополнительные вымышленные игроки после реальных в каждом рейтинге"""
+    synthetic = []
+    for gender in ('ATP', 'WTA'):
+        ranks = [p['rank'] for p in existing_players if p['gender'] == gender]
+        next_rank = max(ranks, default=0) + 1
+        for i in range(count_per_tour):
+            rank = next_rank + i
+            wins = random.randint(20, 250)
+            synthetic.append({
+                'name': f"{random.choice(SYNTHETIC_FIRST_NAMES[gender])} {random.choice(SYNTHETIC_LAST_NAMES)} {rank}",
+                'country': random.choice(SYNTHETIC_COUNTRIES),
+                'rank': rank,
+                'points': max(10, 2000 - rank * 2 + random.randint(0, 50)),
+                'gender': gender,
+                'age': random.randint(18, 36),
+                'coach': f"{random.choice(SYNTHETIC_FIRST_NAMES['ATP'])} {random.choice(SYNTHETIC_LAST_NAMES)}",
+                'wins': wins,
+                'losses': random.randint(20, 200),
+                'image_url': DEFAULT_PLAYER_IMAGE,
+                'biography': random.choice(SYNTHETIC_BIOGRAPHIES),
+            })
+    return synthetic
+
+def generate_synthetic_tournaments(count):
+    """Вымышленные турниры по категориям из Tournament.CATEGORY_CHOICES"""
+    categories = [value for value, _ in Tournament.CATEGORY_CHOICES]
+    surfaces = ['Hard', 'Clay', 'Grass']
+    prize_by_category = {
+        'Grand Slam': 50000000, 'ATP Finals': 15000000, 'WTA Finals': 15000000,
+        'Masters 1000': 8000000, 'WTA 1000': 7000000, 'ATP 500': 2500000,
+        'WTA 500': 1500000, 'ATP 250': 700000, 'WTA 250': 300000,
+    }
+    tournaments = []
+    for i in range(count):
+        category = categories[i % len(categories)]
+        start = date(2025, 1, 1) + timedelta(days=(i * 7) % 330)
+        tournaments.append({
+            'name': f"{category} Open {i + 1}",
+            'location': random.choice(SYNTHETIC_COUNTRIES),
+            'start_date': start,
+            'end_date': start + timedelta(days=13 if category == 'Grand Slam' else 6),
+            'surface': random.choice(surfaces),
+            'prize_money': Decimal(prize_by_category[category]),
+            'category': category,
+            'description': f'Synthetic {category} event for load testing.',
+            'capacity': random.randint(3000, 15000),
+        })
+    return tournaments
+
+def tournament_gender(tournament):
+    if tournament.category.startswith('WTA') or 'WTA' in tournament.name:
+        return 'WTA'
+    return 'ATP'
+
+def create_players(extra_players=0, batch_size=1000):
     print("Creating players from both versions with detailed statistics...")
     
-    # Очистка старых данных
-    Match.objects.all().delete()
-    TournamentParticipation.objects.all().delete()
-    HeadToHead.objects.all().delete()
-    SeasonStats.objects.all().delete()
-    Player.objects.all().delete()
-    
     # Получаем игроков из первой версии
-    first_version_players = get_players_from_first_version()
-    
-    # Дополняем их данными для второй версии
-    enhanced_players = enhance_player_data(first_version_players)
-    
-    # Создаем игроков в базе данных
-    created_players = []
-    for player_data in enhanced_players:
-        try:
-            player = Player.objects.create(**player_data)
-            created_players.append(player)
-            print(f"Created player: {player.name} ({player.gender}) - Rank {player.rank}")
-        except Exception as e:
-            print(f"Error creating player {player_data['name']}: {str(e)}")
-    
-    print(f"\nTotal players created: {len(created_players)}")
-    return created_players
+    player_data = get_players_from_first_version()
+    player_data += generate_synthetic_players(extra_players, player_data)
+    
+    # Дополняем их данными для второй версии и пишем одной пачкой
+    players = [Player(**data) for data in enhance_player_data(player_data)]
+    Player.objects.bulk_create(players, batch_size=batch_size)
+    
+    print(f"Total players created: {len(players)}")
+    return players
+
+def participation_reward(tournament, position):
+    """Призовые и очки в зависимости от итоговой позиции"""
+    if position == 1:
+        return tournament.prize_money * Decimal('0.15'), 2000
+    if position == 2:
+        return tournament.prize_money * Decimal('0.075'), 1200
+    if position <= 4:
+        return tournament.prize_money * Decimal('0.04'), 720
+    if position <= 8:
+        return tournament.prize_money * Decimal('0.025'), 360
+    if position <= 16:
+        return tournament.prize_money * Decimal('0.015'), 180
+    return tournament.prize_money * Decimal('0.01'), 90
+
+def simulate_draw(tournament, seeds):
+    """Разыгрывает полную сетку турнира в памяти.
+    
+    Возвращает (матчи, участия); объекты еще не сохранены.
+    """
+    matches = []
+    eliminated = []  # (раунд вылета, игрок), по порядку вылета
+    wins = {player.pk: 0 for player in seeds}
+    alive = seeded_bracket(seeds)
+    while len(alive) > 1:
+        round_name = ROUND_NAMES[len(alive)]
+        next_round = []
+        for i in range(0, len(alive), 2):
+            match = create_match(alive[i], alive[i + 1], tournament, round_name)
+            loser = alive[i + 1] if match.winner is alive[i] else alive[i]
+            wins[match.winner.pk] += 1
+            eliminated.append(loser)
+            next_round.append(match.winner)
+            matches.append(match)
+        alive = next_round
+    
+    champion = alive[0]
+    tournament.winner = champion
+    tournament.total_matches = len(matches)
+    
+    # Позиции: чемпион, финалист, полуфиналисты и т.д.; внутри раунда - по рейтингу
+    finishing_order = [champion]
+    for round_losers in _split_by_round(eliminated[::-1]):
+        finishing_order.extend(sorted(round_losers, key=lambda p: p.rank))
+    
+    participations = []
+    for position, player in enumerate(finishing_order, start=1):
+        prize_money, points_earned = participation_reward(tournament, position)
+        participations.append(TournamentParticipation(
+            tournament=tournament,
+            player=player,
+            position=position,
+            prize_money_earned=prize_money,
+            points_earned=points_earned,
+            matches_won=wins[player.pk],
+            matches_lost=0 if player is champion else 1,
+        ))
+    return matches, participations
+
+def _split_by_round(losers_latest_first):
+    """Разбивает проигравших (с конца турнира) на группы по раундам: 1, 2, 4, ..."""
+    start, size = 0, 1
+    while start < len(losers_latest_first):
+        yield losers_latest_first[start:start + size]
+        start += size
+        size *= 2
 
-def create_tournaments_and_matches(players):
+def create_tournaments_and_matches(players, extra_tournaments=0, draw_size=32, batch_size=1000):
     print("\nCreating tournaments and matches...")    
     tournaments_data = [
         {
@@ -476,83 +610,46 @@ def create_tournaments_and_matches(players):
         }
     ]
     
-    tournaments = []
-    for tournament_data in tournaments_data:
-        tournament = Tournament.objects.create(**tournament_data)
-        tournaments.append(tournament)
-        
-        # Разделяем игроков по гендеру для соответствующих турниров
-        gender_filter = 'ATP' if 'ATP' in tournament.name or tournament.category == 'Grand Slam' else 'WTA'
-        participants = [p for p in players if p.gender == gender_filter]
-        
-        # Берем топ-32 игрока по рейтингу
-        sorted_participants = sorted(participants, key=lambda p: p.rank)[:32]
-        
-        # Создаем записи об участии
-        for i, player in enumerate(sorted_participants):
-            position = i + 1
-            if position == 1:
-                prize_money = tournament.prize_money * Decimal('0.15')
-                points_earned = 2000
-            elif position == 2:
-                prize_money = tournament.prize_money * Decimal('0.075')
-                points_earned = 1200
-            elif position <= 4:
-                prize_money = tournament.prize_money * Decimal('0.04')
-                points_earned = 720
-            elif position <= 8:
-                prize_money = tournament.prize_money * Decimal('0.025')
-                points_earned = 360
-            elif position <= 16:
-                prize_money = tournament.prize_money * Decimal('0.015')
-                points_earned = 180
-            else:
-                prize_money = tournament.prize_money * Decimal('0.01')
-                points_earned = 90
-            
-            TournamentParticipation.objects.create(
-                tournament=tournament,
-                player=player,
-                position=position,
-                prize_money_earned=prize_money,
-                points_earned=points_earned,
-                matches_won=min(6, 7 - position // 2),
-                matches_lost=1 if position <= 2 else random.randint(1, 3)
-            )
-        
-        print(f"Created tournament: {tournament.name} with {len(sorted_participants)} participants")
+    tournaments_data += generate_synthetic_tournaments(extra_tournaments)
+    tournaments = [Tournament(**data) for data in tournaments_data]
     
-    # Создаем матчи между игроками
-    print("\nCreating matches between players...")
+    # Рейтинг каждого тура сортируем один раз на все турниры
+    ranked = {
+        gender: sorted((p for p in players if p.gender == gender), key=lambda p: p.rank)
+        for gender in ('ATP', 'WTA')
+    }
     
+    matches = []
+    participations = []
     for tournament in tournaments:
-        # Получаем участников турнира
-        participants = list(tournament.participants.all())
-        
-        if len(participants) < 2:
+        field = ranked[tournament_gender(tournament)]
+        # Размер сетки - степень двойки, не больше числа игроков
+        size = 1
+        while size * 2 <= min(draw_size, len(field)):
+            size *= 2
+        if size < 2:
             continue
         
-        # Создаем финальный матч (между топ-2 игроками)
-        if len(participants) >= 2:
-            final_players = sorted(participants, key=lambda p: p.rank)[:2]
-            create_match(final_players[0], final_players[1], tournament, 'Final')
-        
-        # Создаем полуфиналы (между следующими топ-игроками)
-        if len(participants) >= 4:
-            semifinal_players = sorted(participants, key=lambda p: p.rank)[2:4]
-            create_match(semifinal_players[0], semifinal_players[1], tournament, 'Semifinal')
-        
-        # Создаем четвертьфиналы
-        if len(participants) >= 8:
-            quarter_players = sorted(participants, key=lambda p: p.rank)[4:8]
-            for i in range(0, len(quarter_players), 2):
-                if i + 1 < len(quarter_players):
-                    create_match(quarter_players[i], quarter_players[i + 1], tournament, 'Quarterfinal')
-    
-    print(f"Total matches created: {Match.objects.count()}")
+        tournament_matches, tournament_participations = simulate_draw(tournament, field[:size])
+        matches.extend(tournament_matches)
+        participations.extend(tournament_participations)
+    
+    # Сохраняем в порядке зависимостей внешних ключей
+    Tournament.objects.bulk_create(tournaments, batch_size=batch_size)
+    TournamentParticipation.objects.bulk_create(participations, batch_size=batch_size)
+    Match.objects.bulk_create(matches, batch_size=batch_size)
+    
+    # bulk_create не вызывает сигналы Match, поэтому Head-to-Head собираем одним проходом
+    call_command('rebuild_head_to_head', batch_size=batch_size)
+    call_command('rebuild_player_matches', batch_size=batch_size)
+    call_command('replay_elo', batch_size=batch_size)
+    
+    print(f"Created {len(tournaments)} tournaments, {len(participations)} participations")
+    print(f"Total matches created: {len(matches)}")
+    return tournaments
 
 def create_match(player1, player2, tournament, round_name):
-    """Создает матч между двумя игроками"""
+    """Создает (не сохраняя) матч между двумя игроками"""
     # Определяем победителя (обычно игрок с более высоким рейтингом, но с небольшим шансом на сенсацию)
     if random.random() > 0.3:  # 70% шанс что победит более высокий рейтинг
         winner = player1 if player1.rank < player2.rank else player2
@@ -579,14 +676,14 @@ def create_match(player1, player2, tournament, round_name):
         
         sets.append(f"{winner_games}-{loser_games}")
     
-    match = Match.objects.create(
+    return Match(
         tournament=tournament,
         player1=player1,
         player2=player2,
         winner=winner,
         date=tournament.start_date + timedelta(days=random.randint(0, tournament.duration_days - 1)),
         round=round_name,
-        surface=tournament.surface,
+        surface=tournament.surface if tournament.surface != 'Carpet' else 'Hard',
         sets=sets,
         duration_minutes=random.randint(90, 240),
         total_points=random.randint(120, 280),
@@ -598,112 +695,36 @@ def create_match(player1, player2, tournament, round_name):
         player2_break_points=random.randint(2, 8),
         player1_first_serve_percentage=round(random.uniform(55, 75), 1),
         player2_first_serve_percentage=round(random.uniform(55, 75), 1),
-        attendance=random.randint(5000, tournament.capacity) if tournament.capacity else random.randint(5000, 15000),
+        attendance=random.randint(5000, max(5000, tournament.capacity)) if tournament.capacity else random.randint(5000, 15000),
         highlights=f"Exciting {round_name.lower()} match between {player1.name} and {player2.name}."
     )
-    
-    # Обновляем статистику Head-to-Head
-    update_head_to_head(player1, player2, winner, match)
-    
-    return match
 
-def update_head_to_head(player1, player2, winner, match):
-    """Обновляет статистику встреч между двумя игроками"""
-    # Проверяем существующую запись
-    h2h = HeadToHead.objects.filter(player1=player1, player2=player2).first()
-    if not h2h:
-        h2h = HeadToHead.objects.filter(player1=player2, player2=player1).first()
-        if h2h:
-            # Меняем местами если найдено в обратном порядке
-            player1, player2 = player2, player1
-        else:
-            # Создаем новую запись
-            h2h = HeadToHead.objects.create(
-                player1=player1,
-                player2=player2,
-                total_matches=0,
-                player1_wins=0,
-                player2_wins=0
-            )
-    
-    h2h.total_matches += 1
-    if winner == player1:
-        h2h.player1_wins += 1
-    else:
-        h2h.player2_wins += 1
-    h2h.last_meeting = match
-    h2h.save()
-
-def create_season_stats(players):
+def create_season_stats(batch_size=1000):
+    """Считает SeasonStats по созданным матчам и участиям в турнирах"""
     print("\nCreating season statistics...")
-    
-    for player in players:
-        # Создаем статистику за последние 3 сезона
-        for year in [2023, 2024, 2025]:
-            # Рассчитываем статистику на основе данных игрока
-            total_wins = player.wins
-            total_losses = player.losses
-            
-            # Распределяем победы по сезонам
-            if year == 2025:
-                wins = int(total_wins * 0.4)
-                losses = int(total_losses * 0.4)
-            elif year == 2024:
-                wins = int(total_wins * 0.35)
-                losses = int(total_losses * 0.35)
-            else:  # 2023
-                wins = total_wins - int(total_wins * 0.4) - int(total_wins * 0.35)
-                losses = total_losses - int(total_losses * 0.4) - int(total_losses * 0.35)
-            
-            # Проверяем, существует ли уже статистика для этого сезона
-            existing_stats = SeasonStats.objects.filter(player=player, season_year=year).first()
-            if existing_stats:
-                continue
-            
-            stats = SeasonStats.objects.create(
-                player=player,
-                season_year=year,
-                matches_played=wins + losses,
-                wins=wins,
-                losses=losses,
-                hard_wins=int(wins * (player.hard_wins / max(1, player.wins))),
-                hard_losses=int(losses * 0.4),
-                clay_wins=int(wins * (player.clay_wins / max(1, player.wins))),
-                clay_losses=int(losses * 0.3),
-                grass_wins=int(wins * (player.grass_wins / max(1, player.wins))),
-                grass_losses=int(losses * 0.3),
-                tournaments_played=player.tournaments_played // 3,
-                titles_won=random.randint(0, 3),
-                finals_reached=random.randint(1, 5),
-                semifinals_reached=random.randint(2, 8),
-                quarterfinals_reached=random.randint(3, 12),
-                prize_money=player.career_prize_money / Decimal('3'),
-                points_earned=player.points // 3,
-                career_high_ranking=min(player.best_ranking or player.rank, player.rank)
-            )
-        
-        print(f"Created season stats for {player.name}")
+    call_command('recompute_season_stats', batch_size=batch_size)
 
 def create_interesting_facts():
     print("\nCreating interesting facts and features...")
     
-    players = Player.objects.all()
+    # Один проход по таблицам вместо отдельного max()/min() по игрокам на каждый факт
+    frame = PlayerFrame.load()
     
     print("\n🎾 INTERESTING TENNIS FACTS 🎾")
     print("=" * 50)
-    if players.exists():
-        most_aces = max(players, key=lambda p: p.ace_count)
-        best_serve_percentage = max(players, key=lambda p: p.first_serve_percentage)
-        highest_win_rate = max(players, key=lambda p: p.win_rate)
-        youngest_player = min(players, key=lambda p: p.age)
-        oldest_player = max(players, key=lambda p: p.age)
+    if len(frame):
+        most_aces = frame.leaders('ace_count', 1)[0]
+        best_serve_percentage = frame.leaders('first_serve_percentage', 1)[0]
+        highest_win_rate = frame.leaders('win_rate', 1)[0]
+        youngest_player = frame.leaders('age', 1)[0]
+        oldest_player = frame.leaders('age', 1, reverse=True)[0]
         
         print(f"\n📊 Statistical Leaders:")
-        print(f"  Most aces: {most_aces.name} - {most_aces.ace_count} aces")
-        print(f"  Best first serve: {best_serve_percentage.name} - {best_serve_percentage.first_serve_percentage:.1f}%")
-        print(f"  Highest win rate: {highest_win_rate.name} - {highest_win_rate.win_rate:.1f}%")
-        print(f"  Youngest player: {youngest_player.name} - {youngest_player.age} years")
-        print(f"  Oldest player: {oldest_player.name} - {oldest_player.age} years")
+        print(f"  Most aces: {most_aces['name']} - {most_aces['value']:.0f} aces")
+        print(f"  Best first serve: {best_serve_percentage['name']} - {best_serve_percentage['value']:.1f}%")
+        print(f"  Highest win rate: {highest_win_rate['name']} - {highest_win_rate['value']:.1f}%")
+        print(f"  Youngest player: {youngest_player['name']} - {youngest_player['value']:.0f} years")
+        print(f"  Oldest player: {oldest_player['name']} - {oldest_player['value']:.0f} years")
     
     print(f"\n🤝 Notable Rivalries:")
     h2h_records = HeadToHead.objects.all().order_by('-total_matches')[:5]
@@ -786,12 +807,26 @@ def create_news():
         }
     ])
     
-    for news_data in news_items:
-        News.objects.create(**news_data)
+    News.objects.bulk_create([News(**news_data) for news_data in news_items])
     
     print(f"Created {len(news_items)} news articles")
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description='Заполнение базы тестовыми данными')
+    parser.add_argument('--extra-players', type=int, default=0,
+                        help='Вымышленных игроков в каждом туре сверх реальных')
+    parser.add_argument('--extra-tournaments', type=int, default=0,
+                        help='Вымышленных турниров сверх четырех турниров Большого шлема')
+    parser.add_argument('--draw-size', type=int, default=32, choices=sorted(ROUND_NAMES),
+                        help='Размер сетки турнира (до 128)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create')
+    parser.add_argument('--seed', type=int, default=None, help='Seed генератора случайных чисел')
+    return parser.parse_args()
+
+def main(options):
+    if options.seed is not None:
+        random.seed(options.seed)
+    
     print("=" * 60)
     print("🎾 COMPREHENSIVE TENNIS DATA CREATION (COMBINED VERSION) 🎾")
     print("=" * 60)
@@ -799,21 +834,26 @@ def main():
     try:
         print("\n🗑️  Cleaning old data...")
         
-        Match.objects.all().delete()
-        HeadToHead.objects.all().delete()
-        TournamentParticipation.objects.all().delete()
-        SeasonStats.objects.all().delete()
-        News.objects.all().delete()
-        Tournament.objects.all().delete()
-        Player.objects.all().delete()
+        # Пересчет Head-to-Head и SeasonStats на каждую удаленную строку при полной очистке не нужен
+        with aggregate_receivers_disconnected():
+            HeadToHead.objects.all().delete()
+            Match.objects.all().delete()
+            TournamentParticipation.objects.all().delete()
+            SeasonStats.objects.all().delete()
+            News.objects.all().delete()
+            Tournament.objects.all().delete()
+            Player.objects.all().delete()
         
         print("Database cleared successfully!")
         
-        players = create_players()
-        create_tournaments_and_matches(players)
-        create_season_stats(players)
+        players = create_players(options.extra_players, options.batch_size)
+        create_tournaments_and_matches(players, options.extra_tournaments, options.draw_size, options.batch_size)
+        create_season_stats(options.batch_size)
         create_interesting_facts()
         create_news()
+        # Все таблицы заполнены через bulk_create, сигналы версий и снимков рейтинга не сработали
+        bump_all()
+        call_command('rebuild_rankings')
         
         print("\n" + "=" * 60)
         print("✅ DATA CREATION COMPLETE!")
@@ -856,4 +896,4 @@ def main():
 
 if __name__ == '__main__':
     with transaction.atomic():
-        main()
\ No newline at end of file
+        main(parse_args())
\ No newline at end of file
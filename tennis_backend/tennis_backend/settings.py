@@ -1,9 +1,21 @@
 import os
+import tempfile
 from pathlib import Path
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
+from dotenv import load_dotenv
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Переменные окружения можно положить в .env рядом с manage.py (см. .env.example)
+load_dotenv(BASE_DIR / '.env')
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    return default if value is None else value.strip().lower() in ('1', 'true', 'yes', 'on')
+
 SECRET_KEY = 'django-insecure-your-secret-key-here'
 
 DEBUG = True
@@ -31,6 +43,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.replicas.ReplicaStickinessMiddleware',
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'tennis_backend.urls'
@@ -53,17 +67,81 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'tennis_backend.wsgi.application'
 
+# База данных из окружения; без переменных - прежние значения. Соединение
+# живет DB_CONN_MAX_AGE секунд (по умолчанию 0 - закрывать после каждого
+# запроса) и перед повторным использованием проверяется
+# (DB_CONN_HEALTH_CHECKS). DB_POOL=1 включает пул соединений процесса
+# (api/backends/pool.py) - прежде всего для ASGI, где запросы выполняются в
+# разных потоках; тогда соединение возвращается в пул после каждого запроса.
+DB_POOL = env_bool('DB_POOL', False)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': 'tennis_db',
-        'USER': 'postgres',
-        'PASSWORD': '1234',
-        'HOST': 'localhost',
-        'PORT': '5432',
+        'ENGINE': os.environ.get('DB_ENGINE', 'django.db.backends.postgresql'),
+        'NAME': os.environ.get('DB_NAME', 'tennis_db'),
+        'USER': os.environ.get('DB_USER', 'postgres'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', '1234'),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+        'CONN_HEALTH_CHECKS': env_bool('DB_CONN_HEALTH_CHECKS', True),
     }
 }
 
+POOLED_ENGINES = {
+    'django.db.backends.postgresql': 'api.backends.pooled_postgresql',
+    'django.db.backends.sqlite3': 'api.backends.pooled_sqlite',
+}
+
+if DB_POOL:
+    if DATABASES['default']['ENGINE'] not in POOLED_ENGINES:
+        raise ImproperlyConfigured(f"DB_POOL is not supported for {DATABASES['default']['ENGINE']}")
+    DATABASES['default']['ENGINE'] = POOLED_ENGINES[DATABASES['default']['ENGINE']]
+    DATABASES['default']['POOL'] = {
+        'MAX_SIZE': int(os.environ.get('DB_POOL_MAX_SIZE', 20)),
+        'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        'MAX_IDLE': float(os.environ.get('DB_POOL_MAX_IDLE', 300)),
+    }
+
+# Реплики для чтения (api/replicas.py). DB_REPLICA_HOSTS - хосты через запятую
+# (база и учетные данные те же, что у default), DB_REPLICA_NAMES - имена баз
+# через запятую (для SQLite - файлы); i-я реплика берет i-й хост и/или i-ю базу.
+# После записи пользователя его чтения REPLICA_STICKY_SECONDS секунд идут в default.
+DB_REPLICA_HOSTS = [host.strip() for host in os.environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+DB_REPLICA_NAMES = [name.strip() for name in os.environ.get('DB_REPLICA_NAMES', '').split(',') if name.strip()]
+DATABASE_REPLICAS = []
+for _index in range(max(len(DB_REPLICA_HOSTS), len(DB_REPLICA_NAMES))):
+    _alias = f'replica{_index + 1}'
+    DATABASES[_alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if _index < len(DB_REPLICA_HOSTS):
+        DATABASES[_alias]['HOST'] = DB_REPLICA_HOSTS[_index]
+    if _index < len(DB_REPLICA_NAMES):
+        DATABASES[_alias]['NAME'] = DB_REPLICA_NAMES[_index]
+    DATABASE_REPLICAS.append(_alias)
+
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', 5))
+
+# Кэш Django: снимки рейтингов, результаты симуляций, закрепление чтений за
+# default после записи. Он должен быть общим для всех процессов: CACHE_URL -
+# redis://host:6379/0 или memcached://host:11211 для нескольких серверов; без
+# него - файловый кэш в CACHE_DIR, общий для процессов одной машины.
+CACHE_URL = os.environ.get('CACHE_URL', '')
+if CACHE_URL.startswith(('redis://', 'rediss://')):
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_URL}}
+elif CACHE_URL.startswith('memcached://'):
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_URL.removeprefix('memcached://'),
+    }}
+elif CACHE_URL:
+    raise ImproperlyConfigured(f'Unsupported CACHE_URL scheme: {CACHE_URL}')
+else:
+    CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'tennis_backend_cache'),
+    }}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -94,6 +172,16 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson, если установлен (api/fastjson.py); без него - стандартный json
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.fastjson.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.fastjson.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
 }
 
 SIMPLE_JWT = {
@@ -103,4 +191,32 @@ SIMPLE_JWT = {
 
 CORS_ALLOW_ALL_ORIGINS = True
 
-GEMINI_API_KEY = ''
\ No newline at end of file
+GEMINI_API_KEY = ''
+GEMINI_MODEL_NAME = 'gemini-2.5-flash'
+
+# Не больше CHAT_MAX_CONCURRENCY одновременных запросов к Gemini на процесс
+CHAT_MAX_CONCURRENCY = 8
+CHAT_UPSTREAM_TIMEOUT = 60
+# Задержка в секундах для локальной заглушки вместо Gemini (None - настоящий API)
+CHAT_FAKE_LATENCY = None
+# Кэш ответов чат-бота: число записей и время жизни в секундах
+CHAT_CACHE_SIZE = 1024
+CHAT_CACHE_TTL = 60 * 60
+
+# Буфер просмотров новостей: раз в сколько секунд сбрасывать в базу (0 - писать сразу)
+NEWS_VIEWS_FLUSH_INTERVAL = 5
+NEWS_VIEWS_MAX_PENDING = 1000
+
+# Симуляция сеток турниров: процессов в пуле, симуляций по умолчанию и сколько
+# секунд запрос ждет результат, прежде чем ответить 202
+DRAW_SIMULATION_WORKERS = min(4, os.cpu_count() or 1)
+DRAW_SIMULATIONS = 100000
+DRAW_SIMULATION_MAX = 1000000
+DRAW_SIMULATION_WAIT = 2
+
+# Профилирование запросов (api/profiling.py): включается явно, профилируется
+# доля запросов PROFILING_SAMPLE_RATE. Метрики - /api/_metrics/ для админов или
+# с заголовком "Authorization: Metrics <PROFILING_METRICS_TOKEN>"
+PROFILING_ENABLED = False
+PROFILING_SAMPLE_RATE = 0.01
+PROFILING_METRICS_TOKEN = ''
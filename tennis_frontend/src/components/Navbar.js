@@ -73,9 +73,9 @@ const Navbar = ({ darkMode, toggleDarkMode }) => {
       ]);
 
       const results = {
-        news: newsResults.status === 'fulfilled' ? newsResults.value.data.slice(0, 3) : [],
-        atpPlayers: atpResults.status === 'fulfilled' ? atpResults.value.data.slice(0, 3) : [],
-        wtaPlayers: wtaResults.status === 'fulfilled' ? wtaResults.value.data.slice(0, 3) : []
+        news: newsResults.status === 'fulfilled' ? newsResults.value.data.results.slice(0, 3) : [],
+        atpPlayers: atpResults.status === 'fulfilled' ? atpResults.value.data.results.slice(0, 3) : [],
+        wtaPlayers: wtaResults.status === 'fulfilled' ? wtaResults.value.data.results.slice(0, 3) : []
       };
 
       setSearchResults(results);
@@ -42,27 +42,14 @@ const SearchPage = () => {
     setLoading(true);
     try {
       const [newsResponse, atpResponse, wtaResponse] = await Promise.all([
-        newsAPI.getAll().catch(() => ({ data: [] })),
-        playersAPI.getATP().catch(() => ({ data: [] })),
-        playersAPI.getWTA().catch(() => ({ data: [] }))
+        newsAPI.search(query).catch(() => ({ data: { results: [] } })),
+        playersAPI.searchATP(query).catch(() => ({ data: { results: [] } })),
+        playersAPI.searchWTA(query).catch(() => ({ data: { results: [] } }))
       ]);
 
-      const searchTerm = query.toLowerCase();
-      
-      const newsResults = (newsResponse.data || []).filter(item =>
-        item.title?.toLowerCase().includes(searchTerm) ||
-        item.summary?.toLowerCase().includes(searchTerm)
-      );
-
-      const atpResults = (atpResponse.data || []).filter(player =>
-        player.name?.toLowerCase().includes(searchTerm) ||
-        player.country?.toLowerCase().includes(searchTerm)
-      );
-
-      const wtaResults = (wtaResponse.data || []).filter(player =>
-        player.name?.toLowerCase().includes(searchTerm) ||
-        player.country?.toLowerCase().includes(searchTerm)
-      );
+      const newsResults = newsResponse.data.results || [];
+      const atpResults = atpResponse.data.results || [];
+      const wtaResults = wtaResponse.data.results || [];
 
       setResults({
         news: newsResults,
@@ -67,8 +67,13 @@ export const playersAPI = {
   getWTA: () => api.get('/players/wta/'),
   getTopPlayers: () => api.get('/players/top_players/'),
   getById: (id) => api.get(`/players/${id}/`),
-  searchATP: (query) => api.get(`/players/atp/search?q=${query}`),
-  searchWTA: (query) => api.get(`/players/wta/search?q=${query}`),
+  getMatches: (id, params) => api.get(`/players/${id}/matches/`, { params }),
+  getLeaders: (params) => api.get('/stats/leaders/', { params }),
+  getPrediction: (player1Id, player2Id, surface) =>
+    api.get('/predict/', { params: { p1: player1Id, p2: player2Id, surface } }),
+  getDrawPrediction: (playerIds, surface) => api.post('/predict/', { players: playerIds, surface }),
+  searchATP: (query) => api.get('/search/', { params: { q: query, type: 'atp' } }),
+  searchWTA: (query) => api.get('/search/', { params: { q: query, type: 'wta' } }),
 };
 
 export const newsAPI = {
@@ -76,12 +81,13 @@ export const newsAPI = {
   getFeatured: () => api.get('/news/featured/'),
   getById: (id) => api.get(`/news/${id}/`),
   incrementViews: (id) => api.post(`/news/${id}/increment_views/`),
-  search: (query) => api.get(`/news/search?q=${query}`),
+  search: (query) => api.get('/search/', { params: { q: query, type: 'news' } }),
 };
 
 export const tournamentsAPI = {
   getAll: () => api.get('/tournaments/'),
   getById: (id) => api.get(`/tournaments/${id}/`),
+  getSimulation: (id, simulations) => api.get(`/tournaments/${id}/simulation/`, { params: { simulations } }),
 };
 
 export const chatAPI = {